@@ -0,0 +1,70 @@
+"""
+Moves every season year up to and including the one given out of the main database and into
+per-year archive files in the archive directory, then vacuums the main database so its file
+shrinks.
+
+Usage:
+    python archive_seasons.py <last season year to archive> [path/to/database.db]
+
+If no path is given, the database from the .env file is used and the archives go in the same
+archive directory the bot uses. Stop the bot first, since VACUUM needs the database to itself.
+The move commits as it goes, so it can be interrupted and run again.
+"""
+
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+from bot_database import BotDatabase, BotDatabaseError
+import constants
+import environment_variables as env
+
+
+async def main():
+    load_dotenv()
+
+    if len(sys.argv) < 2:
+        print(__doc__)
+        return
+    last_season_year = int(sys.argv[1])
+
+    if len(sys.argv) > 2:
+        filename = sys.argv[2]
+        archive_directory = os.path.join(
+            os.path.dirname(os.path.abspath(filename)),
+            constants.DATABASE_ARCHIVE_SUBDIRECTORY
+        )
+    else:
+        filename = env.BOT_DIRECTORY + env.DATA_SUBDIRECTORY + env.DATABASE_FILENAME
+        archive_directory = env.BOT_DIRECTORY + env.DATA_SUBDIRECTORY + constants.DATABASE_ARCHIVE_SUBDIRECTORY
+
+    db = BotDatabase(filename, max_retries=5, slow_query_threshold=None, archive_directory=archive_directory)
+
+    try:
+        await db.open_connections()
+        await db.init_tables()
+
+        size_before = os.path.getsize(filename)
+        season_year_tuples = await db._execute_read_query(
+            "SELECT DISTINCT season_year FROM subsessions WHERE season_year <= ? ORDER BY season_year",
+            params=(last_season_year,)
+        )
+
+        for (season_year,) in season_year_tuples:
+            try:
+                stats = await db.archive_season_year(season_year)
+            except BotDatabaseError as exc:
+                print(f"Archiving {season_year} stopped part way through: {exc}")
+                return
+            print(f"Archived {stats['subsessions']} subsessions ({stats['rows']} rows) from {season_year}.")
+
+        print("Vacuuming the database...")
+        await db._execute_write_query("VACUUM")
+        size_after = os.path.getsize(filename)
+        print(f"Database size went from {size_before / 2 ** 20:.1f} MiB to {size_after / 2 ** 20:.1f} MiB.")
+    finally:
+        await db.close_connections()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
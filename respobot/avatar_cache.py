@@ -0,0 +1,103 @@
+import logging
+import os
+from collections import OrderedDict
+from PIL import Image
+import constants
+import environment_variables as env
+
+
+class AvatarCache:
+    """Keeps Discord avatars that have already been cropped to a circle and resized, so that drawing
+    the same avatar again doesn't download it again.
+
+    Avatars are keyed by discord_id, the hash of the member's avatar and the size they were drawn at.
+    A member who changes their avatar gets a new hash, so their old avatars are simply never asked
+    for again (and are deleted from disk when the new one is stored).
+
+    The most recently used avatars are kept in memory and every avatar is also saved as a PNG in
+    directory so that they survive a restart.
+
+    Usage:
+        avatar = avatar_cache.avatars.get(discord_id, avatar_hash, size)
+        if avatar is None:
+            avatar = ...
+            avatar_cache.avatars.put(discord_id, avatar_hash, size, avatar)
+    """
+
+    def __init__(self, max_in_memory: int, directory: str = None):
+        self.max_in_memory = max(1, max_in_memory)
+        self.directory = directory
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._avatars = OrderedDict()
+
+    def _get_filename(self, discord_id: int, avatar_hash: str, size):
+        size_text = str(round(float(size), 3)).replace(".", "_")
+        return os.path.join(self.directory, f"{discord_id}_{avatar_hash}_{size_text}.png")
+
+    def _remember(self, key: tuple, avatar):
+        self._avatars[key] = avatar
+        self._avatars.move_to_end(key)
+        while len(self._avatars) > self.max_in_memory:
+            self._avatars.popitem(last=False)
+
+    def get(self, discord_id: int, avatar_hash: str, size):
+        """Get a copy of a cached avatar, or None if it hasn't been cached."""
+        key = (discord_id, avatar_hash, size)
+
+        if key in self._avatars:
+            self._avatars.move_to_end(key)
+            self.memory_hits += 1
+            return self._avatars[key].copy()
+
+        if self.directory is not None:
+            filename = self._get_filename(discord_id, avatar_hash, size)
+            if os.path.exists(filename):
+                try:
+                    avatar = Image.open(filename)
+                    avatar.load()
+                    self._remember(key, avatar)
+                    self.disk_hits += 1
+                    return avatar.copy()
+                except OSError as exc:
+                    logging.getLogger('respobot.discord').warning(
+                        f"Could not read the cached avatar {filename}: {exc}"
+                    )
+
+        self.misses += 1
+        return None
+
+    def put(self, discord_id: int, avatar_hash: str, size, avatar):
+        """Cache a copy of an avatar and delete any avatars saved for the member's old avatar hashes."""
+        key = (discord_id, avatar_hash, size)
+        self._remember(key, avatar.copy())
+
+        if self.directory is None:
+            return
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for filename in os.listdir(self.directory):
+                if filename.startswith(f"{discord_id}_") and not filename.startswith(f"{discord_id}_{avatar_hash}_"):
+                    os.remove(os.path.join(self.directory, filename))
+            avatar.save(self._get_filename(discord_id, avatar_hash, size), format='png')
+        except OSError as exc:
+            logging.getLogger('respobot.discord').warning(
+                f"Could not save the avatar for {discord_id} to the avatar cache: {exc}"
+            )
+
+    def __str__(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hit_rate = (self.memory_hits + self.disk_hits) / lookups * 100 if lookups > 0 else 0
+        return (
+            f"Avatar cache: {self.memory_hits} memory hits, {self.disk_hits} disk hits, {self.misses} misses "
+            f"({hit_rate:.1f}% hit rate), {len(self._avatars)} avatars in memory."
+        )
+
+
+# Shared by everything that draws member avatars.
+avatars = AvatarCache(
+    constants.AVATAR_CACHE_MEMORY_SIZE,
+    directory=env.BOT_DIRECTORY + env.DATA_SUBDIRECTORY + constants.AVATAR_CACHE_SUBDIRECTORY
+)
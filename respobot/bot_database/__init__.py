@@ -1,8 +1,12 @@
 # import respobot_logging as log
+import asyncio
 import logging
-import aiosqlite
+import time
 from aiosqlite import Error, OperationalError
 from ._queries import *
+from ._connection_pool import ConnectionPool
+from ._profiler import QueryProfiler
+from ._member_directory import MemberDirectory
 from enum import Enum
 
 
@@ -25,12 +29,92 @@ class BotDatabaseError(Exception):
         super(BotDatabaseError, self).__init__(message)
 
 
+# SQLite result codes (the low byte of extended codes) that mean another connection holds a lock.
+SQLITE_BUSY_CODES = [5, 6]
+
+# Settings applied to every pooled connection when it is opened. journal_mode is stored in the
+# database file itself and is set once by init_tables(). In WAL mode readers work from a snapshot and
+# never wait on the writer, which makes synchronous = NORMAL safe against corruption.
+DEFAULT_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'cache_size': -65536,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000
+}
+
+# How add_laps() stores new laps. 'rows' keeps one row per lap in the 'laps' table. 'columnar' packs
+# each driver's laps for a simsession into one row of the 'lap_blocks' table. get_laps() reads both.
+LAP_STORAGE_MODES = ['rows', 'columnar']
+
+
 class BotDatabase:
     """Class for interfacing with the RespoBot database."""
 
-    def __init__(self, filename, max_retries: int = 0):
+    def __init__(
+        self,
+        filename,
+        max_retries: int = 0,
+        num_readers: int = 4,
+        journal_mode: str = 'WAL',
+        pragmas: dict = None,
+        retry_backoff: float = 0.05,
+        max_retry_backoff: float = 2.0,
+        profile_queries: bool = True,
+        slow_query_threshold: float = 0.25,
+        lap_storage: str = 'rows',
+        archive_directory: str = None
+    ):
+        if lap_storage not in LAP_STORAGE_MODES:
+            raise BotDatabaseError(
+                f"Unknown lap_storage '{lap_storage}'. Must be one of {LAP_STORAGE_MODES}.",
+                ErrorCodes.value_error.value
+            )
+
         self.filename = filename
         self.max_retries = max_retries
+        self.journal_mode = journal_mode
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        if pragmas is not None:
+            self.pragmas.update(pragmas)
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self._pool = ConnectionPool(filename, num_readers=num_readers, pragmas=self.pragmas)
+        self.profiler = QueryProfiler(slow_query_threshold) if profile_queries else None
+        self.member_directory = MemberDirectory()
+        self.lap_storage = lap_storage
+        self.archive_directory = archive_directory
+        self._archive_years = None
+        self.maintenance_history = []
+        self._table_columns = {}
+        self._row_mappers = {}
+
+    async def open_connections(self):
+        """Opens the pooled connections used by every query. Queries will open the pool on
+        first use if this hasn't been called, but calling it at startup surfaces any problem
+        with the database file right away.
+
+        Arguments:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            aiosqlite.Error: Raised if a connection to the database file cannot be opened.
+        """
+        await self._pool.open()
+
+    async def close_connections(self):
+        """Closes the pooled connections after any in-flight queries finish.
+
+        Arguments:
+            None
+
+        Returns:
+            None
+        """
+        await self._pool.close()
 
     async def init_tables(self):
         """Initializes the database tables, creating them and their
@@ -46,6 +130,8 @@ class BotDatabase:
             aiosqlite.Error: Raised for any Error during table/index creation.
         """
         try:
+            await self._set_journal_mode()
+
             if not await self._table_exists('members'):
                 logging.getLogger('respobot.database').info("creating table: members")
                 await self._execute_write_query(CREATE_TABLE_MEMBERS)
@@ -59,13 +145,15 @@ class BotDatabase:
                 logging.getLogger('respobot.database').info("creating table: subsessions")
                 await self._execute_write_query(CREATE_TABLE_SUBSESSIONS)
                 await self._execute_write_query(CREATE_INDEX_SUBSESSIONS_EVENTTYPE_ID)
+                await self._execute_write_query(CREATE_INDEX_SUBSESSIONS_SEASON)
+                await self._execute_write_query(CREATE_INDEX_SUBSESSIONS_END_EPOCH)
 
             if not await self._table_exists('results'):
                 logging.getLogger('respobot.database').info("creating table: results")
                 await self._execute_write_query(CREATE_TABLE_RESULTS)
                 await self._execute_write_query(CREATE_INDEX_RESULTS_SUBID_SESNUM)
                 await self._execute_write_query(CREATE_INDEX_RESULTS_SESNUM_SUBID_CUSTID)
-                await self._execute_write_query(CREATE_INDEX_RESULTS_IRATING_GRAPH)
+                await self._execute_write_query(CREATE_INDEX_RESULTS_MEMBER_RACES)
 
             if not await self._table_exists('subsession_car_classes'):
                 logging.getLogger('respobot.database').info("creating table: subsession_car_classes")
@@ -77,6 +165,19 @@ class BotDatabase:
                 await self._execute_write_query(CREATE_TABLE_LAPS)
                 await self._execute_write_query(CREATE_INDEX_LAPS_SUBID_SESSNUM_CUSTID)
 
+            if not await self._table_exists('lap_blocks'):
+                logging.getLogger('respobot.database').info("creating table: lap_blocks")
+                await self._execute_write_query(CREATE_TABLE_LAP_BLOCKS)
+
+            if not await self._table_exists('archived_subsessions'):
+                logging.getLogger('respobot.database').info("creating table: archived_subsessions")
+                await self._execute_write_query(CREATE_TABLE_ARCHIVED_SUBSESSIONS)
+
+            if not await self._table_exists('archived_latest_irs'):
+                logging.getLogger('respobot.database').info("creating table: archived_latest_irs")
+                await self._execute_write_query(CREATE_TABLE_ARCHIVED_LATEST_IRS)
+                await self._rebuild_archived_latest_irs()
+
             if not await self._table_exists('current_seasons'):
                 logging.getLogger('respobot.database').info("creating table: current_seasons")
                 await self._execute_write_query(CREATE_TABLE_CURRENT_SEASONS)
@@ -104,6 +205,25 @@ class BotDatabase:
             if not await self._table_exists('special_events'):
                 logging.getLogger('respobot.database').info("creating table: special_events")
                 await self._execute_write_query(CREATE_TABLE_SPECIAL_EVENTS)
+
+            if not await self._table_exists('cache_windows'):
+                logging.getLogger('respobot.database').info("creating table: cache_windows")
+                await self._execute_write_query(CREATE_TABLE_CACHE_WINDOWS)
+
+            weekly_champ_points_created = False
+            if not await self._table_exists('weekly_champ_points'):
+                logging.getLogger('respobot.database').info("creating table: weekly_champ_points")
+                await self._execute_write_query(CREATE_TABLE_WEEKLY_CHAMP_POINTS)
+                weekly_champ_points_created = True
+
+            await self.run_migrations()
+
+            self._invalidate_table_info()
+            await self._load_table_info()
+
+            if weekly_champ_points_created:
+                logging.getLogger('respobot.database').info("populating table: weekly_champ_points")
+                await self.refresh_weekly_champ_points()
         except Error:
             logging.getLogger('respobot.database').error("Error initializing database tables.")
             raise
@@ -112,6 +232,50 @@ class BotDatabase:
 
         return self
 
+    async def _set_journal_mode(self):
+        """Switches the database file to self.journal_mode. Unlike the other PRAGMAs, the journal mode
+        persists in the file, so this only needs to happen once at startup.
+
+        Arguments:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            aiosqlite.Error: Raised if the PRAGMA fails.
+        """
+        if self.journal_mode is None:
+            return
+
+        async with self._pool.writer() as connection:
+            async with connection.execute(f"PRAGMA journal_mode = {self.journal_mode}") as cursor:
+                result = await cursor.fetchone()
+
+        if result is None or result[0].upper() != self.journal_mode.upper():
+            logging.getLogger('respobot.database').warning(
+                f"Requested journal_mode {self.journal_mode} but the database reported {result}."
+            )
+        else:
+            logging.getLogger('respobot.database').info(f"Database journal_mode is {result[0]}.")
+
+    async def _wait_before_retry(self, retry_count: int):
+        """Sleeps before retrying a query that failed because the database was busy or locked.
+        The delay doubles with every retry, starting at self.retry_backoff and capped at
+        self.max_retry_backoff.
+
+        Arguments:
+            retry_count (int): The number of attempts made so far.
+
+        Returns:
+            None
+        """
+        if retry_count > self.max_retries:
+            return
+
+        delay = min(self.retry_backoff * 2 ** (retry_count - 1), self.max_retry_backoff)
+        await asyncio.sleep(delay)
+
     async def _table_exists(self, table_name: str):
         """Returns a bool which is True if the table given by table_name exists and False otherwise.
 
@@ -123,7 +287,7 @@ class BotDatabase:
         """
         query = "SELECT name FROM sqlite_master WHERE type='table' AND name = ?"
         parameters = (table_name,)
-        async with aiosqlite.connect(self.filename) as connection:
+        async with self._pool.reader() as connection:
             async with connection.execute(query, parameters) as cursor:
                 try:
                     result = await cursor.fetchall()
@@ -148,54 +312,129 @@ class BotDatabase:
             None.
 
         Raises:
-            BotDatabaseError: Raised for max_retries exceeded.
+            BotDatabaseError: Raised for max_retries exceeded. Retries back off exponentially.
             aiosqlite.OperationalError: Raised for any sqlite OperationalError except 5 (BUSY) or 6 (LOCKED).
             aiosqlite.Error: Raised for any sqlite Error.
         """
+        call_site = QueryProfiler.get_call_site()
+        time_started = time.perf_counter()
         retry_count = 0
+        rows = None
+        failed = True
 
-        while retry_count <= self.max_retries:
-            retry_count += 1
-
-            try:
-                async with aiosqlite.connect(self.filename) as connection:
-                    async with connection.cursor() as cursor:
-                        if params is None:
-                            await cursor.execute(query)
-                        elif isinstance(params, tuple):
-                            await cursor.execute(query, params)
-                        elif isinstance(params, list):
-                            await cursor.executemany(query, params)
-                        else:
-                            raise Error(
-                                "If you pass params into _execute_write_query() they must be a tuple "
-                                "or a list of tuples."
-                            )
-                        await connection.commit()
-                        return
-            except OperationalError as exc:
-                if exc.sqlite_errorcode == 5 or exc.sqlite_errorcode == 6:
-                    logging.getLogger('respobot.database').warning(
-                        f"sqlite query failed due to sqlite error code {exc.sqlite_errorcode}: {exc.sqlite_errorname}"
-                    )
-                else:
+        try:
+            while retry_count <= self.max_retries:
+                retry_count += 1
+
+                try:
+                    async with self._pool.writer() as connection:
+                        async with connection.cursor() as cursor:
+                            if params is None:
+                                await cursor.execute(query)
+                            elif isinstance(params, tuple):
+                                await cursor.execute(query, params)
+                            elif isinstance(params, list):
+                                await cursor.executemany(query, params)
+                            else:
+                                raise Error(
+                                    "If you pass params into _execute_write_query() they must be a tuple "
+                                    "or a list of tuples."
+                                )
+                            await connection.commit()
+                            rows = cursor.rowcount
+                            failed = False
+                            return
+                except OperationalError as exc:
+                    if exc.sqlite_errorcode & 0xFF in SQLITE_BUSY_CODES:
+                        logging.getLogger('respobot.database').warning(
+                            f"sqlite query failed due to sqlite error code {exc.sqlite_errorcode}: "
+                            f"{exc.sqlite_errorname}"
+                        )
+                        await self._wait_before_retry(retry_count)
+                    else:
+                        logging.getLogger('respobot.database').error(
+                            f"The sqlite3 error '{exc}' occurred with code {exc.sqlite_errorcode} when running "
+                            f"_execute_write_query() with query:\n{query}\nwith params:\n{params}"
+                        )
+                        raise exc
+                except Error as exc:
                     logging.getLogger('respobot.database').error(
                         f"The sqlite3 error '{exc}' occurred with code {exc.sqlite_errorcode} when running "
                         f"_execute_write_query() with query:\n{query}\nwith params:\n{params}"
                     )
                     raise exc
-            except Error as exc:
-                logging.getLogger('respobot.database').error(
-                    f"The sqlite3 error '{exc}' occurred with code {exc.sqlite_errorcode} when running "
-                    f"_execute_write_query() with query:\n{query}\nwith params:\n{params}"
-                )
-                raise exc
-        raise BotDatabaseError(
-            "_execute_write_query() hit the max_retries count. Query abandoned.",
-            ErrorCodes.max_retries_exceeded.value
-        )
+            raise BotDatabaseError(
+                "_execute_write_query() hit the max_retries count. Query abandoned.",
+                ErrorCodes.max_retries_exceeded.value
+            )
+        finally:
+            await self._profile_query(call_site, time_started, retry_count, rows, failed, query=query, params=params)
+
+    async def _execute_write_transaction(self, transaction, description: str = "a transaction"):
+        """Runs several statements on the writer connection and commits them together, so a whole
+        batch costs one commit instead of one per statement.
+
+        Arguments:
+            transaction: An async function that takes the aiosqlite.Connection and issues its
+                         statements on it. It may be called again if the database is busy, so it
+                         must not have side effects outside the database.
+
+        Keyword arguments:
+            description (str): What the transaction does. Only used in log messages.
+
+        Returns:
+            Whatever transaction returns.
 
-    async def _execute_read_query(self, query, params=None):
+        Raises:
+            BotDatabaseError: Raised for max_retries exceeded. Retries back off exponentially.
+            aiosqlite.OperationalError: Raised for any sqlite OperationalError except 5 (BUSY) or 6 (LOCKED).
+            aiosqlite.Error: Raised for any sqlite Error. Nothing from the transaction is committed.
+        """
+        call_site = QueryProfiler.get_call_site()
+        time_started = time.perf_counter()
+        retry_count = 0
+        rows = None
+        failed = True
+
+        try:
+            while retry_count <= self.max_retries:
+                retry_count += 1
+
+                try:
+                    async with self._pool.writer() as connection:
+                        changes_before = connection.total_changes
+                        result = await transaction(connection)
+                        await connection.commit()
+                        rows = connection.total_changes - changes_before
+                        failed = False
+                        return result
+                except OperationalError as exc:
+                    if exc.sqlite_errorcode & 0xFF in SQLITE_BUSY_CODES:
+                        logging.getLogger('respobot.database').warning(
+                            f"sqlite query failed due to sqlite error code {exc.sqlite_errorcode}: "
+                            f"{exc.sqlite_errorname}"
+                        )
+                        await self._wait_before_retry(retry_count)
+                    else:
+                        logging.getLogger('respobot.database').error(
+                            f"The sqlite3 error '{exc}' occurred with code {exc.sqlite_errorcode} when running "
+                            f"_execute_write_transaction() for {description}."
+                        )
+                        raise exc
+                except Error as exc:
+                    logging.getLogger('respobot.database').error(
+                        f"The sqlite3 error '{exc}' occurred with code {exc.sqlite_errorcode} when running "
+                        f"_execute_write_transaction() for {description}."
+                    )
+                    raise exc
+            raise BotDatabaseError(
+                "_execute_write_transaction() hit the max_retries count. Transaction abandoned.",
+                ErrorCodes.max_retries_exceeded.value
+            )
+        finally:
+            await self._profile_query(call_site, time_started, retry_count, rows, failed, description=description)
+
+    async def _execute_read_query(self, query, params=None, attach: tuple = None, call_site: str = None):
         """Executes the provided query. Used for SELECT queries.
 
         Arguments:
@@ -204,58 +443,264 @@ class BotDatabase:
         Keyword arguments:
             params (tuple): An optional tuple of values for any ? placeholders in the query. len(params) must equal
                             the number of ? placeholders in the query string.
+            attach (tuple): An optional (schema_name, filename) of a database the query reads from, which will be
+                            attached to the reader connection if it isn't already.
+            call_site (str): The function to record the query under in the profiler. Wrappers pass their own
+                             caller's name here. Defaults to the function that called this one.
 
         Returns:
             A list of tuples where each tuple is one row in the query result. The length of the tuples is determined
             by the columns chosen in the SELECT query.
 
         Raises:
-            BotDatabaseError: Raised for max_retries exceeded.
+            BotDatabaseError: Raised for max_retries exceeded. Retries back off exponentially.
             aiosqlite.OperationalError: Raised for any sqlite OperationalError except 5 (BUSY) or 6 (LOCKED).
             aiosqlite.Error: Raised for any sqlite Error.
         """
+        if call_site is None:
+            call_site = QueryProfiler.get_call_site()
+        time_started = time.perf_counter()
         retry_count = 0
+        rows = None
+        failed = True
 
-        while retry_count <= self.max_retries:
-            retry_count += 1
-            try:
-                async with aiosqlite.connect(self.filename) as connection:
-                    async with connection.cursor() as cursor:
-                        result = None
-                        if params is None:
-                            await cursor.execute(query)
-                        elif isinstance(params, tuple):
-                            await cursor.execute(query, params)
-                        elif isinstance(params, list):
-                            await cursor.executemany(query, params)
-                        else:
-                            raise Error(
-                                "If you pass params into _execute_read_query() they must be a tuple "
-                                "or a list of tuples."
-                            )
-                        result = await cursor.fetchall()
-                        return result
-            except OperationalError as exc:
-                if exc.sqlite_errorcode == 5 or exc.sqlite_errorcode == 6:
-                    logging.getLogger('respobot.database').warning(
-                        f"sqlite query failed due to sqlite error code {exc.sqlite_errorcode}: {exc.sqlite_errorname}"
-                    )
-                else:
+        try:
+            while retry_count <= self.max_retries:
+                retry_count += 1
+                try:
+                    async with self._pool.reader(attach=attach) as connection:
+                        async with connection.cursor() as cursor:
+                            result = None
+                            if params is None:
+                                await cursor.execute(query)
+                            elif isinstance(params, tuple):
+                                await cursor.execute(query, params)
+                            elif isinstance(params, list):
+                                await cursor.executemany(query, params)
+                            else:
+                                raise Error(
+                                    "If you pass params into _execute_read_query() they must be a tuple "
+                                    "or a list of tuples."
+                                )
+                            result = await cursor.fetchall()
+                            rows = len(result)
+                            failed = False
+                            return result
+                except OperationalError as exc:
+                    if exc.sqlite_errorcode & 0xFF in SQLITE_BUSY_CODES:
+                        logging.getLogger('respobot.database').warning(
+                            f"sqlite query failed due to sqlite error code {exc.sqlite_errorcode}: "
+                            f"{exc.sqlite_errorname}"
+                        )
+                        await self._wait_before_retry(retry_count)
+                    else:
+                        logging.getLogger('respobot.database').error(
+                            f"The sqlite3 error '{exc}' occurred with code {exc.sqlite_errorcode} when running "
+                            f"_execute_read_query() with query:\n{query}\nwith params:\n{params}"
+                        )
+                        raise exc
+                except Error as e:
                     logging.getLogger('respobot.database').error(
-                        f"The sqlite3 error '{exc}' occurred with code {exc.sqlite_errorcode} when running "
+                        f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} when running "
                         f"_execute_read_query() with query:\n{query}\nwith params:\n{params}"
                     )
-                    raise exc
-            except Error as e:
-                logging.getLogger('respobot.database').error(
-                    f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} when running "
-                    f"_execute_read_query() with query:\n{query}\nwith params:\n{params}"
-                )
-                raise e
-        raise BotDatabaseError(
-            "_execute_read_query() hit the max_retries count. Query abandoned.",
-            ErrorCodes.max_retries_exceeded.value
+                    raise e
+            raise BotDatabaseError(
+                "_execute_read_query() hit the max_retries count. Query abandoned.",
+                ErrorCodes.max_retries_exceeded.value
+            )
+        finally:
+            await self._profile_query(call_site, time_started, retry_count, rows, failed, query=query, params=params)
+
+    async def _profile_query(
+        self,
+        call_site: str,
+        time_started: float,
+        retry_count: int,
+        rows: int,
+        failed: bool,
+        query: str = None,
+        params=None,
+        description: str = None
+    ):
+        """Records a finished query in self.profiler and logs it along with its query plan if it was slow.
+
+        Arguments:
+            call_site (str): The function that ran the query, from QueryProfiler.get_call_site().
+            time_started (float): time.perf_counter() from before the first attempt.
+            retry_count (int): The number of attempts made.
+            rows (int): The number of rows returned or changed. None if unknown.
+            failed (bool): True if the query raised.
+
+        Keyword arguments:
+            query (str): The query that was run. Used to get the query plan.
+            params: The params the query was run with.
+            description (str): What a transaction does, used instead of query for transactions.
+
+        Returns:
+            None.
+        """
+        if self.profiler is None:
+            return
+
+        duration = time.perf_counter() - time_started
+        slow = self.profiler.record(
+            call_site,
+            duration,
+            rows=rows,
+            retries=max(0, retry_count - 1),
+            failed=failed
+        )
+
+        if not slow:
+            return
+
+        message = (
+            f"Slow query in {call_site}: {duration * 1000:.1f} ms, {rows} rows, "
+            f"{max(0, retry_count - 1)} retries."
         )
+        if description is not None:
+            message += f" Transaction: {description}."
+        if query is not None:
+            message += f"\nQuery:\n{query}"
+            query_plan = await self._get_query_plan(query, params)
+            if query_plan is not None:
+                message += f"\nQuery plan:\n{query_plan}"
+        logging.getLogger('respobot.database').warning(message)
+
+    async def _get_query_plan(self, query: str, params=None):
+        """Runs EXPLAIN QUERY PLAN for the provided query on a reader connection. Plans are cached by
+        query text, so each slow query is only explained once until the profiler is reset.
+
+        Arguments:
+            query (str): The query to explain.
+
+        Keyword arguments:
+            params (tuple): The params for any ? placeholders in the query.
+
+        Returns:
+            The plan as an indented str, or None if it couldn't be explained.
+        """
+        if query in self.profiler.query_plans:
+            return self.profiler.query_plans[query]
+
+        if isinstance(params, list):
+            # executemany() queries are explained with their first set of params.
+            params = params[0] if len(params) > 0 else None
+
+        try:
+            async with self._pool.reader() as connection:
+                async with connection.execute(
+                    "EXPLAIN QUERY PLAN " + query,
+                    params if params is not None else ()
+                ) as cursor:
+                    plan_rows = await cursor.fetchall()
+        except Error as exc:
+            logging.getLogger('respobot.database').debug(f"Could not get the query plan for a slow query: {exc}")
+            return None
+
+        depths = {0: -1}
+        plan_lines = []
+        for (node_id, parent_id, _, detail) in plan_rows:
+            depths[node_id] = depths.get(parent_id, -1) + 1
+            plan_lines.append("    " * depths[node_id] + detail)
+
+        query_plan = "\n".join(plan_lines)
+        self.profiler.query_plans[query] = query_plan
+        return query_plan
+
+    def _invalidate_table_info(self, table_name: str = None):
+        """Forgets the cached column layout for a table, or for every table if table_name is None.
+        Must be called after any schema change so row mapping picks up the new columns.
+
+        Keyword arguments:
+            table_name (str): The name of the table whose layout changed.
+
+        Returns:
+            None
+        """
+        if table_name is None:
+            self._table_columns.clear()
+            self._row_mappers.clear()
+            return
+
+        self._table_columns.pop(table_name, None)
+        for mapper_key in [key for key in self._row_mappers if key[0] == table_name]:
+            self._row_mappers.pop(mapper_key)
+
+    async def _load_table_info(self, table_name: str = None):
+        """Caches the column names of a table, or of every table in the database if table_name is None,
+        using PRAGMA table_info.
+
+        Keyword arguments:
+            table_name (str): The name of the table to load.
+
+        Returns:
+            None
+
+        Raises:
+            BotDatabaseError: Raised if the table info can't be read from the database.
+        """
+        try:
+            if table_name is None:
+                table_name_tuples = await self._execute_read_query(
+                    "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+                )
+                table_names = [table_name_tuple[0] for table_name_tuple in table_name_tuples]
+            else:
+                table_names = [table_name]
+
+            for name in table_names:
+                table_column_tuples = await self._execute_read_query(f"PRAGMA table_info({name})")
+                self._table_columns[name] = tuple(
+                    table_column_tuple[1] for table_column_tuple in table_column_tuples
+                )
+        except Error as e:
+            logging.getLogger('respobot.database').error(
+                f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} when trying to "
+                f"get the table info for {table_name} during _load_table_info()"
+            )
+            raise BotDatabaseError(
+                f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} when trying to "
+                f"get the table info for {table_name} during _load_table_info()"
+            )
+
+    async def _get_row_mapper(self, table_name: str, extra_columns: tuple = ()):
+        """Returns a function that converts one "SELECT * FROM table_name" row tuple (optionally followed by
+        extra_columns) to a dict. Mappers are built once per table and set of extra columns.
+
+        Arguments:
+            table_name (str): The name of the table the rows come from.
+
+        Keyword arguments:
+            extra_columns (tuple): Names for any values selected after the table's own columns.
+
+        Returns:
+            A function taking a row tuple and returning a dict keyed by column name.
+
+        Raises:
+            BotDatabaseError: Raised if the table info can't be loaded.
+        """
+        mapper_key = (table_name, tuple(extra_columns))
+
+        if mapper_key in self._row_mappers:
+            return self._row_mappers[mapper_key]
+
+        if table_name not in self._table_columns:
+            await self._load_table_info(table_name)
+
+        keys = self._table_columns[table_name] + tuple(extra_columns)
+        num_keys = len(keys)
+
+        def map_row(query_result_tuple):
+            if len(query_result_tuple) != num_keys:
+                raise BotDatabaseError(
+                    f"Error mapping tuple to dict, tuple length does not match number of columns in {table_name}."
+                )
+            return dict(zip(keys, query_result_tuple))
+
+        self._row_mappers[mapper_key] = map_row
+        return map_row
 
     async def _map_tuples_to_dicts(self, query_result_tuples: list, table_name: str, extra_columns: list = []):
         """Maps row tuples returned from a SELECT query to a dict object where each key-value pair
@@ -275,45 +720,37 @@ class BotDatabase:
             BotDatabaseError: Raised if checking the database for table_name fails or if the length of a
                               tuple in query_result_tuples does not match the number of columns in the table.
         """
-        query = f"PRAGMA table_info({table_name})"
-
         if query_result_tuples is None or len(query_result_tuples) < 1:
             return None
 
-        try:
-            table_column_tuples = await self._execute_read_query(query)
-        except Error as e:
-            logging.getLogger('respobot.database').error(
-                f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} when trying to "
-                f"get the table info for {table_name} during map_tuples_to_dict()"
-            )
-            raise BotDatabaseError(
-                f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} when trying to "
-                f"get the table info for {table_name} during map_tuples_to_dict()"
-            )
+        map_row = await self._get_row_mapper(table_name, extra_columns)
 
-        query_result_dicts = []
-        for query_result_tuple in query_result_tuples:
-            if len(table_column_tuples) != len(query_result_tuple) - len(extra_columns):
-                raise BotDatabaseError(
-                    f"Error mapping tuple to dict, tuple length does not match number of columns in {table_name}."
-                )
+        return [map_row(query_result_tuple) for query_result_tuple in query_result_tuples]
 
-            new_query_result_dict = {}
-            columns_mapped = 0
-            for table_column_tuple in table_column_tuples:
-                index = table_column_tuple[1]
-                new_query_result_dict[index] = query_result_tuple[columns_mapped]
-                columns_mapped += 1
-            for extra_column in extra_columns:
-                new_query_result_dict[extra_column] = query_result_tuple[columns_mapped]
-                columns_mapped += 1
-            query_result_dicts.append(new_query_result_dict)
+    from ._migrations import (
+        get_schema_version,
+        run_migrations,
+        _add_column_if_missing,
+        _backfill_in_chunks
+    )
 
-        return query_result_dicts
+    from ._maintenance import (
+        optimize,
+        backup,
+        run_maintenance
+    )
+
+    from ._archive import (
+        get_archive_years,
+        _get_archive_filename,
+        _execute_archived_read_query,
+        _rebuild_archived_latest_irs,
+        archive_season_year
+    )
 
     from ._subsessions import (
         add_subsessions,
+        add_subsessions_batch,
         get_subsession_data,
         is_subsession_multiclass,
         get_subsession_drivers_old_irs,
@@ -327,7 +764,8 @@ class BotDatabase:
     from ._laps import (
         add_laps,
         get_laps,
-        is_subsession_in_laps_table
+        is_subsession_in_laps_table,
+        convert_laps_to_columnar
     )
 
     from ._results import (
@@ -364,6 +802,7 @@ class BotDatabase:
     )
 
     from ._members import (
+        _get_member_directory,
         fetch_guild_member_ids,
         fetch_iracing_cust_ids,
         fetch_name,
@@ -383,9 +822,12 @@ class BotDatabase:
 
     from ._stats import (
         get_latest_ir,
+        get_latest_irs,
         get_ir_data,
         get_race_incidents_and_corners,
         get_member_race_results,
+        get_race_totals_by_member,
+        get_member_head2head_stats,
         get_member_official_race_subsession_ids,
         get_member_series_raced
     )
@@ -408,3 +850,14 @@ class BotDatabase:
     from ._current_car_classes import (
         get_car_class_num_cars
     )
+
+    from ._champ_points import (
+        refresh_weekly_champ_points,
+        get_weekly_champ_points
+    )
+
+    from ._cache_windows import (
+        get_completed_cache_windows,
+        set_cache_window_completed,
+        clear_cache_windows
+    )
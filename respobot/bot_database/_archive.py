@@ -0,0 +1,378 @@
+"""
+/bot_database/_archive.py
+
+Methods that move completed season years out of the main database file and into one archive
+file per season year.
+
+Every race a member has run since 2008 lives in the 'subsessions', 'results',
+'subsession_car_classes', 'laps' and 'lap_blocks' tables, but almost every command only looks at
+the current season. archive_season_year() moves all of a past year's rows into
+archive_directory/archive_YYYY.db, which has the same tables and indexes as the main database,
+and records the ids it moved in the 'archived_subsessions' table so those races are never
+downloaded again. That keeps the main file, its B-trees and its backups small. Everyone's latest
+iRating from the archived races is kept in the 'archived_latest_irs' table in the main database, so
+get_latest_ir() and get_latest_irs() never need to open an archive.
+
+Archives are attached to a reader connection only when a query needs them.
+_execute_archived_read_query() runs a query against the main database and every archive its
+season filter reaches, one database at a time so any number of years can be archived. The
+queries behind career stats and graphs (get_ir_data(), the CPI queries, get_member_race_results(),
+get_member_head2head_stats(), get_race_totals_by_member(), get_member_series_raced() and
+get_member_official_race_subsession_ids()) read archives this way.
+Everything else, such as race reports and the weekly_champ_points table, only ever looks at the
+main database.
+"""
+
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from aiosqlite import Error
+from ._queries import *
+from ._profiler import QueryProfiler
+from irslashdata import constants as irConstants
+from bot_database import BotDatabaseError, ErrorCodes
+
+
+# The tables whose rows are moved into archives. Every one of them has a subsession_id column.
+ARCHIVE_TABLES = ['subsessions', 'results', 'subsession_car_classes', 'laps', 'lap_blocks']
+
+# How many subsessions archive_season_year() moves per transaction.
+ARCHIVE_BATCH_SIZE = 200
+
+ARCHIVE_FILENAME_PATTERN = re.compile(r"^archive_(\d{4})\.db$")
+
+
+def _archive_schema_name(season_year: int):
+    return f"archive_{int(season_year)}"
+
+
+def _get_archive_filename(self, season_year: int):
+    return os.path.join(self.archive_directory, f"archive_{int(season_year)}.db")
+
+
+def get_archive_years(self):
+    """Get the season years that have an archive file in archive_directory.
+
+    Returns:
+        A sorted list of ints. Empty if archiving is turned off.
+    """
+    if self.archive_directory is None:
+        return []
+
+    if self._archive_years is None:
+        archive_years = []
+        if os.path.isdir(self.archive_directory):
+            for filename in os.listdir(self.archive_directory):
+                match = ARCHIVE_FILENAME_PATTERN.match(filename)
+                if match is not None:
+                    archive_years.append(int(match.group(1)))
+        self._archive_years = sorted(archive_years)
+
+    return list(self._archive_years)
+
+
+async def _execute_archived_read_query(
+    self,
+    query: str,
+    params: tuple = None,
+    season_year: int = None,
+    include_main: bool = True
+):
+    """Run a SELECT query against each archive that the season filter reaches and then against the
+    main database. Tables in the query must be written as {schema}.table_name so that they can be
+    pointed at each database in turn.
+
+    Arguments:
+        query (str): The query to execute.
+
+    Keyword arguments:
+        params (tuple): An optional tuple of values for any ? placeholders in the query.
+        season_year (int): If the query only covers one season year, only the archive for
+                           that year is read. Otherwise every archive is read.
+        include_main (bool): If False, only archives are read.
+
+    Returns:
+        A list with the result of the query from each database, oldest archive first and the
+        main database last.
+
+    Raises:
+        BotDatabaseError: Raised for max_retries exceeded.
+        aiosqlite.Error: Raised for any sqlite Error.
+    """
+    # Record every partition under the function that asked for the data rather than under this one.
+    call_site = QueryProfiler.get_call_site()
+
+    archive_years = self.get_archive_years()
+    if season_year is not None:
+        archive_years = [archive_year for archive_year in archive_years if archive_year == season_year]
+
+    results = []
+    for archive_year in archive_years:
+        schema_name = _archive_schema_name(archive_year)
+        results.append(
+            await self._execute_read_query(
+                query.replace("{schema}", schema_name),
+                params=params,
+                attach=(schema_name, self._get_archive_filename(archive_year)),
+                call_site=call_site
+            )
+        )
+
+    if include_main:
+        results.append(
+            await self._execute_read_query(query.replace("{schema}", "main"), params=params, call_site=call_site)
+        )
+    return results
+
+
+async def _update_archived_latest_irs(connection, schema_name: str, subsession_ids: list = None):
+    """Record the latest iRating in each license category of everyone who raced in the provided
+    subsessions in the 'archived_latest_irs' table, unless it already has a newer one. This runs on
+    the connection it is given so that it can share a transaction with the move into the archive.
+    The caller is responsible for committing.
+
+    Arguments:
+        schema_name (str): The attached database to read the races from.
+
+    Keyword arguments:
+        subsession_ids (list): The subsessions to read. If None, every subsession is read.
+
+    Returns:
+        None.
+    """
+    query = f"""
+        INSERT OR REPLACE INTO main.archived_latest_irs (
+            cust_id,
+            license_category_id,
+            end_epoch,
+            subsession_id,
+            newi_rating
+        )
+        SELECT
+            latest.cust_id,
+            latest.license_category_id,
+            latest.end_epoch,
+            latest.subsession_id,
+            latest.newi_rating
+        FROM (
+            SELECT
+                results.cust_id,
+                subsessions.license_category_id,
+                subsessions.end_epoch,
+                results.subsession_id,
+                results.newi_rating,
+                ROW_NUMBER() OVER (
+                    PARTITION BY results.cust_id, subsessions.license_category_id
+                    ORDER BY subsessions.end_epoch DESC, results.subsession_id DESC
+                ) AS latest_rank
+            FROM {schema_name}.results AS results
+            INNER JOIN {schema_name}.subsessions AS subsessions
+            ON subsessions.subsession_id = results.subsession_id
+            WHERE
+                subsessions.official_session = 1 AND
+                results.simsession_type = ? AND
+                results.newi_rating > 0"""
+    parameters = (irConstants.SimSessionType.race.value,)
+
+    if subsession_ids is not None:
+        query += f" AND results.subsession_id IN ({', '.join('?' * len(subsession_ids))})"
+        parameters += tuple(subsession_ids)
+
+    query += """
+        ) AS latest
+        LEFT JOIN main.archived_latest_irs AS existing
+        ON existing.cust_id = latest.cust_id AND existing.license_category_id = latest.license_category_id
+        WHERE
+            latest.latest_rank = 1 AND
+            (
+                existing.cust_id IS NULL OR
+                existing.end_epoch < latest.end_epoch OR
+                (existing.end_epoch = latest.end_epoch AND existing.subsession_id < latest.subsession_id)
+            )
+    """
+
+    await connection.execute(query, parameters)
+
+
+async def _rebuild_archived_latest_irs(self):
+    """Fill the 'archived_latest_irs' table from every archive file. Only needed for archives made
+    before the table existed, since archive_season_year() keeps it up to date.
+
+    Raises:
+        aiosqlite.Error: Raised for any sqlite Error.
+    """
+    for archive_year in self.get_archive_years():
+        schema_name = _archive_schema_name(archive_year)
+        await self._execute_write_query(
+            f"ATTACH DATABASE ? AS {schema_name}",
+            params=(self._get_archive_filename(archive_year),)
+        )
+
+        async def update_latest_irs(connection):
+            await _update_archived_latest_irs(connection, schema_name)
+
+        try:
+            await self._execute_write_transaction(
+                update_latest_irs,
+                description=f"rebuilding archived_latest_irs from the {archive_year} archive"
+            )
+        finally:
+            await self._execute_write_query(f"DETACH DATABASE {schema_name}")
+
+    logging.getLogger('respobot.database').info(
+        f"Rebuilt archived_latest_irs from {len(self.get_archive_years())} archives."
+    )
+
+
+async def archive_season_year(self, season_year: int, batch_size: int = ARCHIVE_BATCH_SIZE):
+    """Move every subsession from a past season year, along with its results, car classes and laps,
+    out of the main database and into that year's archive file. Each batch of subsessions is copied
+    and deleted in one transaction, along with recording the latest iRatings it contains in
+    'archived_latest_irs', so the move can be interrupted and run again. The main database file only
+    shrinks after a VACUUM.
+
+    Arguments:
+        season_year (int): The season year to archive. It must be before the current year.
+
+    Keyword arguments:
+        batch_size (int): How many subsessions to move per transaction.
+
+    Returns:
+        A dict of the form:
+        {
+            "subsessions": int,
+            "rows": int
+        }
+
+    Raises:
+        BotDatabaseError: Raised for any error. Batches moved before the error stay in the archive.
+    """
+    if self.archive_directory is None:
+        raise BotDatabaseError(
+            "archive_season_year() needs the database to be opened with an archive_directory.",
+            ErrorCodes.insufficient_info.value
+        )
+
+    if season_year >= datetime.now(timezone.utc).year:
+        raise BotDatabaseError(
+            f"Season year {season_year} isn't over yet and can't be archived.",
+            ErrorCodes.value_error.value
+        )
+
+    os.makedirs(self.archive_directory, exist_ok=True)
+    schema_name = _archive_schema_name(season_year)
+    subsessions_moved = 0
+    rows_moved = 0
+
+    try:
+        # ATTACH can't run inside a transaction, so the archive stays attached to the writer for
+        # the whole move. Every other write names main tables without a schema, which SQLite
+        # always resolves to main first.
+        await self._execute_write_query(
+            f"ATTACH DATABASE ? AS {schema_name}",
+            params=(self._get_archive_filename(season_year),)
+        )
+
+        try:
+            table_columns = {}
+            for table_name in ARCHIVE_TABLES:
+                column_tuples = await self._execute_read_query(f"PRAGMA main.table_info('{table_name}')")
+                table_columns[table_name] = ", ".join(f"\"{column_tuple[1]}\"" for column_tuple in column_tuples)
+
+            # Build the archive from the main database's own schema so that it picks up any migrations.
+            schema_tuples = await self._execute_read_query(
+                f"""
+                    SELECT type, sql
+                    FROM main.sqlite_master
+                    WHERE
+                        tbl_name IN ({", ".join("?" * len(ARCHIVE_TABLES))}) AND
+                        sql IS NOT NULL
+                    ORDER BY type = 'index'
+                """,
+                params=tuple(ARCHIVE_TABLES)
+            )
+            for (_, create_statement) in schema_tuples:
+                await self._execute_write_query(
+                    re.sub(
+                        r"^CREATE (UNIQUE )?(TABLE|INDEX) (IF NOT EXISTS )?",
+                        f"CREATE \\1\\2 IF NOT EXISTS {schema_name}.",
+                        create_statement.strip()
+                    )
+                )
+
+            while True:
+                subsession_tuples = await self._execute_read_query(
+                    """
+                        SELECT subsession_id
+                        FROM main.subsessions
+                        WHERE season_year = ?
+                        ORDER BY subsession_id
+                        LIMIT ?
+                    """,
+                    params=(season_year, max(1, batch_size))
+                )
+
+                if subsession_tuples is None or len(subsession_tuples) < 1:
+                    break
+
+                subsession_ids = [subsession_tuple[0] for subsession_tuple in subsession_tuples]
+                placeholders = ", ".join("?" * len(subsession_ids))
+
+                async def move_batch(connection):
+                    await _update_archived_latest_irs(connection, "main", subsession_ids)
+                    batch_rows = 0
+                    for table_name in ARCHIVE_TABLES:
+                        cursor = await connection.execute(
+                            f"""
+                                INSERT INTO {schema_name}.{table_name} ({table_columns[table_name]})
+                                SELECT {table_columns[table_name]}
+                                FROM main.{table_name}
+                                WHERE subsession_id IN ({placeholders})
+                            """,
+                            subsession_ids
+                        )
+                        batch_rows += cursor.rowcount
+                        await connection.execute(
+                            f"DELETE FROM main.{table_name} WHERE subsession_id IN ({placeholders})",
+                            subsession_ids
+                        )
+                    await connection.executemany(
+                        INSERT_ARCHIVED_SUBSESSIONS,
+                        [(subsession_id, season_year) for subsession_id in subsession_ids]
+                    )
+                    return batch_rows
+
+                rows_moved += await self._execute_write_transaction(
+                    move_batch,
+                    description=f"archive_season_year() for {season_year}, subsessions {subsession_ids}"
+                )
+                subsessions_moved += len(subsession_ids)
+
+                logging.getLogger('respobot.database').info(
+                    f"Archiving {season_year}: {subsessions_moved} subsessions and {rows_moved} rows moved so far."
+                )
+        finally:
+            await self._execute_write_query(f"DETACH DATABASE {schema_name}")
+    except Error as e:
+        logging.getLogger('respobot.database').error(
+            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
+            f"archive_season_year() for {season_year}."
+        )
+        raise BotDatabaseError(
+            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
+            f"archive_season_year() for {season_year}.",
+            ErrorCodes.general_failure.value
+        )
+
+    self._archive_years = None
+
+    logging.getLogger('respobot.database').info(
+        f"Archived {subsessions_moved} subsessions ({rows_moved} rows) from {season_year} "
+        f"to {self._get_archive_filename(season_year)}."
+    )
+
+    return {
+        "subsessions": subsessions_moved,
+        "rows": rows_moved
+    }
@@ -0,0 +1,145 @@
+"""
+/bot_database/_cache_windows.py
+
+Methods that mainly interact with the 'cache_windows' table, which records the month
+windows of each member's history that cache_races() has finished caching.
+"""
+
+import logging
+from aiosqlite import Error
+from datetime import datetime, timezone
+from ._queries import *
+from bot_database import BotDatabaseError, ErrorCodes
+
+
+async def get_completed_cache_windows(self, iracing_custid: int):
+    """Get every month window of a member's history that has already been cached.
+
+    Arguments:
+        iracing_custid (int): The id of the member.
+
+    Returns:
+        A dict keyed by the window start datetime. Each value is the end time of the latest
+        subsession found in that window as a datetime, or None if the window had no subsessions.
+
+    Raises:
+        BotDatabaseError: Raised for any error.
+    """
+    query = """
+        SELECT window_start, latest_end_time
+        FROM cache_windows
+        WHERE iracing_custid = ?
+    """
+    parameters = (iracing_custid,)
+
+    try:
+        result_tuples = await self._execute_read_query(query, params=parameters)
+    except Error as e:
+        logging.getLogger('respobot.database').error(
+            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
+            f"get_completed_cache_windows() for iracing_custid = {iracing_custid}."
+        )
+        raise BotDatabaseError(
+            (
+                f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
+                f"get_completed_cache_windows() for iracing_custid = {iracing_custid}."
+            ),
+            ErrorCodes.general_failure.value
+        )
+
+    completed_windows = {}
+    for (window_start, latest_end_time) in result_tuples:
+        if latest_end_time is not None:
+            latest_end_time = datetime.fromisoformat(latest_end_time)
+        completed_windows[datetime.fromisoformat(window_start)] = latest_end_time
+
+    return completed_windows
+
+
+async def set_cache_window_completed(
+    self,
+    iracing_custid: int,
+    window_start: datetime,
+    subsession_count: int,
+    latest_end_time: datetime = None
+):
+    """Record that a month window of a member's history has been cached so that it is skipped
+    if cache_races() is interrupted and run again.
+
+    Arguments:
+        iracing_custid (int): The id of the member.
+        window_start (datetime): The start of the window.
+        subsession_count (int): The number of subsessions found in the window.
+
+    Keyword arguments:
+        latest_end_time (datetime): The end time of the latest subsession found in the window.
+
+    Returns:
+        None.
+
+    Raises:
+        BotDatabaseError: Raised for any error.
+    """
+    if latest_end_time is None:
+        latest_end_time_str = None
+    else:
+        latest_end_time_str = latest_end_time.isoformat().replace('+00:00', 'Z')
+
+    parameters = (
+        iracing_custid,
+        window_start.isoformat().replace('+00:00', 'Z'),
+        subsession_count,
+        latest_end_time_str,
+        datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
+    )
+
+    try:
+        await self._execute_write_query(INSERT_CACHE_WINDOW, params=parameters)
+    except Error as e:
+        logging.getLogger('respobot.database').error(
+            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
+            f"set_cache_window_completed() for iracing_custid = {iracing_custid}, window_start = {window_start}."
+        )
+        raise BotDatabaseError(
+            (
+                f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
+                f"set_cache_window_completed() for iracing_custid = {iracing_custid}, "
+                f"window_start = {window_start}."
+            ),
+            ErrorCodes.general_failure.value
+        )
+
+
+async def clear_cache_windows(self, iracing_custid: int = None):
+    """Forget which month windows have been cached so the next cache_races() starts from scratch.
+
+    Keyword arguments:
+        iracing_custid (int): The id of the member to clear. If None, windows are cleared for every member.
+
+    Returns:
+        None.
+
+    Raises:
+        BotDatabaseError: Raised for any error.
+    """
+    if iracing_custid is None:
+        query = "DELETE FROM cache_windows"
+        parameters = ()
+    else:
+        query = "DELETE FROM cache_windows WHERE iracing_custid = ?"
+        parameters = (iracing_custid,)
+
+    try:
+        await self._execute_write_query(query, params=parameters)
+    except Error as e:
+        logging.getLogger('respobot.database').error(
+            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
+            f"clear_cache_windows() for iracing_custid = {iracing_custid}."
+        )
+        raise BotDatabaseError(
+            (
+                f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
+                f"clear_cache_windows() for iracing_custid = {iracing_custid}."
+            ),
+            ErrorCodes.general_failure.value
+        )
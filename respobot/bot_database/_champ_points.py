@@ -0,0 +1,357 @@
+"""
+/bot_database/_champ_points.py
+
+Methods that mainly interact with the 'weekly_champ_points' table.
+
+Each row holds a member's championship points for one week of one series: the average of the
+top quarter of their official race results that week, the same number that iRacing uses. Every
+week is stored twice. Rows with respo_week = 0 are grouped by the series' own race_week_num and
+are used for series championships. Rows with respo_week = 1 are grouped by the week of the
+season the race started in according to the 'season_dates' table, which is what the Respo
+championship uses.
+
+Rows are kept up to date by add_subsessions() and add_subsessions_batch() as races are added,
+so reading a leaderboard never has to look at the 'results' table.
+"""
+
+import logging
+from aiosqlite import Error
+from ._queries import *
+from irslashdata import constants as irConstants
+from bot_database import BotDatabaseError, ErrorCodes
+
+
+# Computes the weekly_champ_points rows for every (member, season, series) group that matches group_filter.
+# The top quarter of a week's results is ceil(n / 4), written as (n + 3) / 4 in integer arithmetic.
+WEEKLY_CHAMP_POINTS_SELECT = """
+    WITH champ_results AS (
+        SELECT
+            results.cust_id,
+            subsessions.season_year,
+            subsessions.season_quarter,
+            subsessions.series_id,
+            0 AS respo_week,
+            subsessions.race_week_num AS race_week,
+            results.champ_points
+        FROM results
+        INNER JOIN subsessions
+        ON subsessions.subsession_id = results.subsession_id
+        WHERE
+            subsessions.race_week_num IS NOT NULL AND
+            {champ_results_filter}
+        UNION ALL
+        SELECT
+            results.cust_id,
+            subsessions.season_year,
+            subsessions.season_quarter,
+            subsessions.series_id,
+            1 AS respo_week,
+            (
+                subsessions.start_epoch - CAST(strftime('%s', season_dates.start_time) AS INTEGER)
+            ) / 604800 AS race_week,
+            results.champ_points
+        FROM results
+        INNER JOIN subsessions
+        ON subsessions.subsession_id = results.subsession_id
+        INNER JOIN season_dates
+        ON
+            season_dates.season_year = subsessions.season_year AND
+            season_dates.season_quarter = subsessions.season_quarter AND
+            subsessions.start_epoch >= CAST(strftime('%s', season_dates.start_time) AS INTEGER) AND
+            subsessions.start_epoch < CAST(strftime('%s', season_dates.end_time) AS INTEGER)
+        WHERE
+            {champ_results_filter}
+    ),
+    ranked_results AS (
+        SELECT
+            *,
+            ROW_NUMBER() OVER weekly_results AS result_rank,
+            COUNT(*) OVER weekly_results AS num_results
+        FROM champ_results
+        WINDOW weekly_results AS (
+            PARTITION BY cust_id, season_year, season_quarter, series_id, respo_week, race_week
+            ORDER BY champ_points DESC
+            ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING
+        )
+    )
+    SELECT
+        cust_id,
+        season_year,
+        season_quarter,
+        series_id,
+        respo_week,
+        race_week,
+        MAX(num_results),
+        SUM(champ_points) / ((MAX(num_results) + 3) / 4)
+    FROM ranked_results
+    WHERE result_rank <= (num_results + 3) / 4
+    GROUP BY cust_id, season_year, season_quarter, series_id, respo_week, race_week
+"""
+
+CHAMP_RESULTS_FILTER = f"""
+            subsessions.event_type = {irConstants.EventType.race.value} AND
+            subsessions.official_session = 1 AND
+            subsessions.series_id IS NOT NULL AND
+            results.simsession_number = 0 AND
+            results.simsession_type = {irConstants.SimSessionType.race.value} AND
+            results.champ_points IS NOT NULL AND
+            results.cust_id IN (SELECT iracing_custid FROM members) AND
+            {{group_filter}}
+"""
+
+
+def _build_weekly_champ_points_select(group_filter: str):
+    champ_results_filter = CHAMP_RESULTS_FILTER.format(group_filter=group_filter)
+    return WEEKLY_CHAMP_POINTS_SELECT.format(champ_results_filter=champ_results_filter)
+
+
+def _build_subsession_group_filter(subsession_ids: list):
+    """Build a filter matching every result in the (member, season, series) groups that any
+    of the provided subsessions belong to.
+    """
+    placeholders = ", ".join("?" * len(subsession_ids))
+    return f"""
+            (results.cust_id, subsessions.season_year, subsessions.season_quarter, subsessions.series_id) IN (
+                SELECT
+                    group_results.cust_id,
+                    group_subsessions.season_year,
+                    group_subsessions.season_quarter,
+                    group_subsessions.series_id
+                FROM results AS group_results
+                INNER JOIN subsessions AS group_subsessions
+                ON group_subsessions.subsession_id = group_results.subsession_id
+                WHERE group_results.subsession_id IN ({placeholders})
+            )
+    """
+
+
+async def _refresh_weekly_champ_points_for_subsessions(connection, subsession_ids: list):
+    """Recompute every weekly_champ_points row that the provided subsessions contribute to.
+    This runs on the connection it is given so that it can share a transaction with the insert
+    of the subsessions themselves. The caller is responsible for committing.
+
+    Returns:
+        None.
+    """
+    if subsession_ids is None or len(subsession_ids) < 1:
+        return
+
+    group_filter = _build_subsession_group_filter(subsession_ids)
+    parameters = tuple(subsession_ids)
+
+    await connection.execute(
+        f"""
+            DELETE FROM weekly_champ_points
+            WHERE (iracing_custid, season_year, season_quarter, series_id) IN (
+                SELECT DISTINCT
+                    results.cust_id,
+                    subsessions.season_year,
+                    subsessions.season_quarter,
+                    subsessions.series_id
+                FROM results
+                INNER JOIN subsessions
+                ON subsessions.subsession_id = results.subsession_id
+                WHERE results.subsession_id IN ({", ".join("?" * len(subsession_ids))})
+            )
+        """,
+        parameters
+    )
+    await connection.execute(
+        INSERT_WEEKLY_CHAMP_POINTS + _build_weekly_champ_points_select(group_filter),
+        parameters + parameters
+    )
+
+
+async def refresh_weekly_champ_points(
+    self,
+    iracing_custid: int = None,
+    season_year: int = None,
+    season_quarter: int = None
+):
+    """Rebuild the 'weekly_champ_points' table from the 'results' table. Only needed when something
+    other than a new race changes the points, such as a new member or new season dates. If you
+    provide multiple kwargs, only rows that match all kwargs will be rebuilt. Rows for season years
+    that have been archived are left as they are, since their results are no longer in 'results'.
+
+    Keyword arguments:
+        iracing_custid (int): Only rebuild the points for this member.
+        season_year (int): Only rebuild the points for this season year.
+        season_quarter (int): Only rebuild the points for this season quarter.
+
+    Returns:
+        None.
+
+    Raises:
+        BotDatabaseError: Raised for any error.
+    """
+    delete_query = "DELETE FROM weekly_champ_points WHERE"
+    group_filter = ""
+    parameters = ()
+
+    if iracing_custid is not None:
+        delete_query += " iracing_custid = ? AND"
+        group_filter += " results.cust_id = ? AND"
+        parameters += (iracing_custid,)
+
+    if season_year is not None:
+        delete_query += " season_year = ? AND"
+        group_filter += " subsessions.season_year = ? AND"
+        parameters += (season_year,)
+
+    if season_quarter is not None:
+        delete_query += " season_quarter = ? AND"
+        group_filter += " subsessions.season_quarter = ? AND"
+        parameters += (season_quarter,)
+
+    delete_query += " season_year NOT IN (SELECT DISTINCT season_year FROM archived_subsessions)"
+    group_filter += " 1"
+
+    async def rebuild(connection):
+        await connection.execute(delete_query, parameters)
+        await connection.execute(
+            INSERT_WEEKLY_CHAMP_POINTS + _build_weekly_champ_points_select(group_filter),
+            parameters + parameters
+        )
+
+    try:
+        await self._execute_write_transaction(
+            rebuild,
+            description=(
+                f"refresh_weekly_champ_points() for iracing_custid {iracing_custid}, "
+                f"season {season_year}s{season_quarter}"
+            )
+        )
+    except Error as e:
+        logging.getLogger('respobot.database').error(
+            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
+            f"refresh_weekly_champ_points() for iracing_custid {iracing_custid}, "
+            f"season {season_year}s{season_quarter}."
+        )
+        raise BotDatabaseError(
+            (
+                f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
+                f"refresh_weekly_champ_points() for iracing_custid {iracing_custid}, "
+                f"season {season_year}s{season_quarter}."
+            ),
+            ErrorCodes.general_failure.value
+        )
+
+
+async def get_weekly_champ_points(
+    self,
+    season_year: int,
+    season_quarter: int,
+    respo_week: bool = False,
+    series_id: int = None,
+    up_to_week: int = None,
+    subsession_to_ignore: int = None
+):
+    """Get each member's championship points for every week of a season.
+
+    Arguments:
+        season_year (int): The season year.
+        season_quarter (int): The season quarter.
+
+    Keyword arguments:
+        respo_week (bool): If True, weeks are counted from the start of the season in the 'season_dates' table,
+                           as the Respo championship does. If False, weeks are the series' own race weeks.
+        series_id (int): Only return points for this series.
+        up_to_week (int): Only return points for this week and earlier.
+        subsession_to_ignore (int): Return the points as they were before this subsession was added.
+
+    Returns:
+        A list of dicts of the form:
+        {
+            "iracing_custid": int,
+            "series_id": int,
+            "race_week": int,
+            "points": int
+        }
+
+    Raises:
+        BotDatabaseError: Raised for any error.
+    """
+    query = """
+        SELECT
+            iracing_custid,
+            season_year,
+            season_quarter,
+            series_id,
+            respo_week,
+            race_week,
+            num_results,
+            points
+        FROM weekly_champ_points
+        WHERE
+            season_year = ? AND
+            season_quarter = ? AND
+            respo_week = ?
+    """
+    parameters = (season_year, season_quarter, 1 if respo_week else 0)
+
+    if series_id is not None:
+        query += " AND series_id = ?"
+        parameters += (series_id,)
+
+    try:
+        result_tuples = await self._execute_read_query(query, params=parameters)
+
+        if subsession_to_ignore is not None:
+            # Swap out the groups the ignored subsession belongs to for ones computed without it.
+            group_filter = (
+                _build_subsession_group_filter([subsession_to_ignore])
+                + " AND results.subsession_id != ?"
+            )
+            ignored_tuples = await self._execute_read_query(
+                _build_weekly_champ_points_select(group_filter),
+                params=(subsession_to_ignore, subsession_to_ignore) * 2
+            )
+            ignored_groups = await self._execute_read_query(
+                """
+                    SELECT results.cust_id, subsessions.season_year, subsessions.season_quarter, subsessions.series_id
+                    FROM results
+                    INNER JOIN subsessions
+                    ON subsessions.subsession_id = results.subsession_id
+                    WHERE results.subsession_id = ?
+                """,
+                params=(subsession_to_ignore,)
+            )
+            ignored_groups = set(ignored_groups)
+            result_tuples = [
+                result_tuple for result_tuple in result_tuples if result_tuple[0:4] not in ignored_groups
+            ] + [
+                ignored_tuple for ignored_tuple in ignored_tuples
+                if (
+                    ignored_tuple[1] == season_year
+                    and ignored_tuple[2] == season_quarter
+                    and ignored_tuple[4] == (1 if respo_week else 0)
+                    and (series_id is None or ignored_tuple[3] == series_id)
+                )
+            ]
+    except Error as e:
+        logging.getLogger('respobot.database').error(
+            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
+            f"get_weekly_champ_points() for season {season_year}s{season_quarter}, series_id {series_id}."
+        )
+        raise BotDatabaseError(
+            (
+                f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
+                f"get_weekly_champ_points() for season {season_year}s{season_quarter}, series_id {series_id}."
+            ),
+            ErrorCodes.general_failure.value
+        )
+
+    weekly_points = []
+    for result_tuple in result_tuples:
+        if up_to_week is not None and result_tuple[5] > up_to_week:
+            continue
+        weekly_points.append(
+            {
+                "iracing_custid": result_tuple[0],
+                "series_id": result_tuple[3],
+                "race_week": result_tuple[5],
+                "points": result_tuple[7]
+            }
+        )
+
+    return weekly_points
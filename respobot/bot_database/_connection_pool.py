@@ -0,0 +1,196 @@
+"""
+/bot_database/_connection_pool.py
+
+Long-lived aiosqlite connections shared by every BotDatabase query.
+"""
+
+import asyncio
+import logging
+import aiosqlite
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+
+# How many archive databases a reader keeps attached before it detaches the least recently used
+# one. SQLite allows 10 attached databases per connection by default.
+MAX_ATTACHED_PER_READER = 8
+
+
+class ConnectionPool:
+    """A single writer connection plus a fixed number of reader connections to the same
+    sqlite file. Each aiosqlite connection owns a worker thread, so keeping them open
+    avoids spinning up a thread and re-opening the file for every query.
+
+    Writes are serialized through the writer connection by an asyncio.Lock. Reads are
+    handed out from a queue of reader connections and wait for one to be returned if
+    they are all busy. Reader connections are opened with query_only set so a stray
+    write can't take the database lock away from the writer.
+
+    Readers can also attach other database files, such as season archives, on demand.
+    Attachments are kept between queries so a run of queries against the same archive
+    only opens it once per reader.
+    """
+
+    def __init__(self, filename, num_readers: int = 4, pragmas: dict = None):
+        self.filename = filename
+        self.num_readers = max(1, num_readers)
+        self.pragmas = pragmas if pragmas is not None else {}
+        self._writer = None
+        self._readers = []
+        self._idle_readers = None
+        self._attached = {}
+        self._write_lock = asyncio.Lock()
+        self._open_lock = asyncio.Lock()
+
+    @property
+    def is_open(self):
+        return self._writer is not None
+
+    async def open(self):
+        """Open the writer and reader connections. Does nothing if the pool is already open.
+
+        Arguments:
+            None
+
+        Returns:
+            None
+
+        Raises:
+            aiosqlite.Error: Raised if any of the connections fail to open.
+        """
+        async with self._open_lock:
+            if self.is_open:
+                return
+
+            writer = await self._connect()
+            readers = []
+            try:
+                for _ in range(self.num_readers):
+                    readers.append(await self._connect(query_only=True))
+            except aiosqlite.Error:
+                for reader in readers:
+                    await reader.close()
+                await writer.close()
+                raise
+
+            self._idle_readers = asyncio.Queue()
+            for reader in readers:
+                self._idle_readers.put_nowait(reader)
+            self._readers = readers
+            self._writer = writer
+
+            logging.getLogger('respobot.database').info(
+                f"Opened database connection pool with 1 writer and {self.num_readers} readers for {self.filename}."
+            )
+
+    async def _connect(self, query_only: bool = False):
+        """Open a new connection and apply the pool's PRAGMAs to it.
+
+        Keyword arguments:
+            query_only (bool): If True, the connection will refuse any statement that writes.
+
+        Returns:
+            An open aiosqlite.Connection.
+
+        Raises:
+            aiosqlite.Error: Raised if the connection can't be opened or a PRAGMA fails.
+        """
+        connection = await aiosqlite.connect(self.filename)
+        try:
+            for pragma, value in self.pragmas.items():
+                await connection.execute(f"PRAGMA {pragma} = {value}")
+            if query_only:
+                await connection.execute("PRAGMA query_only = ON")
+        except aiosqlite.Error:
+            await connection.close()
+            raise
+        return connection
+
+    async def close(self):
+        """Close every connection in the pool, waiting for in-flight queries to finish first.
+
+        Arguments:
+            None
+
+        Returns:
+            None
+        """
+        async with self._open_lock:
+            if not self.is_open:
+                return
+
+            async with self._write_lock:
+                await self._writer.close()
+                self._writer = None
+
+            for _ in range(len(self._readers)):
+                reader = await self._idle_readers.get()
+                await reader.close()
+            self._readers = []
+            self._idle_readers = None
+            self._attached = {}
+
+            logging.getLogger('respobot.database').info(f"Closed database connection pool for {self.filename}.")
+
+    @asynccontextmanager
+    async def reader(self, attach: tuple = None):
+        """Borrow a reader connection for the duration of the context.
+
+        Keyword arguments:
+            attach (tuple): An optional (schema_name, filename) of a database file that must
+                            be attached to the connection as schema_name.
+
+        Yields:
+            An aiosqlite.Connection that must only be used for SELECT queries.
+
+        Raises:
+            aiosqlite.Error: Raised if the database can't be attached.
+        """
+        if not self.is_open:
+            await self.open()
+
+        idle_readers = self._idle_readers
+        connection = await idle_readers.get()
+        try:
+            if attach is not None:
+                await self._attach(connection, attach[0], attach[1])
+            yield connection
+        finally:
+            idle_readers.put_nowait(connection)
+
+    async def _attach(self, connection, schema_name: str, filename: str):
+        """Attach a database file to a reader if it isn't already, detaching the least
+        recently used attachment first if the reader is at MAX_ATTACHED_PER_READER.
+        """
+        attached = self._attached.setdefault(id(connection), OrderedDict())
+
+        if schema_name in attached:
+            attached.move_to_end(schema_name)
+            return
+
+        if len(attached) >= MAX_ATTACHED_PER_READER:
+            (oldest_schema_name, _) = attached.popitem(last=False)
+            await connection.execute(f"DETACH DATABASE {oldest_schema_name}")
+
+        await connection.execute(f"ATTACH DATABASE ? AS {schema_name}", (filename,))
+        attached[schema_name] = filename
+
+    @asynccontextmanager
+    async def writer(self):
+        """Take exclusive use of the writer connection for the duration of the context.
+        Anything left uncommitted when the context exits because of an exception is rolled
+        back so the next writer starts from a clean transaction.
+
+        Yields:
+            The writer aiosqlite.Connection. Callers are responsible for committing.
+        """
+        if not self.is_open:
+            await self.open()
+
+        async with self._write_lock:
+            try:
+                yield self._writer
+            except BaseException:
+                if self._writer is not None and self._writer.in_transaction:
+                    await self._writer.rollback()
+                raise
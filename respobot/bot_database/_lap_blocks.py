@@ -0,0 +1,244 @@
+"""
+/bot_database/_lap_blocks.py
+
+Packing and unpacking of the columnar lap storage in the 'lap_blocks' table.
+
+Each row of 'lap_blocks' holds every lap one driver ran in one simsession. The values that are the
+same on every lap (name, car number, license level, ...) are stored once as ordinary columns and
+the values that change from lap to lap are packed into a single BLOB of typed arrays, one after
+another in the order of LAP_ARRAYS. A driver whose per-driver values change part way through a
+session (which the iRacing API doesn't do today) simply gets more than one block.
+
+The blob is little-endian regardless of the platform so that a database can be moved between
+machines. lap_events and interval_units are strings in the API, so each block keeps the distinct
+values it uses in a comma separated vocabulary column and the arrays hold a bitmask of the lap
+events and an index into the interval units.
+"""
+
+import sys
+from array import array
+
+
+# The values that are shared by every lap in a block, in the order they appear in the 'lap_blocks' table.
+BLOCK_COLUMNS = [
+    'group_id',
+    'name',
+    'display_name',
+    'car_number',
+    'license_level',
+    'session_start_time',
+    'ai'
+]
+
+# (key, array typecode) for every value packed into the laps blob, in the order they are packed.
+# lap_order is where the lap came in the list from the API so get_laps() can return laps in the
+# same order as the row storage.
+LAP_ARRAYS = [
+    ('lap_order', 'i'),
+    ('lap_number', 'i'),
+    ('flags', 'i'),
+    ('incident', 'b'),
+    ('session_time', 'q'),
+    ('lap_time', 'i'),
+    ('team_fastest_lap', 'b'),
+    ('personal_best_lap', 'b'),
+    ('lap_position', 'i'),
+    ('interval', 'i'),
+    ('fastest_lap', 'b'),
+    ('lap_events', 'q'),
+    ('interval_units', 'b')
+]
+
+# Stands in for None in each array type. None of these are values the iRacing API can return.
+NULL_VALUES = {
+    'b': -2 ** 7,
+    'i': -2 ** 31,
+    'q': -2 ** 63
+}
+
+# The columns of the 'laps' table, in order, so that unpacked laps look exactly like get_laps() rows.
+LAP_DICT_KEYS = [
+    'uid',
+    'subsession_id',
+    'simsession_number',
+    'group_id',
+    'name',
+    'cust_id',
+    'display_name',
+    'lap_number',
+    'flags',
+    'incident',
+    'session_time',
+    'session_start_time',
+    'lap_time',
+    'team_fastest_lap',
+    'personal_best_lap',
+    'license_level',
+    'car_number',
+    'lap_events',
+    'lap_position',
+    'interval',
+    'interval_units',
+    'fastest_lap',
+    'ai'
+]
+
+# A lap can only have as many distinct lap events as there are bits in its 'q' bitmask.
+MAX_LAP_EVENTS = 63
+
+
+def _to_array_value(value, typecode: str):
+    if value is None:
+        return NULL_VALUES[typecode]
+    return int(value)
+
+
+def _from_array_value(value: int, typecode: str):
+    if value == NULL_VALUES[typecode]:
+        return None
+    return value
+
+
+def _pack_arrays(arrays: list):
+    blob = b""
+    for lap_array in arrays:
+        if sys.byteorder != 'little':
+            lap_array.byteswap()
+        blob += lap_array.tobytes()
+    return blob
+
+
+def _unpack_arrays(blob: bytes, num_laps: int):
+    arrays = {}
+    offset = 0
+    for (key, typecode) in LAP_ARRAYS:
+        lap_array = array(typecode)
+        length = num_laps * lap_array.itemsize
+        lap_array.frombytes(blob[offset:offset + length])
+        if sys.byteorder != 'little':
+            lap_array.byteswap()
+        arrays[key] = lap_array
+        offset += length
+    return arrays
+
+
+def build_lap_block_parameters(lap_dicts: list, subsession_id: int, simsession_number: int):
+    """Group lap dicts from the iRacing /data API by driver and pack each group into
+    parameter tuples for INSERT_LAP_BLOCKS.
+
+    Arguments:
+        lap_dicts (list): A list of lap dicts as returned from the iRacing /Data API.
+        subsession_id: The id of the subsession that these laps correspond to.
+        simsession_number: The simsession_number that these laps correspond to (see irslashdata.constants)
+
+    Returns:
+        A list of parameter tuples.
+    """
+    blocks = {}
+    block_numbers = {}
+
+    for (lap_order, lap_dict) in enumerate(lap_dicts):
+        cust_id = lap_dict['cust_id'] if 'cust_id' in lap_dict else None
+        shared_values = tuple(lap_dict[key] if key in lap_dict else None for key in BLOCK_COLUMNS)
+        block_key = (cust_id, shared_values)
+
+        if block_key not in blocks:
+            block_numbers[cust_id] = block_numbers.get(cust_id, -1) + 1
+            blocks[block_key] = {
+                'block_number': block_numbers[cust_id],
+                'arrays': {key: array(typecode) for (key, typecode) in LAP_ARRAYS},
+                'lap_events': [],
+                'interval_units': []
+            }
+        block = blocks[block_key]
+
+        lap_events_mask = 0
+        if 'lap_events' in lap_dict and lap_dict['lap_events'] is not None:
+            for lap_event in lap_dict['lap_events']:
+                if lap_event not in block['lap_events']:
+                    if len(block['lap_events']) >= MAX_LAP_EVENTS:
+                        raise ValueError(
+                            f"Subsession {subsession_id} has more than {MAX_LAP_EVENTS} distinct lap events "
+                            f"for cust_id {cust_id}."
+                        )
+                    block['lap_events'].append(lap_event)
+                lap_events_mask |= 1 << block['lap_events'].index(lap_event)
+
+        interval_units = lap_dict['interval_units'] if 'interval_units' in lap_dict else None
+        if interval_units is None:
+            interval_units_index = None
+        else:
+            if interval_units not in block['interval_units']:
+                block['interval_units'].append(interval_units)
+            interval_units_index = block['interval_units'].index(interval_units)
+
+        for (key, typecode) in LAP_ARRAYS:
+            if key == 'lap_order':
+                value = lap_order
+            elif key == 'lap_events':
+                value = lap_events_mask
+            elif key == 'interval_units':
+                value = interval_units_index
+            else:
+                value = lap_dict[key] if key in lap_dict else None
+            block['arrays'][key].append(_to_array_value(value, typecode))
+
+    block_parameters = []
+    for ((cust_id, shared_values), block) in blocks.items():
+        block_parameters.append(
+            (subsession_id, simsession_number, cust_id, block['block_number'])
+            + shared_values
+            + (
+                len(block['arrays']['lap_order']),
+                ",".join(block['lap_events']),
+                ",".join(block['interval_units']),
+                _pack_arrays([block['arrays'][key] for (key, _) in LAP_ARRAYS])
+            )
+        )
+
+    return block_parameters
+
+
+def unpack_lap_block(block_tuple: tuple):
+    """Unpack one row of the 'lap_blocks' table into lap dicts.
+
+    Arguments:
+        block_tuple (tuple): A row selected with LAP_BLOCK_COLUMNS.
+
+    Returns:
+        A list of (lap_order, lap_dict) tuples where each lap_dict has the same keys as a
+        row of the 'laps' table. 'uid' is always None since blocked laps don't have one.
+    """
+    (subsession_id, simsession_number, cust_id, _) = block_tuple[0:4]
+    shared_values = block_tuple[4:4 + len(BLOCK_COLUMNS)]
+    (num_laps, lap_events_vocabulary, interval_units_vocabulary, blob) = block_tuple[4 + len(BLOCK_COLUMNS):]
+
+    lap_events = lap_events_vocabulary.split(",") if lap_events_vocabulary else []
+    interval_units = interval_units_vocabulary.split(",") if interval_units_vocabulary else []
+    arrays = _unpack_arrays(blob, num_laps)
+
+    block_values = {
+        'uid': None,
+        'subsession_id': subsession_id,
+        'simsession_number': simsession_number,
+        'cust_id': cust_id
+    }
+    block_values.update(zip(BLOCK_COLUMNS, shared_values))
+
+    laps = []
+    for lap_index in range(num_laps):
+        lap_values = dict(block_values)
+        for (key, typecode) in LAP_ARRAYS:
+            lap_values[key] = _from_array_value(arrays[key][lap_index], typecode)
+
+        lap_events_mask = lap_values['lap_events']
+        # The row storage keeps lap events as a comma separated string, "" if there were none.
+        lap_values['lap_events'] = ",".join(
+            lap_event for (bit, lap_event) in enumerate(lap_events) if lap_events_mask & (1 << bit)
+        )
+        if lap_values['interval_units'] is not None:
+            lap_values['interval_units'] = interval_units[lap_values['interval_units']]
+
+        laps.append((lap_values['lap_order'], {key: lap_values[key] for key in LAP_DICT_KEYS}))
+
+    return laps
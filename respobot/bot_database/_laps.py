@@ -5,13 +5,15 @@ Methods that mainly interact with the laps table.
 """
 
 import logging
+import time
 from aiosqlite import Error
 from ._queries import *
+from ._lap_blocks import build_lap_block_parameters, unpack_lap_block
 from bot_database import BotDatabaseError, ErrorCodes
 
 
-async def add_laps(self, lap_dicts, subsession_id, simsession_number):
-    """Add laps to the 'laps' table in the database.
+def _build_lap_parameters(lap_dicts, subsession_id, simsession_number):
+    """Flatten lap dicts from the iRacing /data API into parameter tuples for INSERT_LAPS.
 
     Arguments:
         lap_dicts (list): A list of lap dicts as returned from the iRacing /Data API.
@@ -19,10 +21,7 @@ async def add_laps(self, lap_dicts, subsession_id, simsession_number):
         simsession_number: The simsession_number that these laps correspond to (see irslashdata.constants)
 
     Returns:
-        None
-
-    Raises:
-        BotDatabaseError: Raised for any error when inserting the new laps.
+        A list of parameter tuples.
     """
     lap_parameters = []
     for lap_dict in lap_dicts:
@@ -59,8 +58,31 @@ async def add_laps(self, lap_dicts, subsession_id, simsession_number):
             lap_dict['ai'] if 'ai' in lap_dict else None
         ))
 
+    return lap_parameters
+
+
+async def add_laps(self, lap_dicts, subsession_id, simsession_number):
+    """Add laps to the database. They go in the 'laps' table or, if the database was
+    opened with lap_storage='columnar', the 'lap_blocks' table.
+
+    Arguments:
+        lap_dicts (list): A list of lap dicts as returned from the iRacing /Data API.
+        subsession_id: The id of the subsession that these laps correspond to.
+        simsession_number: The simsession_number that these laps correspond to (see irslashdata.constants)
+
+    Returns:
+        None
+
+    Raises:
+        BotDatabaseError: Raised for any error when inserting the new laps.
+    """
     try:
-        await self._execute_write_query(INSERT_LAPS, params=lap_parameters)
+        if self.lap_storage == 'columnar':
+            lap_block_parameters = build_lap_block_parameters(lap_dicts, subsession_id, simsession_number)
+            await self._execute_write_query(INSERT_LAP_BLOCKS, params=lap_block_parameters)
+        else:
+            lap_parameters = _build_lap_parameters(lap_dicts, subsession_id, simsession_number)
+            await self._execute_write_query(INSERT_LAPS, params=lap_parameters)
     except Error as e:
         logging.getLogger('respobot.database').error(
             f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} when trying to add laps(s) from "
@@ -73,7 +95,8 @@ async def add_laps(self, lap_dicts, subsession_id, simsession_number):
 
 
 async def get_laps(self, subsession_id: int, car_number: str = None, iracing_custid: int = None, simsession_number: int = None):
-    """Get laps from the 'laps' table in the database.
+    """Get laps from the database, whether they are stored in the 'laps' table or packed
+    into the 'lap_blocks' table.
 
     Arguments:
         subsession_id: The id of the subsession from which you are gathering laps.
@@ -90,36 +113,45 @@ async def get_laps(self, subsession_id: int, car_number: str = None, iracing_cus
 
     Returns:
         A list of dicts where each dict represents a lap and the dict keys correspond to the
-        columns in the 'laps' table.
+        columns in the 'laps' table. Laps from 'lap_blocks' have a 'uid' of None.
 
     Raises:
         BotDatabaseError: Raised for any error when getting the laps.
     """
-    query = """
-        SELECT *
-        FROM laps
-        WHERE
-            subsession_id = ? AND
-    """
+    # The filter columns are the same in 'laps' and 'lap_blocks'.
+    conditions = "subsession_id = ? AND"
 
     parameters = (subsession_id,)
 
     if car_number is not None:
-        query += " car_number = ? AND"
+        conditions += " car_number = ? AND"
         parameters += (car_number,)
 
     if iracing_custid is not None:
-        query += " cust_id = ? AND"
+        conditions += " cust_id = ? AND"
         parameters += (iracing_custid,)
 
     if simsession_number is not None:
-        query += " simsession_number = ? AND"
+        conditions += " simsession_number = ? AND"
         parameters += (simsession_number, )
 
-    query = query[0:-4]
+    conditions = conditions[0:-4]
+
+    query = f"""
+        SELECT *
+        FROM laps
+        WHERE {conditions}
+    """
+
+    block_query = f"""
+        SELECT {LAP_BLOCK_COLUMNS}
+        FROM lap_blocks
+        WHERE {conditions}
+    """
 
     try:
         lap_tuples = await self._execute_read_query(query, params=parameters)
+        block_tuples = await self._execute_read_query(block_query, params=parameters)
     except Error as e:
         logging.getLogger('respobot.database').error(
             f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during get_laps() for "
@@ -132,6 +164,18 @@ async def get_laps(self, subsession_id: int, car_number: str = None, iracing_cus
 
     lap_dicts = await self._map_tuples_to_dicts(lap_tuples, 'laps')
 
+    if block_tuples is not None and len(block_tuples) > 0:
+        # Match the order the 'laps' table returns rows in, which follows its
+        # (subsession_id, simsession_number, cust_id) index and then insertion order.
+        block_laps = []
+        for block_tuple in block_tuples:
+            for (lap_order, lap_dict) in unpack_lap_block(block_tuple):
+                block_laps.append((lap_dict['simsession_number'], lap_dict['cust_id'], lap_order, lap_dict))
+        block_laps.sort(key=lambda block_lap: block_lap[0:3])
+        if lap_dicts is None:
+            lap_dicts = []
+        lap_dicts += [lap_dict for (_, _, _, lap_dict) in block_laps]
+
     return lap_dicts
 
 
@@ -144,8 +188,8 @@ async def is_subsession_in_laps_table(self, subsession_id: int):
         subsession_id: The id of the subsession being checked.
 
     Returns:
-        A bool that is True if the subsession was found in the laps table
-        and False otherwise.
+        A bool that is True if the subsession was found in the laps or lap_blocks
+        tables or has been archived, and False otherwise.
 
     Raises:
         BotDatabaseError: Raised for any error when checking for the subsession.
@@ -154,8 +198,17 @@ async def is_subsession_in_laps_table(self, subsession_id: int):
         SELECT subsession_id
         FROM laps
         WHERE subsession_id = ?
+        UNION ALL
+        SELECT subsession_id
+        FROM lap_blocks
+        WHERE subsession_id = ?
+        UNION ALL
+        SELECT subsession_id
+        FROM archived_subsessions
+        WHERE subsession_id = ?
+        LIMIT 1
     """
-    parameters = (subsession_id,)
+    parameters = (subsession_id, subsession_id, subsession_id)
 
     try:
         results = await self._execute_read_query(query, params=parameters)
@@ -174,3 +227,109 @@ async def is_subsession_in_laps_table(self, subsession_id: int):
         return False
     else:
         return True
+
+
+async def convert_laps_to_columnar(self, batch_size: int = 100):
+    """Move every lap in the 'laps' table into the 'lap_blocks' table, batch_size subsessions
+    per transaction. Each subsession's rows are deleted in the same transaction that adds its
+    blocks, so the conversion can be stopped and restarted at any point and get_laps() keeps
+    working while it runs. Run VACUUM afterwards to give the freed pages back to the filesystem.
+
+    Keyword arguments:
+        batch_size (int): How many subsessions to convert per transaction.
+
+    Returns:
+        A dict of the form:
+        {
+            "subsessions": int,
+            "laps": int,
+            "blocks": int,
+            "seconds": float
+        }
+
+    Raises:
+        BotDatabaseError: Raised for any error. Batches converted before the error stay converted.
+    """
+    subsessions_converted = 0
+    laps_converted = 0
+    blocks_added = 0
+    time_start = time.perf_counter()
+
+    while True:
+        try:
+            subsession_tuples = await self._execute_read_query(
+                "SELECT DISTINCT subsession_id FROM laps ORDER BY subsession_id LIMIT ?",
+                params=(max(1, batch_size),)
+            )
+        except Error as e:
+            logging.getLogger('respobot.database').error(
+                f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during convert_laps_to_columnar()."
+            )
+            raise BotDatabaseError(
+                f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during convert_laps_to_columnar().",
+                ErrorCodes.general_failure.value
+            )
+
+        if subsession_tuples is None or len(subsession_tuples) < 1:
+            break
+
+        subsession_ids = [subsession_tuple[0] for subsession_tuple in subsession_tuples]
+        placeholders = ", ".join("?" * len(subsession_ids))
+
+        async def convert_batch(connection):
+            async with connection.execute(
+                f"SELECT * FROM laps WHERE subsession_id IN ({placeholders}) ORDER BY uid",
+                subsession_ids
+            ) as cursor:
+                column_names = [column[0] for column in cursor.description]
+                lap_tuples = await cursor.fetchall()
+
+            lap_dicts = {}
+            for lap_tuple in lap_tuples:
+                lap_dict = dict(zip(column_names, lap_tuple))
+                lap_dict['lap_events'] = lap_dict['lap_events'].split(",") if lap_dict['lap_events'] else []
+                lap_dicts.setdefault((lap_dict['subsession_id'], lap_dict['simsession_number']), []).append(lap_dict)
+
+            lap_block_parameters = []
+            for ((subsession_id, simsession_number), simsession_lap_dicts) in lap_dicts.items():
+                lap_block_parameters += build_lap_block_parameters(
+                    simsession_lap_dicts,
+                    subsession_id,
+                    simsession_number
+                )
+
+            await connection.executemany(INSERT_LAP_BLOCKS, lap_block_parameters)
+            await connection.execute(f"DELETE FROM laps WHERE subsession_id IN ({placeholders})", subsession_ids)
+            return (len(lap_tuples), len(lap_block_parameters))
+
+        try:
+            (batch_laps, batch_blocks) = await self._execute_write_transaction(
+                convert_batch,
+                description=f"convert_laps_to_columnar() for subsessions {subsession_ids}"
+            )
+        except Error as e:
+            logging.getLogger('respobot.database').error(
+                f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
+                f"convert_laps_to_columnar() for subsessions {subsession_ids}."
+            )
+            raise BotDatabaseError(
+                f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
+                f"convert_laps_to_columnar() for subsessions {subsession_ids}.",
+                ErrorCodes.general_failure.value
+            )
+
+        subsessions_converted += len(subsession_ids)
+        laps_converted += batch_laps
+        blocks_added += batch_blocks
+
+        logging.getLogger('respobot.database').info(
+            f"convert_laps_to_columnar(): {subsessions_converted} subsessions, {laps_converted} laps "
+            f"packed into {blocks_added} blocks so far."
+        )
+
+    return {
+        "subsessions": subsessions_converted,
+        "laps": laps_converted,
+        "blocks": blocks_added,
+        "seconds": time.perf_counter() - time_start
+    }
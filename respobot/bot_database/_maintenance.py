@@ -0,0 +1,221 @@
+"""
+/bot_database/_maintenance.py
+
+Methods that keep the database healthy while the bot is running: refreshing the query planner's
+statistics and taking online backups.
+"""
+
+import logging
+import os
+import time
+import aiosqlite
+from datetime import datetime, timezone
+from aiosqlite import Error
+from bot_database import BotDatabaseError, ErrorCodes
+
+
+# The most rows ANALYZE looks at in each index. Bounds how long a run can hold the write lock while
+# still giving the planner good enough statistics. See https://www.sqlite.org/lang_analyze.html
+ANALYSIS_LIMIT = 1000
+
+# How many pages backup() copies per step, and how long it sleeps between steps so that the reader
+# it copies from doesn't hog the disk.
+BACKUP_PAGES_PER_STEP = 2048
+BACKUP_STEP_PAUSE = 0.05
+
+# A stepped backup starts over whenever another connection writes to the database between steps.
+# After this many restarts the copy is done in a single step instead, which in WAL mode reads from
+# one snapshot and still doesn't block writers.
+MAX_BACKUP_RESTARTS = 3
+
+# How many maintenance runs are kept in maintenance_history.
+MAINTENANCE_HISTORY_LENGTH = 20
+
+
+class _BackupRestarted(Exception):
+    pass
+
+
+async def optimize(self):
+    """Refresh the statistics the query planner uses. The first run on a database without any
+    statistics runs a full ANALYZE. After that PRAGMA optimize only re-analyzes the tables whose
+    size has changed enough to matter. Both are bounded by ANALYSIS_LIMIT.
+
+    Returns:
+        The number of seconds it took, as a float.
+
+    Raises:
+        BotDatabaseError: Raised for any error.
+    """
+    time_started = time.perf_counter()
+
+    try:
+        stat_tables = await self._execute_read_query(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+        )
+
+        async def analyze(connection):
+            await connection.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+            if stat_tables is None or len(stat_tables) < 1:
+                await connection.execute("ANALYZE")
+            else:
+                await connection.execute("PRAGMA optimize")
+
+        await self._execute_write_transaction(analyze, description="optimize()")
+    except Error as e:
+        logging.getLogger('respobot.database').error(
+            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during optimize()."
+        )
+        raise BotDatabaseError(
+            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during optimize().",
+            ErrorCodes.general_failure.value
+        )
+
+    # ANALYZE can change which columns later queries read, so forget any cached plans.
+    if self.profiler is not None:
+        self.profiler.query_plans = {}
+
+    return time.perf_counter() - time_started
+
+
+async def backup(self, backup_directory: str, backups_to_keep: int = 3, pages_per_step: int = BACKUP_PAGES_PER_STEP):
+    """Copy the database to a new file in backup_directory with SQLite's online backup API. The copy
+    is made from a reader connection a few pages at a time, so the bot keeps reading and writing
+    while it runs. The backup is written to a temporary file and only renamed into place once it is
+    complete. Older backups beyond backups_to_keep are deleted.
+
+    Arguments:
+        backup_directory (str): The directory to put the backup in. It will be created if it doesn't exist.
+
+    Keyword arguments:
+        backups_to_keep (int): How many backups to keep in backup_directory, including the new one.
+        pages_per_step (int): How many pages to copy per step.
+
+    Returns:
+        A dict of the form:
+        {
+            "filename": str,
+            "bytes": int,
+            "pages": int,
+            "restarts": int,
+            "seconds": float
+        }
+
+    Raises:
+        BotDatabaseError: Raised for any error. A failed backup leaves no file behind.
+    """
+    time_started = time.perf_counter()
+    os.makedirs(backup_directory, exist_ok=True)
+
+    database_name = os.path.splitext(os.path.basename(self.filename))[0]
+    # Microseconds so that two backups taken in the same second don't share a name.
+    timestamp = datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S_%f')
+    backup_filename = os.path.join(backup_directory, f"{database_name}_{timestamp}.db")
+    temp_filename = backup_filename + ".tmp"
+
+    if os.path.exists(backup_filename) or os.path.exists(temp_filename):
+        raise BotDatabaseError(
+            f"The backup {backup_filename} already exists and won't be overwritten.",
+            ErrorCodes.value_error.value
+        )
+
+    progress = {'pages': 0, 'remaining': None, 'restarts': 0}
+
+    def on_progress(status, remaining, pages):
+        # remaining only goes up when the backup has started over.
+        if progress['remaining'] is not None and remaining > progress['remaining']:
+            progress['restarts'] += 1
+            if progress['restarts'] > MAX_BACKUP_RESTARTS:
+                raise _BackupRestarted()
+        progress['remaining'] = remaining
+        progress['pages'] = pages
+
+    try:
+        async with aiosqlite.connect(temp_filename) as target:
+            async with self._pool.reader() as connection:
+                try:
+                    await connection.backup(
+                        target,
+                        pages=max(1, pages_per_step),
+                        progress=on_progress,
+                        sleep=BACKUP_STEP_PAUSE
+                    )
+                except _BackupRestarted:
+                    logging.getLogger('respobot.database').info(
+                        f"The backup restarted {progress['restarts']} times because of writes. "
+                        f"Copying it in one step instead."
+                    )
+                    await connection.backup(target, pages=-1)
+        os.replace(temp_filename, backup_filename)
+    except (Error, OSError) as e:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+        logging.getLogger('respobot.database').error(
+            f"The error '{e}' occurred during backup() to {backup_filename}."
+        )
+        raise BotDatabaseError(
+            f"The error '{e}' occurred during backup() to {backup_filename}.",
+            ErrorCodes.general_failure.value
+        )
+
+    # Every backup name sorts by the time it was taken.
+    old_backups = sorted(
+        filename for filename in os.listdir(backup_directory)
+        if filename.startswith(database_name + "_") and filename.endswith(".db")
+    )
+    for old_backup in old_backups[:-max(1, backups_to_keep)]:
+        try:
+            os.remove(os.path.join(backup_directory, old_backup))
+        except OSError as e:
+            logging.getLogger('respobot.database').warning(f"Could not delete the old backup {old_backup}: {e}")
+
+    return {
+        "filename": backup_filename,
+        "bytes": os.path.getsize(backup_filename),
+        "pages": progress['pages'],
+        "restarts": progress['restarts'],
+        "seconds": time.perf_counter() - time_started
+    }
+
+
+async def run_maintenance(self, backup_directory: str = None, backups_to_keep: int = 3):
+    """Refresh the planner statistics and then, if a backup_directory is given, take a backup.
+    The timings of each run are logged and kept in maintenance_history.
+
+    Keyword arguments:
+        backup_directory (str): Where to put the backup. No backup is taken if this is None.
+        backups_to_keep (int): How many backups to keep in backup_directory.
+
+    Returns:
+        A dict of the form:
+        {
+            "time": datetime,
+            "optimize_seconds": float,
+            "backup": dict or None (see backup())
+        }
+
+    Raises:
+        BotDatabaseError: Raised for any error.
+    """
+    maintenance_run = {
+        "time": datetime.now(timezone.utc),
+        "optimize_seconds": await self.optimize(),
+        "backup": None
+    }
+
+    if backup_directory is not None:
+        maintenance_run['backup'] = await self.backup(backup_directory, backups_to_keep=backups_to_keep)
+
+    self.maintenance_history.append(maintenance_run)
+    del self.maintenance_history[:-MAINTENANCE_HISTORY_LENGTH]
+
+    message = f"Database maintenance: optimize took {maintenance_run['optimize_seconds']:.2f}s."
+    if maintenance_run['backup'] is not None:
+        message += (
+            f" Backup of {maintenance_run['backup']['pages']} pages "
+            f"({maintenance_run['backup']['bytes'] / 2 ** 20:.1f} MiB) to {maintenance_run['backup']['filename']} "
+            f"took {maintenance_run['backup']['seconds']:.2f}s with {maintenance_run['backup']['restarts']} restarts."
+        )
+    logging.getLogger('respobot.database').info(message)
+
+    return maintenance_run
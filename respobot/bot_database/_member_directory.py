@@ -0,0 +1,101 @@
+"""
+/bot_database/_member_directory.py
+
+An in-memory copy of the 'members' table.
+"""
+
+import copy
+
+
+class MemberDirectory:
+    """Every row of the 'members' table, indexed by uid, iracing_custid, discord_id and name.
+
+    The members table only holds a few dozen rows but is read by nearly every command and once per
+    driver in every race report, so the whole table is loaded at once on the first lookup and kept
+    until something writes to it. Every method in _members.py that changes the table calls
+    invalidate(), and the next lookup loads it again.
+
+    Member dicts are copied on the way out so callers can add keys to them without changing the
+    directory.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self._member_dicts = None
+        self._by_key = {}
+        self._generation = 0
+
+    @property
+    def is_loaded(self):
+        return self._member_dicts is not None
+
+    @property
+    def generation(self):
+        """Bumped by every invalidate(). Pass it to load() so a load that started before a write
+        doesn't replace the directory with stale rows.
+        """
+        return self._generation
+
+    def load(self, member_dicts: list, generation: int):
+        """Replace the directory with freshly fetched rows.
+
+        Arguments:
+            member_dicts (list): Every row of the 'members' table as formatted by fetch_member_dicts().
+            generation (int): The value of self.generation from before the rows were fetched.
+
+        Returns:
+            None.
+        """
+        if generation != self._generation:
+            return
+
+        by_key = {}
+        for member_dict in member_dicts:
+            for key in ('uid', 'iracing_custid', 'discord_id', 'name'):
+                if key in member_dict and member_dict[key] is not None:
+                    by_key.setdefault((key, member_dict[key]), []).append(member_dict)
+
+        self._member_dicts = member_dicts
+        self._by_key = by_key
+        self.loads += 1
+
+    def invalidate(self):
+        self._member_dicts = None
+        self._by_key = {}
+        self._generation += 1
+
+    def record_lookup(self):
+        """Count a lookup as a hit if the directory is loaded and a miss if it has to be loaded first."""
+        if self.is_loaded:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def get(self, key: str, value):
+        """Find the members with a given value in one column.
+
+        Arguments:
+            key (str): One of 'uid', 'iracing_custid', 'discord_id' or 'name'.
+            value: The value of that column.
+
+        Returns:
+            A list of copies of the matching member dicts. Empty if no member matches.
+        """
+        return copy.deepcopy(self._by_key.get((key, value), []))
+
+    def get_all(self):
+        """Returns:
+            A copy of every member dict in table order.
+        """
+        return copy.deepcopy(self._member_dicts)
+
+    def __str__(self):
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups > 0 else 0
+        return (
+            f"Member directory: {self.hits} hits, {self.misses} misses ({hit_rate:.1f}% hit rate), "
+            f"loaded {self.loads} times, "
+            f"{len(self._member_dicts) if self._member_dicts is not None else 0} members cached."
+        )
@@ -10,6 +10,7 @@ from datetime import datetime, date
 from ._queries import *
 from irslashdata import constants as irConstants
 from bot_database import BotDatabaseError, ErrorCodes
+from ._member_directory import MemberDirectory
 
 
 def _update_member_dict_objects(member_dict: dict):
@@ -79,36 +80,79 @@ def _update_member_dict_objects(member_dict: dict):
     return member_dict
 
 
-async def fetch_guild_member_ids(self):
-    """Get a list of all the Discord ids for the members.
+async def _get_member_directory(self):
+    """Get the member directory, loading the whole 'members' table into it first if it
+    was invalidated since the last lookup.
 
     Arguments:
         None.
 
     Returns:
-        A list of ints containing all the Discord id values for the members.
+        The MemberDirectory for this database.
 
     Raises:
-        BotDatabaseError: Raised for any error when getting the list of ids.
+        BotDatabaseError: Raised for any error when loading the members table.
+    """
+    directory = self.member_directory
+    directory.record_lookup()
+
+    if directory.is_loaded:
+        return directory
+
+    generation = directory.generation
+    query = """
+        SELECT *
+        FROM members
     """
-    query = "SELECT discord_id FROM members"
 
     try:
-        result = await self._execute_read_query(query)
+        tuples = await self._execute_read_query(query)
     except Error as e:
         logging.getLogger('respobot.database').error(
-            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during fetch_guild_member_ids()."
-        )
-        raise BotDatabaseError(
-            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during fetch_guild_member_ids().",
-            ErrorCodes.general_failure.value
+            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during _get_member_directory()."
         )
+        raise BotDatabaseError("Error fetching member dicts.", ErrorCodes.general_failure.value)
+
+    if tuples is None:
+        tuples = []
+
+    member_dicts = await self._map_tuples_to_dicts(tuples, 'members')
+
+    # Scan through the resulting dicts and convert the graph colours to a
+    # list of values and datetimes/dates to appropriate objects.
+    for member_dict in member_dicts:
+        _update_member_dict_objects(member_dict)
+
+    directory.load(member_dicts, generation)
+    if not directory.is_loaded:
+        # A member was written while the table was loading. Answer this lookup from the rows we
+        # have and leave the directory empty so the next lookup loads the new ones.
+        stale_directory = MemberDirectory()
+        stale_directory.load(member_dicts, stale_directory.generation)
+        return stale_directory
+
+    return directory
+
+
+async def fetch_guild_member_ids(self):
+    """Get a list of all the Discord ids for the members.
+
+    Arguments:
+        None.
+
+    Returns:
+        A list of ints containing all the Discord id values for the members.
+
+    Raises:
+        BotDatabaseError: Raised for any error when getting the list of ids.
+    """
+    directory = await self._get_member_directory()
 
     guild_ids = []
 
-    for member_tuple in result:
-        if len(member_tuple) == 1 and member_tuple[0] is not None:
-            guild_ids.append(member_tuple[0])
+    for member_dict in directory.get_all():
+        if member_dict['discord_id'] is not None:
+            guild_ids.append(member_dict['discord_id'])
 
     return guild_ids
 
@@ -125,24 +169,12 @@ async def fetch_iracing_cust_ids(self):
     Raises:
         BotDatabaseError: Raised for any error when getting the list of ids.
     """
-    query = "SELECT iracing_custid FROM members"
-
-    try:
-        cust_ids_tuples = await self._execute_read_query(query)
-    except Error as e:
-        logging.getLogger('respobot.database').error(
-            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during fetch_iracing_cust_ids()"
-        )
-        raise BotDatabaseError(
-            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during fetch_iracing_cust_ids()",
-            ErrorCodes.general_failure.value
-        )
+    directory = await self._get_member_directory()
 
     cust_ids = []
 
-    if cust_ids_tuples is not None and len(cust_ids_tuples) > 0:
-        for cust_id in cust_ids_tuples:
-            cust_ids.append(cust_id[0])
+    for member_dict in directory.get_all():
+        cust_ids.append(member_dict['iracing_custid'])
 
     return cust_ids
 
@@ -159,32 +191,13 @@ async def fetch_name(self, iracing_custid):
     Raises:
         BotDatabaseError: Raised for any errors.
     """
-    query = """
-        SELECT name
-        FROM members
-        WHERE iracing_custid = ?
-    """
-    parameters = (iracing_custid,)
-
-    try:
-        tuples = await self._execute_read_query(query, params=parameters)
-    except Error as e:
-        logging.getLogger('respobot.database').error(
-            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
-            f"fetch_name() for iracing_custid {iracing_custid}."
-        )
-        raise BotDatabaseError(
-            (
-                f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
-                f"fetch_name() for iracing_custid {iracing_custid}."
-            ),
-            ErrorCodes.general_failure.value
-        )
+    directory = await self._get_member_directory()
+    member_dicts = directory.get('iracing_custid', iracing_custid)
 
     name = None
 
-    if tuples is not None and len(tuples) > 0:
-        name = tuples[0][0]
+    if len(member_dicts) > 0:
+        name = member_dicts[0]['name']
 
     return name
 
@@ -282,6 +295,8 @@ async def set_member_latest_session_found(
             ErrorCodes.general_failure.value
         )
 
+    self.member_directory.invalidate()
+
 
 async def get_member_latest_race_report(self, iracing_custid: int):
     """Get the datetime of the latest race report posted to the main channel.
@@ -384,6 +399,8 @@ async def set_member_latest_race_report(
             ErrorCodes.general_failure.value
         )
 
+    self.member_directory.invalidate()
+
 
 async def get_member_ir(
     self,
@@ -465,52 +482,30 @@ async def fetch_member_dict(
     Raises:
         BotDatabaseError: Raised for any error.
     """
-    query = """
-        SELECT *
-        FROM members
-    """
-
     if uid is not None:
-        query += """    WHERE uid = ?
-        """
-        parameters = (uid,)
+        key = 'uid'
+        value = uid
     elif iracing_custid is not None:
-        query += """    WHERE iracing_custid = ?
-        """
-        parameters = (iracing_custid,)
+        key = 'iracing_custid'
+        value = iracing_custid
     elif discord_id is not None:
-        query += """    WHERE discord_id = ?
-        """
-        parameters = (discord_id,)
+        key = 'discord_id'
+        value = discord_id
     elif name is not None:
-        query += f"""    WHERE name = ?
-        """
-        parameters = (name,)
+        key = 'name'
+        value = name
     else:
         error_message = "Error fetching member dict. You must provide either uid, iracing_custid, discord_id, or name."
         logging.getLogger('respobot.database').error(error_message)
         raise BotDatabaseError(error_message, ErrorCodes.insufficient_info.value)
 
-    try:
-        tuples = await self._execute_read_query(query, params=parameters)
-    except Error as e:
-        if iracing_custid is not None:
-            member = iracing_custid
-        elif discord_id is not None:
-            member = discord_id
-        elif name is not None:
-            member = name
-        else:
-            member = "everyone"
-        logging.getLogger('respobot.database').error(
-            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
-            f"fetch_member_dict() for {member}.")
-        raise BotDatabaseError("Error fetching member dict.", ErrorCodes.general_failure.value)
+    directory = await self._get_member_directory()
+    member_dicts = directory.get(key, value)
 
-    if tuples is None or len(tuples) < 1:
+    if len(member_dicts) < 1:
         return None
 
-    if len(tuples) > 1:
+    if len(member_dicts) > 1:
         error_message = (
             "Error: More than one result found in fetch_member_dict(). "
             "This indicates an issue with the database."
@@ -518,13 +513,6 @@ async def fetch_member_dict(
         logging.getLogger('respobot.database').error(error_message)
         raise BotDatabaseError(error_message, ErrorCodes.general_failure.value)
 
-    member_dicts = await self._map_tuples_to_dicts(tuples, 'members')
-
-    # Scan through the resulting dicts and convert the graph colours to a
-    # list of values and datetimes/dates to appropriate objects.
-    for member_dict in member_dicts:
-        _update_member_dict_objects(member_dict)
-
     return member_dicts[0]
 
 
@@ -540,34 +528,15 @@ async def fetch_member_dicts(self, ignore_smurfs=False):
     Raises:
         BotDatabaseError: Raised for any error.
     """
-    query = """
-        SELECT *
-        FROM members
-    """
+    directory = await self._get_member_directory()
+    member_dicts = directory.get_all()
 
     if ignore_smurfs:
-        query += """
-        WHERE is_smurf = 0
-        """
-
-    try:
-        tuples = await self._execute_read_query(query)
-    except Error as e:
-        logging.getLogger('respobot.database').error(
-            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during fetch_member_dicts()."
-        )
-        raise BotDatabaseError("Error fetching member dicts.", ErrorCodes.general_failure.value)
+        member_dicts = [member_dict for member_dict in member_dicts if member_dict['is_smurf'] == 0]
 
-    if tuples is None or len(tuples) < 1:
+    if len(member_dicts) < 1:
         return None
 
-    member_dicts = await self._map_tuples_to_dicts(tuples, 'members')
-
-    # Scan through the resulting dicts and convert the graph colours to a
-    # list of values and datetimes/dates to appropriate objects.
-    for member_dict in member_dicts:
-        _update_member_dict_objects(member_dict)
-
     return member_dicts
 
 
@@ -625,6 +594,11 @@ async def add_member(
             f"ir_member_since: {ir_member_since}.")
         raise BotDatabaseError("Error adding member.", ErrorCodes.general_failure.value)
 
+    self.member_directory.invalidate()
+
+    # Races the new member was in may already be in the database from other members.
+    await self.refresh_weekly_champ_points(iracing_custid=iracing_custid)
+
 
 async def remove_member(self, uid: int):
     """Remove an entry from the 'members' table.
@@ -650,6 +624,8 @@ async def remove_member(self, uid: int):
             f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during remove_member() for uid: {uid}")
         raise BotDatabaseError("Error removing member.", ErrorCodes.general_failure.value)
 
+    self.member_directory.invalidate()
+
 
 async def edit_member(
     self,
@@ -739,6 +715,11 @@ async def edit_member(
             f"ir_member_since: {ir_member_since}, pronoun_type: {pronoun_type}.")
         raise BotDatabaseError("Error editing member.", ErrorCodes.general_failure.value)
 
+    self.member_directory.invalidate()
+
+    if iracing_custid is not None:
+        await self.refresh_weekly_champ_points(iracing_custid=iracing_custid)
+
 
 async def fetch_graph_colour(self, iracing_custid=None, discord_id=None):
     """Fetch the graph colour for a member and return as a list of ints [r, g, b, a].
@@ -883,3 +864,5 @@ async def set_graph_colour(self, graph_colour: list[int], iracing_custid: int =
             ),
             ErrorCodes.general_failure.value
         )
+
+    self.member_directory.invalidate()
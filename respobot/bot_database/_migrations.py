@@ -0,0 +1,197 @@
+"""
+/bot_database/_migrations.py
+
+Methods that bring the schema of an existing database up to date.
+
+The schema version of a database is kept in PRAGMA user_version. init_tables() creates any missing
+tables with the current schema and then calls run_migrations(), which runs every step in MIGRATIONS
+with a version higher than the database's, in order, and bumps user_version after each one. A step
+that is interrupted runs again from the start on the next launch, so every step must be idempotent
+and must also be safe to run on a database that init_tables() just created.
+
+To ship a schema change, write a step below and append it to MIGRATIONS with the next version number.
+"""
+
+import asyncio
+import logging
+from ._queries import *
+
+
+# How many rows a backfill updates per transaction. Each chunk holds the write lock only for as long as
+# it takes to update this many rows, so race results can still be written while a backfill runs.
+BACKFILL_CHUNK_SIZE = 5000
+
+# How long a backfill sleeps between chunks to let other writers in.
+BACKFILL_PAUSE = 0.05
+
+
+async def get_schema_version(self):
+    """Get the schema version of the database from PRAGMA user_version.
+
+    Returns:
+        An int. 0 for a database that has never been migrated.
+    """
+    result = await self._execute_read_query("PRAGMA user_version")
+    if result is None or len(result) < 1:
+        return 0
+    return result[0][0]
+
+
+async def run_migrations(self):
+    """Run every migration step that hasn't been run on this database yet, oldest first.
+
+    Returns:
+        None
+
+    Raises:
+        aiosqlite.Error: Raised for any Error during a migration step. Steps that finished
+                         before the error are kept.
+    """
+    schema_version = await self.get_schema_version()
+
+    if schema_version >= SCHEMA_VERSION:
+        return
+
+    for (version, description, migration) in MIGRATIONS:
+        if version <= schema_version:
+            continue
+
+        logging.getLogger('respobot.database').info(
+            f"Migrating the database to schema version {version}: {description}"
+        )
+        await migration(self)
+        # PRAGMA doesn't accept ? placeholders. version always comes from MIGRATIONS.
+        await self._execute_write_query(f"PRAGMA user_version = {int(version)}")
+
+    self._invalidate_table_info()
+    logging.getLogger('respobot.database').info(f"Database schema is at version {SCHEMA_VERSION}.")
+
+
+async def _add_column_if_missing(self, table_name: str, column_name: str, column_definition: str):
+    """Add a column to a table if the table doesn't already have it.
+
+    Arguments:
+        table_name (str): The table to add the column to.
+        column_name (str): The name of the new column.
+        column_definition (str): The type and constraints of the column, e.g. 'INTEGER'.
+
+    Returns:
+        True if the column was added, False if it was already there.
+    """
+    column_tuples = await self._execute_read_query(f"PRAGMA table_info('{table_name}')")
+    if any(column_tuple[1] == column_name for column_tuple in column_tuples):
+        return False
+
+    await self._execute_write_query(f"ALTER TABLE '{table_name}' ADD COLUMN '{column_name}' {column_definition}")
+    self._invalidate_table_info(table_name)
+    return True
+
+
+async def _backfill_in_chunks(
+    self,
+    table_name: str,
+    set_clause: str,
+    where_clause: str = "1",
+    chunk_size: int = BACKFILL_CHUNK_SIZE
+):
+    """Run an UPDATE over a whole table chunk_size rows at a time, committing after every chunk, so
+    that a backfill of a large table never holds the write lock for more than a moment. The
+    where_clause should exclude rows that are already filled in so an interrupted backfill
+    picks up where it left off.
+
+    Arguments:
+        table_name (str): The table to update. It must be a rowid table.
+        set_clause (str): Everything after SET in the UPDATE, e.g. "a = b + c".
+
+    Keyword arguments:
+        where_clause (str): Only update rows that match this, e.g. "start_epoch IS NULL".
+        chunk_size (int): How many rows to cover in each transaction.
+
+    Returns:
+        The number of rows updated.
+    """
+    rows_updated = 0
+    chunks_done = 0
+    # rowids are signed 64 bit ints.
+    last_rowid = -2 ** 63
+    query = (
+        f"UPDATE '{table_name}' SET {set_clause} "
+        f"WHERE rowid > ? AND rowid <= ? AND ({where_clause})"
+    )
+
+    while True:
+        # Step through the table by rowid instead of by fixed rowid ranges, since rowids like
+        # subsession_id are sparse and most fixed-size ranges would be empty.
+        result = await self._execute_read_query(
+            f"""
+                SELECT MAX(rowid) FROM (
+                    SELECT rowid FROM '{table_name}'
+                    WHERE rowid > ?
+                    ORDER BY rowid
+                    LIMIT ?
+                )
+            """,
+            params=(last_rowid, chunk_size)
+        )
+        if result is None or len(result) < 1 or result[0][0] is None:
+            break
+        chunk_end = result[0][0]
+
+        async def update_chunk(connection):
+            cursor = await connection.execute(query, (last_rowid, chunk_end))
+            return cursor.rowcount
+
+        rows_updated += await self._execute_write_transaction(
+            update_chunk,
+            description=f"a backfill of {table_name} up to rowid {chunk_end}"
+        )
+        last_rowid = chunk_end
+        chunks_done += 1
+
+        if chunks_done % 100 == 0:
+            logging.getLogger('respobot.database').info(
+                f"Backfilling {table_name}: {rows_updated} rows updated, up to rowid {chunk_end}."
+            )
+        await asyncio.sleep(BACKFILL_PAUSE)
+
+    logging.getLogger('respobot.database').info(f"Backfilled {rows_updated} rows of {table_name}.")
+    return rows_updated
+
+
+async def _migration_1_member_race_indexes(self):
+    await self._execute_write_query(CREATE_INDEX_RESULTS_MEMBER_RACES)
+    await self._execute_write_query(CREATE_INDEX_SUBSESSIONS_SEASON)
+    await self._execute_write_query(DROP_INDEX_RESULTS_IRATING_GRAPH)
+
+
+async def _migration_2_epoch_columns(self):
+    await self._add_column_if_missing('subsessions', 'start_epoch', 'INTEGER')
+    await self._add_column_if_missing('subsessions', 'end_epoch', 'INTEGER')
+    await self._backfill_in_chunks(
+        'subsessions',
+        (
+            "start_epoch = CAST(strftime('%s', start_time) AS INTEGER), "
+            "end_epoch = CAST(strftime('%s', end_time) AS INTEGER)"
+        ),
+        where_clause=(
+            "(start_epoch IS NULL AND start_time IS NOT NULL) OR (end_epoch IS NULL AND end_time IS NOT NULL)"
+        )
+    )
+    await self._execute_write_query(CREATE_INDEX_SUBSESSIONS_END_EPOCH)
+
+
+# (version, description, step) in the order they must run. Versions must be increasing and never reused.
+MIGRATIONS = [
+    (
+        1,
+        "Add covering indexes for member race queries. This may take a while on a large database.",
+        _migration_1_member_race_indexes
+    ),
+    (
+        2,
+        "Add start_epoch and end_epoch to subsessions and fill them in for every stored subsession.",
+        _migration_2_epoch_columns
+    )
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
@@ -0,0 +1,143 @@
+"""
+/bot_database/_profiler.py
+
+Per-call-site timing for every query BotDatabase runs.
+"""
+
+import bisect
+import sys
+import os
+import time
+
+
+# Upper bounds, in milliseconds, of the latency histogram buckets. Anything slower lands in a final overflow bucket.
+HISTOGRAM_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+
+class QueryStats:
+    """Running totals for every query made from one call site."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.retries = 0
+        self.slow_calls = 0
+        self.histogram = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+
+    def record(self, seconds: float, rows: int, retries: int, failed: bool, slow: bool):
+        self.calls += 1
+        self.total_seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+        if rows is not None and rows > 0:
+            self.rows += rows
+        self.retries += retries
+        if failed:
+            self.errors += 1
+        if slow:
+            self.slow_calls += 1
+        self.histogram[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, seconds * 1000)] += 1
+
+    def percentile_ms(self, percentile: float):
+        """Estimate a latency percentile from the histogram. Returns the upper bound of the bucket
+        the percentile falls in, or the slowest call seen if it falls in the overflow bucket.
+        """
+        if self.calls < 1:
+            return 0
+        target = percentile / 100 * self.calls
+        count = 0
+        for index, bucket_count in enumerate(self.histogram):
+            count += bucket_count
+            if count >= target:
+                if index < len(HISTOGRAM_BUCKETS_MS):
+                    return HISTOGRAM_BUCKETS_MS[index]
+                break
+        return self.max_seconds * 1000
+
+
+class QueryProfiler:
+    """Collects a QueryStats for each function that runs a query, keyed by the module and name of
+    the function that called _execute_read_query(), _execute_write_query(), or
+    _execute_write_transaction(). Queries slower than slow_query_threshold seconds are flagged so
+    BotDatabase can log them along with their query plan.
+    """
+
+    def __init__(self, slow_query_threshold: float = 0.25):
+        self.slow_query_threshold = slow_query_threshold
+        self.stats = {}
+        self.query_plans = {}
+        self.time_started = time.time()
+
+    @staticmethod
+    def get_call_site(depth: int = 2):
+        """Name the function that called the function that called this, e.g. '_quotes.get_quotes'.
+
+        Keyword arguments:
+            depth (int): How many frames to walk back from this one.
+        """
+        try:
+            frame = sys._getframe(depth)
+        except ValueError:
+            return "unknown"
+        module_name = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+        return f"{module_name}.{frame.f_code.co_name}"
+
+    def is_slow(self, seconds: float):
+        return self.slow_query_threshold is not None and seconds >= self.slow_query_threshold
+
+    def record(self, call_site: str, seconds: float, rows: int = None, retries: int = 0, failed: bool = False):
+        """Add one query to the totals for its call site.
+
+        Returns:
+            True if the query was slower than slow_query_threshold.
+        """
+        slow = self.is_slow(seconds)
+        if call_site not in self.stats:
+            self.stats[call_site] = QueryStats()
+        self.stats[call_site].record(seconds, rows, retries, failed, slow)
+        return slow
+
+    def reset(self):
+        self.stats = {}
+        self.query_plans = {}
+        self.time_started = time.time()
+
+    def report(self):
+        """Format the totals for every call site as a plain-text table, slowest total time first.
+
+        Returns:
+            A str.
+        """
+        lines = [
+            f"Query stats for the last {(time.time() - self.time_started) / 60:.1f} minutes. "
+            + (
+                f"Slow query threshold: {self.slow_query_threshold * 1000:.0f} ms."
+                if self.slow_query_threshold is not None else "Slow query logging is off."
+            ),
+            "",
+            f"{'call site':<48} {'calls':>7} {'total ms':>10} {'mean ms':>8} {'p50':>6} {'p95':>6} "
+            f"{'max ms':>8} {'rows':>9} {'retries':>7} {'errors':>6} {'slow':>5}"
+        ]
+
+        sorted_stats = sorted(self.stats.items(), key=lambda item: item[1].total_seconds, reverse=True)
+        for (call_site, stats) in sorted_stats:
+            lines.append(
+                f"{call_site[:48]:<48} {stats.calls:>7} {stats.total_seconds * 1000:>10.1f} "
+                f"{stats.total_seconds * 1000 / stats.calls:>8.2f} {stats.percentile_ms(50):>6.0f} "
+                f"{stats.percentile_ms(95):>6.0f} {stats.max_seconds * 1000:>8.1f} {stats.rows:>9} "
+                f"{stats.retries:>7} {stats.errors:>6} {stats.slow_calls:>5}"
+            )
+
+        lines.append("")
+        lines.append("Latency histograms (ms upper bound: calls):")
+        bucket_names = [f"<={bucket}" for bucket in HISTOGRAM_BUCKETS_MS] + [f">{HISTOGRAM_BUCKETS_MS[-1]}"]
+        for (call_site, stats) in sorted_stats:
+            buckets = ", ".join(
+                f"{bucket_name}: {count}" for (bucket_name, count) in zip(bucket_names, stats.histogram) if count > 0
+            )
+            lines.append(f"{call_site}: {buckets}")
+
+        return "\n".join(lines)
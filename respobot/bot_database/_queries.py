@@ -111,6 +111,8 @@ CREATE TABLE 'subsessions' (
     'race_summary_special_event_type'   INTEGER,
     'race_summary_special_event_type_text'  TEXT,
     'results_restricted'    INTEGER,
+    'start_epoch'   INTEGER,
+    'end_epoch' INTEGER,
     PRIMARY KEY('subsession_id')
 );
 """
@@ -122,6 +124,24 @@ CREATE INDEX 'index_subsessions_eventtype_id' ON 'subsessions' (
 );
 """
 
+# start_time and end_time as seconds since the epoch, so time ranges are integer comparisons.
+CREATE_INDEX_SUBSESSIONS_END_EPOCH = """
+CREATE INDEX IF NOT EXISTS 'index_subsessions_end_epoch' ON 'subsessions' (
+    'end_epoch' ASC
+);
+"""
+
+# Used when a whole season is read at once, e.g. get_race_totals_by_member().
+CREATE_INDEX_SUBSESSIONS_SEASON = """
+CREATE INDEX IF NOT EXISTS 'index_subsessions_season' ON 'subsessions' (
+    'season_year'   ASC,
+    'season_quarter'    ASC,
+    'event_type'    ASC,
+    'official_session'  ASC,
+    'series_id' ASC
+);
+"""
+
 INSERT_SUBSESSIONS = """
 INSERT INTO 'subsessions' (
     'subsession_id',
@@ -211,12 +231,14 @@ INSERT INTO 'subsessions' (
     'race_summary_has_opt_path',
     'race_summary_special_event_type',
     'race_summary_special_event_type_text',
-    'results_restricted'
+    'results_restricted',
+    'start_epoch',
+    'end_epoch'
 )
 VALUES (
     ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
     ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
-    ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+    ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
 )
 """
 
@@ -332,13 +354,28 @@ CREATE INDEX 'index_results_sesnum_subid_custid' ON 'results' (
 );
 """
 
-CREATE_INDEX_RESULTS_IRATING_GRAPH = """
-CREATE INDEX 'index_results_irating_graph' ON 'results' (
+# Covers the per-member lookups in get_latest_ir(), get_ir_data(), get_race_incidents_and_corners(),
+# get_champ_points_data() and the weekly_champ_points rebuild, so they never have to read the results rows
+# themselves. cust_id and simsession_type come first since every one of those queries filters on both.
+CREATE_INDEX_RESULTS_MEMBER_RACES = """
+CREATE INDEX IF NOT EXISTS 'index_results_member_races' ON 'results' (
     'cust_id'   ASC,
-    'simsession_type'   ASC
+    'simsession_type'   ASC,
+    'simsession_number' ASC,
+    'subsession_id' ASC,
+    'newi_rating'   ASC,
+    'champ_points'  ASC,
+    'incidents' ASC,
+    'laps_complete' ASC,
+    'car_class_id'  ASC
 );
 """
 
+# Replaced by index_results_member_races, which starts with the same columns.
+DROP_INDEX_RESULTS_IRATING_GRAPH = """
+DROP INDEX IF EXISTS 'index_results_irating_graph';
+"""
+
 INSERT_RESULTS = """
 INSERT INTO 'results' (
     'subsession_id',
@@ -536,6 +573,83 @@ VALUES (
 )
 """
 
+CREATE_TABLE_LAP_BLOCKS = """
+CREATE TABLE 'lap_blocks' (
+    'subsession_id' INTEGER NOT NULL,
+    'simsession_number' INTEGER NOT NULL,
+    'cust_id' INTEGER NOT NULL,
+    'block_number' INTEGER NOT NULL,
+    'group_id' INTEGER,
+    'name' TEXT,
+    'display_name' TEXT,
+    'car_number' TEXT,
+    'license_level' INTEGER,
+    'session_start_time' INTEGER,
+    'ai' INTEGER,
+    'num_laps' INTEGER NOT NULL,
+    'lap_events' TEXT,
+    'interval_units' TEXT,
+    'laps' BLOB NOT NULL,
+    PRIMARY KEY('subsession_id', 'simsession_number', 'cust_id', 'block_number')
+);
+"""
+
+LAP_BLOCK_COLUMNS = """
+    subsession_id,
+    simsession_number,
+    cust_id,
+    block_number,
+    group_id,
+    name,
+    display_name,
+    car_number,
+    license_level,
+    session_start_time,
+    ai,
+    num_laps,
+    lap_events,
+    interval_units,
+    laps
+"""
+
+INSERT_LAP_BLOCKS = f"""
+INSERT INTO 'lap_blocks' ({LAP_BLOCK_COLUMNS})
+VALUES (
+    ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+)
+"""
+
+CREATE_TABLE_ARCHIVED_SUBSESSIONS = """
+CREATE TABLE 'archived_subsessions' (
+    'subsession_id' INTEGER NOT NULL UNIQUE,
+    'season_year' INTEGER NOT NULL,
+    PRIMARY KEY('subsession_id')
+);
+"""
+
+INSERT_ARCHIVED_SUBSESSIONS = """
+INSERT OR IGNORE INTO 'archived_subsessions' (
+    'subsession_id',
+    'season_year'
+)
+VALUES (
+    ?, ?
+)
+"""
+
+# Everyone's latest iRating in each license category from the races that have been archived, so that
+# get_latest_ir() and get_latest_irs() never have to search the archives. Kept up to date by archive_season_year().
+CREATE_TABLE_ARCHIVED_LATEST_IRS = """
+CREATE TABLE 'archived_latest_irs' (
+    'cust_id' INTEGER NOT NULL,
+    'license_category_id' INTEGER NOT NULL,
+    'end_epoch' INTEGER NOT NULL,
+    'subsession_id' INTEGER NOT NULL,
+    'newi_rating' INTEGER NOT NULL,
+    PRIMARY KEY('cust_id', 'license_category_id')
+);
+"""
+
 CREATE_TABLE_CURRENT_SEASONS = """
 CREATE TABLE 'current_seasons' (
     'season_id' INTEGER NOT NULL UNIQUE,
@@ -1137,3 +1251,56 @@ CREATE TABLE "special_events" (
     PRIMARY KEY("uid" AUTOINCREMENT)
 );
 """
+
+CREATE_TABLE_CACHE_WINDOWS = """
+CREATE TABLE 'cache_windows' (
+    'uid'   INTEGER NOT NULL UNIQUE,
+    'iracing_custid'    INTEGER NOT NULL,
+    'window_start'  TEXT NOT NULL,
+    'subsession_count'  INTEGER NOT NULL,
+    'latest_end_time'   TEXT,
+    'completed_at'  TEXT NOT NULL,
+    PRIMARY KEY('uid' AUTOINCREMENT),
+    UNIQUE('iracing_custid', 'window_start')
+);
+"""
+
+INSERT_CACHE_WINDOW = """
+INSERT OR REPLACE INTO 'cache_windows' (
+    'iracing_custid',
+    'window_start',
+    'subsession_count',
+    'latest_end_time',
+    'completed_at'
+)
+VALUES (
+    ?, ?, ?, ?, ?
+)
+"""
+
+CREATE_TABLE_WEEKLY_CHAMP_POINTS = """
+CREATE TABLE 'weekly_champ_points' (
+    'iracing_custid'    INTEGER NOT NULL,
+    'season_year'   INTEGER NOT NULL,
+    'season_quarter'    INTEGER NOT NULL,
+    'series_id' INTEGER NOT NULL,
+    'respo_week'    INTEGER NOT NULL,
+    'race_week' INTEGER NOT NULL,
+    'num_results'   INTEGER NOT NULL,
+    'points'    INTEGER NOT NULL,
+    PRIMARY KEY('season_year', 'season_quarter', 'series_id', 'iracing_custid', 'respo_week', 'race_week')
+) WITHOUT ROWID;
+"""
+
+INSERT_WEEKLY_CHAMP_POINTS = """
+INSERT INTO 'weekly_champ_points' (
+    'iracing_custid',
+    'season_year',
+    'season_quarter',
+    'series_id',
+    'respo_week',
+    'race_week',
+    'num_results',
+    'points'
+)
+"""
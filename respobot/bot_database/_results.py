@@ -6,7 +6,6 @@ Methods that mainly interact with the results table.
 
 import logging
 from aiosqlite import Error
-from datetime import datetime
 from ._queries import *
 from irslashdata import constants as irConstants
 from bot_database import BotDatabaseError, ErrorCodes
@@ -112,7 +111,7 @@ async def get_champ_points_data(
         SELECT
             subsessions.subsession_id,
             subsessions.series_id,
-            subsessions.start_time,
+            subsessions.start_epoch,
             subsessions.race_week_num,
             subsessions.official_session,
             results.cust_id,
@@ -168,24 +167,16 @@ async def get_champ_points_data(
     result_dicts = []
 
     for result_tuple in result_tuples:
-        new_dict = {
-            "subsession_id": result_tuple[0],
-            "series_id": result_tuple[1],
-            "start_time": result_tuple[2],
-            "race_week_num": result_tuple[3],
-            "official_session": result_tuple[4],
-            "cust_id": result_tuple[5],
-            "champ_points": result_tuple[6]
-        }
-
-        try:
-            start_time = datetime.fromisoformat(result_tuple[2])
-            new_dict["start_time"] = start_time
-        except ValueError:
-            logging.getLogger('respobot.bot').error(
-                f"Invalid datetime string for 'start_time' in subsession {result_tuple[0]}"
-            )
-
-        result_dicts.append(new_dict)
+        result_dicts.append(
+            {
+                "subsession_id": result_tuple[0],
+                "series_id": result_tuple[1],
+                "start_epoch": result_tuple[2],
+                "race_week_num": result_tuple[3],
+                "official_session": result_tuple[4],
+                "cust_id": result_tuple[5],
+                "champ_points": result_tuple[6]
+            }
+        )
 
     return result_dicts
@@ -790,6 +790,12 @@ async def update_season_dates(self, season_dicts):
     new_season_parameters = []
     existing_season_parameters = []
 
+    previous_season_dates = {}
+    season_date_tuples = await self.get_season_dates()
+    if season_date_tuples is not None:
+        for (season_year, season_quarter, start_time, end_time) in season_date_tuples:
+            previous_season_dates[(season_year, season_quarter)] = (start_time, end_time)
+
     for season_dict in season_dicts:
 
         if 'season_year' not in season_dict or season_dict['season_year'] is None:
@@ -844,6 +850,16 @@ async def update_season_dates(self, season_dicts):
             ErrorCodes.general_failure.value
         )
 
+    # The Respo race week of every race in these seasons depends on the season dates.
+    updated_seasons = set()
+    for season_tuple in new_season_parameters + existing_season_parameters:
+        (start_time, end_time, season_year, season_quarter) = season_tuple
+        if previous_season_dates.get((season_year, season_quarter)) != (start_time, end_time):
+            updated_seasons.add((season_year, season_quarter))
+
+    for (season_year, season_quarter) in updated_seasons:
+        await self.refresh_weekly_champ_points(season_year=season_year, season_quarter=season_quarter)
+
 
 async def update_current_car_classes(self, car_class_dicts):
     """Update the 'current_car_classes' table using JSON as returned from the /data/carclass/get
@@ -7,6 +7,12 @@ from bot_database import BotDatabaseError, ErrorCodes
 import constants
 
 
+# constants.IRACING_SPORTS_FORMULA_SPLIT_DATETIME in seconds since the epoch, to compare against subsessions.end_epoch.
+SPORTS_FORMULA_SPLIT_EPOCH = int(
+    datetime.fromisoformat(constants.IRACING_SPORTS_FORMULA_SPLIT_DATETIME.replace('Z', '+00:00')).timestamp()
+)
+
+
 async def get_latest_ir(
     self,
     iracing_custid: int = None,
@@ -41,19 +47,35 @@ async def get_latest_ir(
     if member_dict is None:
         return None
 
+    # Archived races are only represented by the member's latest iRating in archived_latest_irs.
     query = """
-        SELECT newi_rating, MAX(subsessions.end_time)
-        FROM results
-        INNER JOIN subsessions
-        ON subsessions.subsession_id = results.subsession_id
-        WHERE
-            cust_id = ? AND
-            subsessions.official_session = 1 AND
-            subsessions.license_category_id = ? AND
-            results.simsession_type = ? AND
-            results.newi_rating > 0
+        SELECT newi_rating
+        FROM (
+            SELECT subsessions.end_epoch, results.subsession_id, results.newi_rating
+            FROM results
+            INNER JOIN subsessions
+            ON subsessions.subsession_id = results.subsession_id
+            WHERE
+                cust_id = ? AND
+                subsessions.official_session = 1 AND
+                subsessions.license_category_id = ? AND
+                results.simsession_type = ? AND
+                results.newi_rating > 0
+            UNION ALL
+            SELECT end_epoch, subsession_id, newi_rating
+            FROM archived_latest_irs
+            WHERE cust_id = ? AND license_category_id = ?
+        )
+        ORDER BY end_epoch DESC, subsession_id DESC
+        LIMIT 1
     """
-    parameters = (member_dict['iracing_custid'], category_id, irConstants.SimSessionType.race.value)
+    parameters = (
+        member_dict['iracing_custid'],
+        category_id,
+        irConstants.SimSessionType.race.value,
+        member_dict['iracing_custid'],
+        category_id
+    )
 
     try:
         result_tuples = await self._execute_read_query(query, params=parameters)
@@ -75,6 +97,91 @@ async def get_latest_ir(
     return result_tuples[0][0]
 
 
+async def get_latest_irs(self, category_ids: list):
+    """Get the latest iRating of every member in each of the given categories with one query. The
+    latest iRating is chosen the same way as in get_latest_ir().
+
+    Arguments:
+        category_ids (list): The iRacing category ids of the iRatings to grab. See irslashdata.constants.
+
+    Returns:
+        A dict of the form {iracing_custid: {category_id: irating}}. Members with no iRating in
+        any of the categories are left out, as are categories a member has no iRating in.
+
+    Raises:
+        BotDatabaseError: Raised for any error.
+    """
+    if category_ids is None or len(category_ids) < 1:
+        return {}
+
+    category_placeholders = ", ".join("?" * len(category_ids))
+
+    # Archived races are only represented by each member's latest iRating in archived_latest_irs.
+    query = f"""
+        SELECT cust_id, license_category_id, newi_rating
+        FROM (
+            SELECT
+                cust_id,
+                license_category_id,
+                newi_rating,
+                ROW_NUMBER() OVER (
+                    PARTITION BY cust_id, license_category_id
+                    ORDER BY end_epoch DESC, subsession_id DESC
+                ) AS latest_rank
+            FROM (
+                SELECT
+                    results.cust_id,
+                    subsessions.license_category_id,
+                    results.newi_rating,
+                    subsessions.end_epoch,
+                    results.subsession_id
+                FROM results
+                INNER JOIN subsessions
+                ON subsessions.subsession_id = results.subsession_id
+                WHERE
+                    results.cust_id IN (SELECT iracing_custid FROM members) AND
+                    subsessions.official_session = 1 AND
+                    subsessions.license_category_id IN ({category_placeholders}) AND
+                    results.simsession_type = ? AND
+                    results.newi_rating > 0
+                UNION ALL
+                SELECT cust_id, license_category_id, newi_rating, end_epoch, subsession_id
+                FROM archived_latest_irs
+                WHERE
+                    cust_id IN (SELECT iracing_custid FROM members) AND
+                    license_category_id IN ({category_placeholders})
+            )
+        )
+        WHERE latest_rank = 1
+    """
+    parameters = tuple(category_ids) + (irConstants.SimSessionType.race.value,) + tuple(category_ids)
+
+    try:
+        result_tuples = await self._execute_read_query(query, params=parameters)
+    except Error as e:
+        logging.getLogger('respobot.database').error(
+            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during get_latest_irs() "
+            f"for categories {category_ids}."
+        )
+        raise BotDatabaseError(
+            (
+                f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during get_latest_irs() "
+                f"for categories {category_ids}."
+            ),
+            ErrorCodes.general_failure.value
+        )
+
+    latest_irs = {}
+
+    if result_tuples is None:
+        return latest_irs
+
+    for (cust_id, category_id, irating) in result_tuples:
+        latest_irs.setdefault(cust_id, {})[category_id] = irating
+
+    return latest_irs
+
+
 async def get_ir_data(
     self,
     iracing_custid: int = None,
@@ -83,7 +190,8 @@ async def get_ir_data(
     category_id: int = None
 ):
     """Fetch the data required to plot an iRating graph. Data is returned as a list of tuples of
-    the form (datetime, int) containing (end_time, newi_rating).
+    the form (int, int) containing (end_epoch, newi_rating), where end_epoch is the end time of
+    the subsession in seconds since the epoch.
 
     Arguments:
         None.
@@ -95,7 +203,7 @@ async def get_ir_data(
         category_id (int): The iRacing category id of the iRating data to grab. See irslashdata.constants.
 
     Returns:
-        A list of tuples of the form (datetime, int) containing (end_time, newi_rating).
+        A list of tuples of the form (int, int) containing (end_epoch, newi_rating).
 
     Raises:
         BotDatabaseError: Raised for any error.
@@ -121,25 +229,24 @@ async def get_ir_data(
     ):
         query = f"""
             SELECT
-                subsessions.end_time,
-                results.newi_rating,
-                subsessions.subsession_id
-            FROM results
-            INNER JOIN subsessions
+                subsessions.end_epoch,
+                results.newi_rating
+            FROM {{schema}}.results AS results
+            INNER JOIN {{schema}}.subsessions AS subsessions
             ON subsessions.subsession_id = results.subsession_id
             WHERE
                 results.cust_id = ? AND
                 subsessions.official_session = 1 AND
                 (
                     (
-                        subsessions.end_time >= '{constants.IRACING_SPORTS_FORMULA_SPLIT_DATETIME}' AND
+                        subsessions.end_epoch >= {SPORTS_FORMULA_SPLIT_EPOCH} AND
                         (
                             subsessions.license_category_id = ? OR
                             subsessions.license_category_id = 2
                         )
                     ) OR
                     (
-                        subsessions.end_time < '{constants.IRACING_SPORTS_FORMULA_SPLIT_DATETIME}' AND
+                        subsessions.end_epoch < {SPORTS_FORMULA_SPLIT_EPOCH} AND
                         (
                             (
                                 subsessions.license_category_id = ? AND
@@ -154,17 +261,16 @@ async def get_ir_data(
                 ) AND
                 results.simsession_type = ? AND
                 results.newi_rating > 0
-            ORDER BY subsessions.end_time
+            ORDER BY subsessions.end_epoch
         """
-        # query = query.format(constants.IRACING_SPORTS_FORMULA_SPLIT_DATETIME)
         parameters = (member_dict['iracing_custid'], category_id, category_id, irConstants.SimSessionType.race.value)
     else:
         query = f"""
             SELECT
-                subsessions.end_time,
+                subsessions.end_epoch,
                 results.newi_rating
-            FROM results
-            INNER JOIN subsessions
+            FROM {{schema}}.results AS results
+            INNER JOIN {{schema}}.subsessions AS subsessions
             ON subsessions.subsession_id = results.subsession_id
             WHERE
                 results.cust_id = ? AND
@@ -172,12 +278,12 @@ async def get_ir_data(
                 subsessions.license_category_id = ? AND
                 results.simsession_type = ? AND
                 results.newi_rating > 0
-            ORDER BY subsessions.end_time
+            ORDER BY subsessions.end_epoch
         """
         parameters = (member_dict['iracing_custid'], category_id, irConstants.SimSessionType.race.value)
 
     try:
-        result_tuples = await self._execute_read_query(query, params=parameters)
+        partition_results = await self._execute_archived_read_query(query, params=parameters)
     except Error as e:
         member = iracing_custid if iracing_custid is not None else discord_id if discord_id is not None else name
         logging.getLogger('respobot.database').error(
@@ -192,13 +298,15 @@ async def get_ir_data(
             ErrorCodes.general_failure.value
         )
 
-    converted_tuples = []
+    result_tuples = []
+    for partition_result in partition_results:
+        if partition_result is not None:
+            result_tuples += partition_result
 
-    for result_tuple in result_tuples:
-        time_point = datetime.fromisoformat(result_tuple[0])
-        converted_tuples.append((time_point, result_tuple[1]))
+    if len(partition_results) > 1:
+        result_tuples.sort(key=lambda result_tuple: result_tuple[0])
 
-    return converted_tuples
+    return result_tuples
 
 
 async def get_race_incidents_and_corners(
@@ -210,7 +318,8 @@ async def get_race_incidents_and_corners(
 ):
     """Fetch the data required to plot a corners-per-incident graph.
     Data is returned as a list of tuples of the form:
-    (datetime, int) containing (end_time, newi_rating).
+    (int, int, int) containing (end_epoch, incidents, corners), where end_epoch is the end time
+    of the subsession in seconds since the epoch.
 
     Arguments:
         None.
@@ -222,18 +331,20 @@ async def get_race_incidents_and_corners(
         category_id (int): The iRacing category id of the iRating data to grab. See irslashdata.constants.
 
     Returns:
-        A list of tuples of the form (datetime, int) containing (end_time, newi_rating).
+        A list of tuples of the form (int, int, int) containing (end_epoch, incidents, corners),
+        or None if there are no races.
 
     Raises:
         BotDatabaseError: Raised for any error.
     """
     query = f"""
         SELECT
-            subsessions.end_time,
+            subsessions.end_epoch,
             incidents,
-            laps_complete * corners_per_lap
-        FROM results
-        INNER JOIN subsessions
+            laps_complete * corners_per_lap,
+            subsessions.subsession_id
+        FROM {{schema}}.results AS results
+        INNER JOIN {{schema}}.subsessions AS subsessions
         ON subsessions.subsession_id = results.subsession_id
         WHERE
             cust_id = ? AND
@@ -253,10 +364,10 @@ async def get_race_incidents_and_corners(
         query += " AND car_class_id = ?"
         parameters += (car_class_id,)
 
-    query += " ORDER BY subsessions.subsession_id ASC"
+    query += " ORDER BY subsessions.end_epoch ASC, subsessions.subsession_id ASC"
 
     try:
-        result_tuples = await self._execute_read_query(query, params=parameters)
+        partition_results = await self._execute_archived_read_query(query, params=parameters)
     except Error as e:
         logging.getLogger('respobot.database').error(
             f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
@@ -270,16 +381,19 @@ async def get_race_incidents_and_corners(
             ErrorCodes.general_failure.value
         )
 
-    if result_tuples is None or len(result_tuples) < 1:
-        return None
+    result_tuples = []
+    for partition_result in partition_results:
+        if partition_result is not None:
+            result_tuples += partition_result
 
-    converted_tuples = []
+    if len(result_tuples) < 1:
+        return None
 
-    for result_tuple in result_tuples:
-        time_point = datetime.fromisoformat(result_tuple[0])
-        converted_tuples.append((time_point, result_tuple[1], result_tuple[2]))
+    # Season years overlap at the new year, so races from different databases can interleave.
+    if len(partition_results) > 1:
+        result_tuples.sort(key=lambda result_tuple: (result_tuple[0], result_tuple[3]))
 
-    return converted_tuples
+    return [(end_epoch, incidents, corners) for (end_epoch, incidents, corners, _) in result_tuples]
 
 
 async def get_member_race_results(
@@ -363,8 +477,8 @@ async def get_member_race_results(
             track_category_id,
             race_week_num,
             max_team_drivers
-        FROM results
-        INNER JOIN subsessions ON subsessions.subsession_id = results.subsession_id
+        FROM {schema}.results AS results
+        INNER JOIN {schema}.subsessions AS subsessions ON subsessions.subsession_id = results.subsession_id
         WHERE cust_id = ? AND"""
     parameters = (iracing_custid,)
 
@@ -399,7 +513,11 @@ async def get_member_race_results(
     query = query[:-4]
 
     try:
-        results = await self._execute_read_query(query, params=parameters)
+        partition_results = await self._execute_archived_read_query(
+            query,
+            params=parameters,
+            season_year=season_year if season_quarter is not None else None
+        )
     except Error as e:
         logging.getLogger('respobot.database').error(
             f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during get_member_race_results() for "
@@ -415,9 +533,14 @@ async def get_member_race_results(
             ErrorCodes.general_failure.value
         )
 
-    if results is None:
+    if partition_results[-1] is None:
         return None
 
+    results = []
+    for partition_result in partition_results:
+        if partition_result is not None:
+            results += partition_result
+
     for result_tuple in results:
         if len(result_tuple) > 19:
             new_race_dict = {}
@@ -448,6 +571,306 @@ async def get_member_race_results(
     return race_dicts
 
 
+async def get_race_totals_by_member(
+    self,
+    iracing_custids: list = None,
+    season_year: int = None,
+    season_quarter: int = None,
+    license_category_id: int = None
+):
+    """Fetch the number of races, champ points, laps and incidents of many members with one grouped query.
+    The races counted are the same ones get_member_race_results() returns with its default kwargs.
+
+    Keyword arguments:
+        iracing_custids (list): The iRacing cust_ids of the members. Defaults to every member in the database.
+        season_year (int)
+        season_quarter (int)
+        license_category_id (int): See irslashdata.constants
+
+    Returns:
+        A dict of the form:
+        {
+            iracing_custid: {
+                "races": int,
+                "champ_points": int,
+                "laps_complete": int,
+                "incidents": int
+            }
+        }
+        Members without any races are left out.
+
+    Raises:
+        BotDatabaseError: Raised for any error.
+    """
+    query = """
+        SELECT
+            cust_id,
+            COUNT(*),
+            TOTAL(champ_points),
+            TOTAL(laps_complete),
+            TOTAL(incidents)
+        FROM {schema}.results AS results
+        INNER JOIN {schema}.subsessions AS subsessions ON subsessions.subsession_id = results.subsession_id
+        WHERE
+            official_session = 1 AND
+            simsession_type = ? AND
+            event_type = ? AND"""
+    parameters = (irConstants.SimSessionType.race.value, irConstants.EventType.race.value)
+
+    if iracing_custids is None:
+        query += " cust_id IN (SELECT iracing_custid FROM main.members) AND"
+    else:
+        query += f" cust_id IN ({', '.join('?' * len(iracing_custids))}) AND"
+        parameters += tuple(iracing_custids)
+
+    if season_year is not None and season_quarter is not None:
+        query += " season_year = ? AND season_quarter = ? AND"
+        parameters += (season_year, season_quarter)
+
+    if license_category_id is not None:
+        query += " license_category_id = ? AND"
+        parameters += (license_category_id,)
+
+    query = query[:-4] + " GROUP BY cust_id"
+
+    try:
+        partition_results = await self._execute_archived_read_query(
+            query,
+            params=parameters,
+            season_year=season_year if season_quarter is not None else None
+        )
+    except Error as e:
+        logging.getLogger('respobot.database').error(
+            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during get_race_totals_by_member() "
+            f"for season_year {season_year}, season_quarter {season_quarter}, "
+            f"license_category_id {license_category_id}."
+        )
+        raise BotDatabaseError(
+            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during get_race_totals_by_member() "
+            f"for season_year {season_year}, season_quarter {season_quarter}, "
+            f"license_category_id {license_category_id}.",
+            ErrorCodes.general_failure.value
+        )
+
+    race_totals = {}
+    for partition_result in partition_results:
+        if partition_result is None:
+            continue
+        for (cust_id, races, champ_points, laps_complete, incidents) in partition_result:
+            member_totals = race_totals.setdefault(
+                cust_id,
+                {'races': 0, 'champ_points': 0, 'laps_complete': 0, 'incidents': 0}
+            )
+            member_totals['races'] += races
+            member_totals['champ_points'] += int(champ_points)
+            member_totals['laps_complete'] += int(laps_complete)
+            member_totals['incidents'] += int(incidents)
+
+    return race_totals
+
+
+async def get_member_head2head_stats(
+    self,
+    iracing_custid: int,
+    series_id: int = None,
+    car_class_id: int = None,
+    season_year: int = None,
+    season_quarter: int = None,
+    license_category_id: int = None,
+    official_session: int = 1,
+    simsession_type: int = irConstants.SimSessionType.race.value,
+    event_type: int = irConstants.EventType.race.value
+):
+    """Aggregate a member's race results into career totals for the head2head command with a single query.
+    Results are filtered exactly as they are in get_member_race_results(). The size of each race's class is
+    counted from the simsession 0 results of that subsession, the same as get_cars_in_class().
+
+    Arguments:
+        iracing_custid (int)
+
+    Keyword arguments:
+        series_id (int)
+        car_class_id (int)
+        season_year (int)
+        season_quarter (int)
+        license_category_id (int): See irslashdata.constants
+        official_session (int): 1 for official, 0 for not official
+        simsession_type (int): See irslashdata.constants
+        event_type (int): See irslashdata.constants
+
+    Returns:
+        A dict of the form:
+        stats_dict = {
+            "total_races": int,
+            "total_champ_points": int,
+            "highest_champ_points": int or None,
+            "wins": int,
+            "podiums": int,
+            "total_poles": int,
+            "total_incidents": int,
+            "total_laps": int,
+            "total_laps_led": int,
+            "top_half": int,
+            "highest_ir_gain": int or None,
+            "highest_ir_loss": int or None,
+            "total_ir_change": int,
+            "highest_ir": int or None,
+            "lowest_positive_ir": int or None,
+            "lowest_ir": int or None
+        }
+        Values that are None mean that there were no races.
+
+    Raises:
+        BotDatabaseError: Raised for any error.
+    """
+    member_races_query = """
+        SELECT
+            results.subsession_id,
+            results.car_class_id,
+            champ_points,
+            finish_position_in_class,
+            starting_position_in_class,
+            incidents,
+            laps_complete,
+            laps_lead,
+            oldi_rating,
+            newi_rating
+        FROM {schema}.results AS results
+        INNER JOIN {schema}.subsessions AS subsessions ON subsessions.subsession_id = results.subsession_id
+        WHERE cust_id = ? AND"""
+    parameters = (iracing_custid,)
+
+    if series_id is not None:
+        member_races_query += " series_id = ? AND"
+        parameters += (series_id,)
+
+    if car_class_id is not None:
+        member_races_query += " car_class_id = ? AND"
+        parameters += (car_class_id,)
+
+    if season_year is not None and season_quarter is not None:
+        member_races_query += " season_year = ? AND season_quarter = ? AND"
+        parameters += (season_year, season_quarter)
+
+    if license_category_id is not None:
+        member_races_query += " license_category_id = ? AND"
+        parameters += (license_category_id,)
+
+    if official_session is not None:
+        member_races_query += " official_session = ? AND"
+        parameters += (official_session,)
+
+    if simsession_type is not None:
+        member_races_query += " simsession_type = ? AND"
+        parameters += (simsession_type,)
+
+    if event_type is not None:
+        member_races_query += " event_type = ? AND"
+        parameters += (event_type,)
+
+    member_races_query = member_races_query[:-4]
+
+    # Class sizes count distinct car numbers, with every car that has no number counting as one more car,
+    # to match the GROUP BY livery_car_number in get_cars_in_class().
+    query = f"""
+        WITH member_races AS ({member_races_query}
+        ),
+        class_sizes AS (
+            SELECT
+                subsession_id,
+                car_class_id,
+                COUNT(DISTINCT livery_car_number) + MAX(livery_car_number IS NULL) AS cars_in_class
+            FROM {{schema}}.results AS results
+            WHERE
+                simsession_number = 0 AND
+                subsession_id IN (SELECT subsession_id FROM member_races)
+            GROUP BY subsession_id, car_class_id
+        )
+        SELECT
+            COUNT(*),
+            IFNULL(SUM(champ_points), 0),
+            MAX(champ_points),
+            IFNULL(SUM(finish_position_in_class = 0), 0),
+            IFNULL(SUM(finish_position_in_class BETWEEN 0 AND 2), 0),
+            IFNULL(SUM(starting_position_in_class = 0), 0),
+            IFNULL(SUM(incidents), 0),
+            IFNULL(SUM(laps_complete), 0),
+            IFNULL(SUM(laps_lead), 0),
+            IFNULL(SUM(finish_position_in_class <= (IFNULL(cars_in_class, 0) + 1) / 2), 0),
+            MAX(newi_rating - oldi_rating),
+            MIN(newi_rating - oldi_rating),
+            IFNULL(SUM(newi_rating - oldi_rating), 0),
+            MAX(newi_rating),
+            MIN(CASE WHEN newi_rating > 0 THEN newi_rating END),
+            MIN(newi_rating)
+        FROM member_races
+        LEFT JOIN class_sizes
+        ON
+            class_sizes.subsession_id = member_races.subsession_id AND
+            class_sizes.car_class_id = member_races.car_class_id
+    """
+
+    try:
+        partition_results = await self._execute_archived_read_query(
+            query,
+            params=parameters,
+            season_year=season_year if season_quarter is not None else None
+        )
+    except Error as e:
+        logging.getLogger('respobot.database').error(
+            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during get_member_head2head_stats() "
+            f"for iracing_custid {iracing_custid}, series_id {series_id}, car_class_id {car_class_id}, "
+            f"season_year {season_year}, season_quarter {season_quarter}, license_category_id {license_category_id}"
+            f"official_session {official_session}, simsession_type {simsession_type}."
+        )
+        raise BotDatabaseError(
+            f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during get_member_head2head_stats() "
+            f"for iracing_custid {iracing_custid}, series_id {series_id}, car_class_id {car_class_id}, "
+            f"season_year {season_year}, season_quarter {season_quarter}, license_category_id {license_category_id}"
+            f"official_session {official_session}, simsession_type {simsession_type}.",
+            ErrorCodes.general_failure.value
+        )
+
+    keys = [
+        'total_races',
+        'total_champ_points',
+        'highest_champ_points',
+        'wins',
+        'podiums',
+        'total_poles',
+        'total_incidents',
+        'total_laps',
+        'total_laps_led',
+        'top_half',
+        'highest_ir_gain',
+        'highest_ir_loss',
+        'total_ir_change',
+        'highest_ir',
+        'lowest_positive_ir',
+        'lowest_ir'
+    ]
+
+    # Combine the totals from each database. Every subsession is in exactly one of them.
+    merge_functions = {
+        'highest_champ_points': max,
+        'highest_ir_gain': max,
+        'highest_ir_loss': min,
+        'highest_ir': max,
+        'lowest_positive_ir': min,
+        'lowest_ir': min
+    }
+
+    stats_dict = dict(zip(keys, partition_results[0][0]))
+    for partition_result in partition_results[1:]:
+        for (key, value) in zip(keys, partition_result[0]):
+            if key not in merge_functions:
+                stats_dict[key] += value
+            elif value is not None:
+                stats_dict[key] = value if stats_dict[key] is None else merge_functions[key](stats_dict[key], value)
+
+    return stats_dict
+
+
 async def get_member_official_race_subsession_ids(self, iracing_custid, category: int = None):
     """Get a list of subsession_id values for every official race entered by the member.
 
@@ -465,8 +888,8 @@ async def get_member_official_race_subsession_ids(self, iracing_custid, category
     """
     query = """
         SELECT subsessions.subsession_id
-        FROM subsessions
-        INNER JOIN results
+        FROM {schema}.subsessions AS subsessions
+        INNER JOIN {schema}.results AS results
         ON results.subsession_id = subsessions.subsession_id
         WHERE
             official_session = 1 AND
@@ -483,7 +906,7 @@ async def get_member_official_race_subsession_ids(self, iracing_custid, category
     query = query[:-4]
 
     try:
-        results = await self._execute_read_query(query, params=parameters)
+        partition_results = await self._execute_archived_read_query(query, params=parameters)
     except Error as e:
         logging.getLogger('respobot.database').error(
             f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during "
@@ -497,12 +920,12 @@ async def get_member_official_race_subsession_ids(self, iracing_custid, category
             ErrorCodes.general_failure.value
         )
 
-    if results is None or len(results) < 1:
-        return []
-
     race_list = []
-    for result_tuple in results:
-        race_list.append(result_tuple[0])
+    for partition_result in partition_results:
+        if partition_result is None:
+            continue
+        for result_tuple in partition_result:
+            race_list.append(result_tuple[0])
 
     return race_list
 
@@ -540,8 +963,8 @@ async def get_member_series_raced(
     query = """
         SELECT
             series_id
-        FROM results
-        INNER JOIN subsessions ON subsessions.subsession_id = results.subsession_id
+        FROM {schema}.results AS results
+        INNER JOIN {schema}.subsessions AS subsessions ON subsessions.subsession_id = results.subsession_id
         WHERE cust_id = ? AND"""
     parameters = (iracing_custid,)
 
@@ -582,7 +1005,11 @@ async def get_member_series_raced(
     query += " GROUP BY series_id"
 
     try:
-        results = await self._execute_read_query(query, params=parameters)
+        partition_results = await self._execute_archived_read_query(
+            query,
+            params=parameters,
+            season_year=season_year
+        )
     except Error as e:
         logging.getLogger('respobot.database').error(
             f"The sqlite3 error '{e}' occurred with code {e.sqlite_errorcode} during get_member_series_raced() "
@@ -600,13 +1027,21 @@ async def get_member_series_raced(
             ErrorCodes.general_failure.value
         )
 
-    if results is None:
+    if all(partition_result is None for partition_result in partition_results):
         return None
 
-    for result_tuple in results:
-        if len(result_tuple) > 0:
-            series_ids.append(result_tuple[0])
-        else:
-            return None
+    for partition_result in partition_results:
+        if partition_result is None:
+            continue
+        for result_tuple in partition_result:
+            if len(result_tuple) > 0:
+                if result_tuple[0] not in series_ids:
+                    series_ids.append(result_tuple[0])
+            else:
+                return None
+
+    # The same series can be raced in more than one season year, so put them back in GROUP BY order.
+    if len(partition_results) > 1:
+        series_ids.sort()
 
     return series_ids
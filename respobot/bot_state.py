@@ -50,6 +50,13 @@ class BotState:
             self.data['server_icon_angle'] = 0
             self.dump_state()
 
+        if 'last_database_maintenance' not in self.data:
+            logging.getLogger('respobot.bot').info(
+                "'last_database_maintenance' missing from bot_state, setting to None."
+            )
+            self.data['last_database_maintenance'] = None
+            self.dump_state()
+
     def dump_state(self):
         self.write_lock = True
         with open(env.BOT_DIRECTORY + env.DATA_SUBDIRECTORY + env.BOT_STATE_FILENAME, "w") as f_bot_state:
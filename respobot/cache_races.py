@@ -1,5 +1,5 @@
 from datetime import date, datetime, timezone, timedelta
-import calendar
+import asyncio
 import logging
 import discord
 from irslashdata.client import Client as IracingClient
@@ -7,21 +7,88 @@ from irslashdata.exceptions import AuthenticationError, ServerDownError
 from bot_database import BotDatabase, BotDatabaseError
 import constants
 import helpers
+import rate_limiter
+import subsession_queue
+
+
+class CacheProgress:
+    """Running totals for a cache_races() call. A CacheProgress is handed to the
+    progress_callback after every month window finishes.
+    """
+
+    def __init__(self):
+        self.members_total = 0
+        self.members_done = 0
+        self.windows_total = 0
+        self.windows_done = 0
+        self.windows_resumed = 0
+        self.subsessions_found = 0
+        self.subsessions_failed = 0
+        self.time_started = datetime.now(timezone.utc)
+
+    def __str__(self):
+        elapsed = datetime.now(timezone.utc) - self.time_started
+        return (
+            f"Caching races: {self.members_done} of {self.members_total} members done. "
+            f"{self.windows_done + self.windows_resumed} of {self.windows_total} month windows done "
+            f"({self.windows_resumed} already cached before this run). "
+            f"{self.subsessions_found} subsessions found, {self.subsessions_failed} failed. "
+            f"Elapsed: {str(elapsed).split('.')[0]}"
+        )
 
 
-async def cache_races(bot: discord.bot, db: BotDatabase, ir: IracingClient, iracing_custids: list):
+class _CacheRun:
+    """State shared by every window task of a single cache_races() call."""
+
+    def __init__(self, bot: discord.Bot, db: BotDatabase, ir: IracingClient, progress_callback):
+        self.bot = bot
+        self.db = db
+        self.ir = ir
+        self.progress = CacheProgress()
+        self.progress_callback = progress_callback
+        self.window_semaphore = asyncio.Semaphore(max(1, constants.CACHE_RACES_CONCURRENT_WINDOWS))
+        self.abort_reason = None
+
+    async def report_progress(self):
+        helpers.update_pulse()
+        if self.progress_callback is not None:
+            await self.progress_callback(self.progress)
+
+
+async def cache_races(
+    bot: discord.Bot,
+    db: BotDatabase,
+    ir: IracingClient,
+    iracing_custids: list,
+    progress_callback=None,
+    restart: bool = False
+):
+    """Cache every hosted and series subsession a member has ever driven, along with its laps.
+
+    Each member's history is split into month windows by subsession finish time. Windows are
+    searched concurrently, with every request going through rate_limiter.iracing and every
+    subsession going through subsession_queue.fetch_queue. Each finished month is recorded in
+    the 'cache_windows' table, so a run that is interrupted picks up where it left off the next
+    time it is called.
+
+    Arguments:
+        bot (discord.Bot): Used to DM the bot admin about failures.
+        db (BotDatabase): The database to cache the subsessions in.
+        ir (IracingClient): The client used to search for and fetch subsessions.
+        iracing_custids (list): The ids of the members whose races should be cached.
+
+    Keyword arguments:
+        progress_callback (coroutine function): Awaited with a CacheProgress after every window.
+        restart (bool): If True, forget the recorded windows and search each member's whole history again.
+
+    Returns:
+        The CacheProgress for the run.
+    """
+    run = _CacheRun(bot, db, ir, progress_callback)
 
     try:
-        (current_season_year, current_season_quarter, _, _, _) = await db.get_current_iracing_week()
-    except BotDatabaseError:
-        await helpers.send_bot_failure_dm(
-            bot,
-            "During cache_races() an exception was encountered when fetching current iRacing week. Abandoning."
-        )
-        return
-
-    try:
-        member_info = await ir.get_member_info(iracing_custids)
+        async with rate_limiter.iracing:
+            member_info = await ir.get_member_info(iracing_custids)
     except AuthenticationError:
         logging.getLogger('respobot.iracing').warning(
             "Authentication to the iRacing server failed when getting member info. Abandoning cache_races()."
@@ -30,7 +97,7 @@ async def cache_races(bot: discord.bot, db: BotDatabase, ir: IracingClient, irac
             bot,
             "Authentication to the iRacing server failed. Abandoning cache_races()."
         )
-        return
+        return run.progress
     except ServerDownError:
         logging.getLogger('respobot.iracing').warning(
             "The iRacing servers are down for maintenance. Abandoning cache_races()."
@@ -39,8 +106,9 @@ async def cache_races(bot: discord.bot, db: BotDatabase, ir: IracingClient, irac
             bot,
             "The iRacing servers are down for maintenance. Abandoning cache_races()."
         )
-        return
+        return run.progress
 
+    member_windows = []
     for member in member_info:
 
         if 'cust_id' not in member:
@@ -58,240 +126,219 @@ async def cache_races(bot: discord.bot, db: BotDatabase, ir: IracingClient, irac
             )
             continue
 
-        year = date_started.year
+        try:
+            if restart is True:
+                await db.clear_cache_windows(iracing_custid)
+            completed_windows = await db.get_completed_cache_windows(iracing_custid)
+        except BotDatabaseError as exc:
+            logging.getLogger('respobot.bot').warning(
+                f"During cache_races() an exception was encountered when loading the cached month windows "
+                f"for {member['display_name']}. Skipping this member: {exc}"
+            )
+            await helpers.send_bot_failure_dm(
+                bot,
+                f"During cache_races() an exception was encountered when loading the cached month windows "
+                f"for {member['display_name']}. Skipping this member: {exc}"
+            )
+            continue
+
+        windows = _get_month_windows(date_started)
+        windows_to_cache = [window for window in windows if window[0] not in completed_windows]
+
         logging.getLogger('respobot.bot').info(
             f"{member['display_name']} joined iRacing on {member['member_since']}. "
-            f"Gathering subsessions back to {str(year)}."
+            f"Gathering subsessions back to {str(date_started.year)}. "
+            f"{len(windows) - len(windows_to_cache)} of {len(windows)} month windows were already cached."
         )
-        quarter = 1
 
-        subsession_summary_dicts = []
+        run.progress.members_total += 1
+        run.progress.windows_total += len(windows)
+        run.progress.windows_resumed += len(windows) - len(windows_to_cache)
+        member_windows.append((member, windows_to_cache, completed_windows))
 
-        # Get all hosted sessions
-        caching_done = False
-        start_time = datetime(date_started.year, 1, 1, tzinfo=timezone.utc)
-        latest_session_end_time = None
-
-        while caching_done is False:
-            helpers.update_pulse()
-            year_rollover = False
-            num_days = calendar.monthrange(start_time.year, start_time.month)[1]
-            end_time = start_time + timedelta(days=num_days) - timedelta(seconds=1)
-            if(end_time.year > start_time.year):
-                end_time = end_time.replace(year=start_time.year, month=12, day=31, hour=23, minute=59, second=59)
-                year_rollover = True
-
-            if end_time > datetime.now(timezone.utc):
-                end_time = datetime.now(timezone.utc)
-            end_time = end_time.replace(microsecond=0)
-
-            if end_time - start_time < timedelta(seconds=constants.FAST_LOOP_INTERVAL):
-                caching_done = True
-
-            logging.getLogger('respobot.bot').info(
-                f"Gathering list of hosted subsessions for {start_time} to {end_time}."
-            )
-            finish_range_begin = start_time.isoformat().replace("+00:00", "Z")
-            finish_range_end = end_time.isoformat().replace("+00:00", "Z")
+    await run.report_progress()
 
-            if year_rollover is True:
-                end_time += timedelta(seconds=1)
-            start_time = end_time + timedelta(seconds=1)
+    await asyncio.gather(
+        *[
+            _cache_member(run, member, windows_to_cache, completed_windows)
+            for (member, windows_to_cache, completed_windows) in member_windows
+        ]
+    )
 
-            try:
-                hosted_results_dicts = await ir.search_hosted(
-                    cust_id=iracing_custid,
-                    finish_range_begin=finish_range_begin,
-                    finish_range_end=finish_range_end
-                )
-            except AuthenticationError:
-                logging.getLogger('respobot.iracing').warning(
-                    "Authentication to the iRacing server failed when searching hosted races. "
-                    "Abandoning cache_races()."
-                )
-                await helpers.send_bot_failure_dm(
-                    bot,
-                    "Authentication to the iRacing server failed when searching hosted races. "
-                    "Abandoning cache_races()."
-                )
-                return
-            except ServerDownError:
-                logging.getLogger('respobot.iracing').warning(
-                    "The iRacing servers are down for maintenance. Abandoning cache_races()."
-                )
-                await helpers.send_bot_failure_dm(
-                    bot,
-                    "The iRacing servers are down for maintenance. Abandoning cache_races()."
-                )
-                return
+    if run.abort_reason is not None:
+        logging.getLogger('respobot.iracing').warning(f"{run.abort_reason} Abandoning cache_races().")
+        await helpers.send_bot_failure_dm(bot, f"{run.abort_reason} Abandoning cache_races().")
+        return run.progress
 
-            logging.getLogger('respobot.bot').info(str(len(hosted_results_dicts)) + " subsessions found.")
-            # subsession_summary_dicts.append(hosted_results_dicts)
-            subsession_summary_dicts += hosted_results_dicts
+    logging.getLogger('respobot.bot').info(f"Done caching races! {run.progress}")
+    return run.progress
 
-        # Get all series sessions
-        caching_done = False
 
-        while caching_done is False:
-            helpers.update_pulse()
-            logging.getLogger('respobot.bot').info(
-                f"Gathering list of series subsessions for {year}s{quarter}"
-            )
-            series_results_dicts = await ir.search_results(
-                cust_id=iracing_custid,
-                season_year=year,
-                season_quarter=quarter
-            )
+def _get_month_windows(date_started: date):
+    """Split the time from the start of the year a member joined until now into calendar months.
 
-            logging.getLogger('respobot.bot').info(str(len(series_results_dicts)) + " subsessions found.")
-            # subsession_summary_dicts.append(series_results_dicts)
-            subsession_summary_dicts += series_results_dicts
+    Returns:
+        A list of (window_start, window_end) datetime tuples. The last window ends now.
+    """
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    windows = []
+    window_start = datetime(date_started.year, 1, 1, tzinfo=timezone.utc)
 
-            quarter += 1
+    while window_start < now:
+        if window_start.month == 12:
+            next_window_start = window_start.replace(year=window_start.year + 1, month=1)
+        else:
+            next_window_start = window_start.replace(month=window_start.month + 1)
+        window_end = min(next_window_start - timedelta(seconds=1), now)
+        windows.append((window_start, window_end))
+        window_start = next_window_start
 
-            if quarter > 4:
-                quarter = 1
-                year += 1
+    return windows
 
-            if year > current_season_year or (year == current_season_year and quarter > current_season_quarter):
-                caching_done = True
 
-        # Now iterate through all the subsession_summary_dicts and cache the subsession data and laps for each
-        latest_session_end_time = None
-        subsession_count = 0
-        for subsession_summary_dict in subsession_summary_dicts:
-            helpers.update_pulse()
-            subsession_count += 1
-            logging.getLogger('respobot.bot').info(
-                f"Caching subsession {subsession_count} of {len(subsession_summary_dicts)}"
-            )
-            if 'end_time' in subsession_summary_dict:
-                new_race_end_time = datetime.fromisoformat(subsession_summary_dict['end_time'])
-                if latest_session_end_time is None or new_race_end_time > latest_session_end_time:
-                    latest_session_end_time = new_race_end_time
+async def _cache_member(run: _CacheRun, member: dict, windows_to_cache: list, completed_windows: dict):
+    iracing_custid = member['cust_id']
 
-            subsessionInDb = await db.is_subsession_in_db(subsession_summary_dict['subsession_id'])
-            subsessionLapsInDb = await db.is_subsession_in_laps_table(subsession_summary_dict['subsession_id'])
+    window_latest_end_times = await asyncio.gather(
+        *[
+            _cache_window(run, iracing_custid, window_start, window_end)
+            for (window_start, window_end) in windows_to_cache
+        ]
+    )
 
-            try:
-                if subsessionInDb:
-                    if subsessionLapsInDb:
-                        logging.getLogger('respobot.bot').debug(
-                            f"Subsession {subsession_summary_dict['subsession_id']} already logged. Skipping."
-                        )
-                        continue
-                    else:
-                        logging.getLogger('respobot.bot').warning(
-                            f"Subsession {subsession_summary_dict['subsession_id']} in subsessions table"
-                            f" but not not laps table. Adding subsession."
-                        )
+    if run.abort_reason is not None:
+        return
 
-            except BotDatabaseError as exc:
-                logging.getLogger('respobot.bot').warning(
-                    f"During cache_races() an exception was caught when checking if "
-                    f"subsession {subsession_summary_dict['subsession_id']} is in the database. "
-                    f"Subsession skipped: Exception: {exc}"
+    latest_session_end_time = None
+    for end_time in list(completed_windows.values()) + window_latest_end_times:
+        if end_time is not None and (latest_session_end_time is None or end_time > latest_session_end_time):
+            latest_session_end_time = end_time
+
+    # If the person has never done a hosted session or a race, set the latest_session_found to two days ago
+    # to make sure we don't miss a session in the off chance they were added right while they were finishing
+    # a 24-hour event.
+    if latest_session_end_time is None:
+        latest_session_end_time = datetime.now(timezone.utc) - timedelta(days=2)
+
+    try:
+        await run.db.set_member_latest_session_found(iracing_custid, latest_session_end_time)
+    except BotDatabaseError as exc:
+        logging.getLogger('respobot.bot').warning(
+            f"During cache_races() an exception was encountered when updating "
+            f"last_session_found for {member['display_name']}: {exc}"
+        )
+        await helpers.send_bot_failure_dm(
+            run.bot,
+            f"During cache_races() an exception was encountered when updating "
+            f"last_session_found for {member['display_name']}: {exc}"
+        )
+
+    run.progress.members_done += 1
+    await run.report_progress()
+
+
+async def _cache_window(run: _CacheRun, iracing_custid: int, window_start: datetime, window_end: datetime):
+    """Search one month of a member's history and cache every subsession found.
+
+    Returns:
+        The end time of the latest subsession found in the window as a datetime, or None if
+        there were no subsessions or the window couldn't be searched.
+    """
+    async with run.window_semaphore:
+        if run.abort_reason is not None:
+            return None
+
+        logging.getLogger('respobot.bot').info(
+            f"Gathering list of subsessions for cust_id {iracing_custid} from {window_start} to {window_end}."
+        )
+        finish_range_begin = window_start.isoformat().replace("+00:00", "Z")
+        finish_range_end = window_end.isoformat().replace("+00:00", "Z")
+
+        try:
+            async with rate_limiter.iracing:
+                hosted_results_dicts = await run.ir.search_hosted(
+                    cust_id=iracing_custid,
+                    finish_range_begin=finish_range_begin,
+                    finish_range_end=finish_range_end
                 )
-                await helpers.send_bot_failure_dm(
-                    bot,
-                    f"During cache_races() an exception was caught when checking if "
-                    f"subsession {subsession_summary_dict['subsession_id']} is in the database. "
-                    f"Subsession skipped: Exception: {exc}"
+            async with rate_limiter.iracing:
+                series_results_dicts = await run.ir.search_results(
+                    cust_id=iracing_custid,
+                    finish_range_begin=finish_range_begin,
+                    finish_range_end=finish_range_end
                 )
-                continue
+        except AuthenticationError:
+            run.abort_reason = "Authentication to the iRacing server failed when searching for races."
+            return None
+        except ServerDownError:
+            run.abort_reason = "The iRacing servers are down for maintenance."
+            return None
+        except Exception as exc:
+            logging.getLogger('respobot.iracing').warning(
+                f"Searching for subsessions for cust_id {iracing_custid} from {window_start} to {window_end} "
+                f"failed. The window will be tried again on the next run: {exc}"
+            )
+            return None
 
-            new_subsession = await ir.subsession_data(subsession_summary_dict['subsession_id'])
+        subsession_summary_dicts = []
+        if hosted_results_dicts is not None:
+            subsession_summary_dicts += hosted_results_dicts
+        if series_results_dicts is not None:
+            subsession_summary_dicts += series_results_dicts
+
+        latest_end_time = None
+        subsession_ids = []
+        seen_subsession_ids = set()
+        for subsession_summary_dict in subsession_summary_dicts:
+            if 'end_time' in subsession_summary_dict:
+                new_race_end_time = datetime.fromisoformat(subsession_summary_dict['end_time'])
+                if latest_end_time is None or new_race_end_time > latest_end_time:
+                    latest_end_time = new_race_end_time
+            if subsession_summary_dict['subsession_id'] not in seen_subsession_ids:
+                seen_subsession_ids.add(subsession_summary_dict['subsession_id'])
+                subsession_ids.append(subsession_summary_dict['subsession_id'])
 
-            if new_subsession is None:
+        logging.getLogger('respobot.bot').info(
+            f"{len(subsession_ids)} subsessions found for cust_id {iracing_custid} from {window_start} to {window_end}."
+        )
+
+        # The shared fetch queue skips anything that's already in the database or already being
+        # fetched by get_race_results() and writes new subsessions to the database in batches.
+        subsession_fetches = await asyncio.gather(
+            *[
+                subsession_queue.fetch_queue.fetch(run.bot, run.db, run.ir, subsession_id)
+                for subsession_id in subsession_ids
+            ]
+        )
+        subsessions_failed = 0
+        for subsession_fetch in subsession_fetches:
+            if subsession_fetch['failed'] is True:
+                subsessions_failed += 1
                 logging.getLogger('respobot.bot').warning(
-                    f"No subsession data returned for subsession {subsession_summary_dict['subsession_id']}. Skipping."
+                    f"Subsession {subsession_fetch['subsession_id']} could not be cached. Skipping."
                 )
-                continue
 
-            # Add the new race to the database
-            if subsessionInDb is False:
-                logging.getLogger('respobot.bot').debug(
-                    f"Adding subsession {subsession_summary_dict['subsession_id']} to subsessions and results table."
+        run.progress.subsessions_found += len(subsession_ids)
+        run.progress.subsessions_failed += subsessions_failed
+
+        # Only record the window once every subsession in it is cached and it's old enough that no more
+        # results will show up for it. Anything else is searched again on the next run.
+        window_settled = window_end < datetime.now(timezone.utc) - timedelta(days=constants.CACHE_RACES_SETTLE_DAYS)
+        if subsessions_failed == 0 and window_settled:
+            try:
+                await run.db.set_cache_window_completed(
+                    iracing_custid,
+                    window_start,
+                    len(subsession_ids),
+                    latest_end_time=latest_end_time
                 )
-                try:
-                    await db.add_subsessions([new_subsession])
-                except BotDatabaseError as exc:
-                    logging.getLogger('respobot.bot').warning(
-                        f"During cache_races() an exception was encountered when adding "
-                        f"subsession {new_subsession['subsession_id']} to the database: {exc}"
-                    )
-                    await helpers.send_bot_failure_dm(
-                        bot,
-                        f"During cache_races() an exception was encountered when adding "
-                        f"subsession {new_subsession['subsession_id']} to the database: {exc}"
-                    )
-
-            # And now for the laps
-            if subsessionLapsInDb is False:
-                logging.getLogger('respobot.bot').debug(
-                    f"Adding subsession {subsession_summary_dict['subsession_id']} laps to laps table."
+            except BotDatabaseError as exc:
+                logging.getLogger('respobot.bot').warning(
+                    f"During cache_races() an exception was encountered when recording the window starting "
+                    f"{window_start} for cust_id {iracing_custid} as cached: {exc}"
                 )
-                if 'session_results' not in new_subsession or len(new_subsession['session_results']) < 1:
-                    logging.getLogger('respobot.bot').warning(
-                        f"No subsession results for subsession {subsession_summary_dict['subsession_id']}."
-                        f" Skipping laps."
-                    )
-                    continue
-
-                for session_result_dict in new_subsession['session_results']:
-                    if 'simsession_number' not in session_result_dict or 'results' not in session_result_dict:
-                        logging.getLogger('respobot.bot').warning(
-                            f"No simsession_number in session_result_dict for subsession"
-                            f" {subsession_summary_dict['subsession_id']}. Skipping laps."
-                        )
-                        continue
-
-                    lap_dicts = await ir.lap_data(
-                        new_subsession['subsession_id'],
-                        session_result_dict['simsession_number']
-                    )
-
-                    if lap_dicts is None or len(lap_dicts) < 1:
-                        logging.getLogger('respobot.bot').warning(
-                            f"No laps returned by iR stats server for subsession"
-                            f" {subsession_summary_dict['subsession_id']}. Skipping laps."
-                        )
-                        continue
-
-                    try:
-                        await db.add_laps(
-                            lap_dicts,
-                            new_subsession['subsession_id'],
-                            session_result_dict['simsession_number']
-                        )
-                    except BotDatabaseError as exc:
-                        logging.getLogger('respobot.bot').warning(
-                            f"During cache_races() an exception was encountered when adding "
-                            f"laps to the database: {exc}"
-                        )
-                        await helpers.send_bot_failure_dm(
-                            bot,
-                            f"During cache_races() an exception was encountered when adding "
-                            f"laps to the database: {exc}"
-                        )
-
-        # If the person has never done a hosted session or a race, set the latest_session_found to two days ago
-        # to make sure we don't miss a session in the off chance they were added right while they were finishing
-        # a 24-hour event.
-        if latest_session_end_time is None:
-            latest_session_end_time = datetime.now(timezone.utc) - timedelta(days=2)
 
-        try:
-            await db.set_member_latest_session_found(iracing_custid, latest_session_end_time)
-        except BotDatabaseError as exc:
-            logging.getLogger('respobot.bot').warning(
-                f"During cache_races() an exception was encountered when updating "
-                f"last_session_found for {member['display_name']}: {exc}"
-            )
-            await helpers.send_bot_failure_dm(
-                bot,
-                f"During cache_races() an exception was encountered when updating "
-                f"last_session_found for {member['display_name']}: {exc}"
-            )
+        run.progress.windows_done += 1
+        await run.report_progress()
 
-    logging.getLogger('respobot.bot').info("Done caching races!")
+        return latest_end_time
@@ -1,11 +1,15 @@
 import discord
 from discord.ext import commands
 from discord.commands import Option
+import io
 import logging
+from datetime import datetime, timezone, timedelta
 import constants
 import environment_variables as env
 import cache_races
 import update_series
+import avatar_cache
+import image_renderer
 from slash_command_helpers import SlashCommandHelpers
 from discord.commands import SlashCommandGroup
 from irslashdata.exceptions import AuthenticationError, ServerDownError
@@ -450,12 +454,13 @@ class AdminCommandsCog(commands.Cog):
 
     @admin_command_group.command(
         name='refresh_cache',
-        description="Used by Deryk to rebuild the race cache from scratch."
+        description="Used by Deryk to rebuild the race cache. Picks up where the last run stopped."
     )
     async def admin_refresh_cache(
         self,
         ctx,
-        iracing_custid: Option(int, "iRacing id.", required=False)
+        iracing_custid: Option(int, "iRacing id.", required=False),
+        restart: Option(bool, "Ignore the months already cached and start from scratch.", required=False)
     ):
         try:
             if not self.is_admin(ctx.user.id):
@@ -466,12 +471,37 @@ class AdminCommandsCog(commands.Cog):
                 return
 
             await ctx.respond("Working on it...", ephemeral=True)
+
+            last_progress_update = datetime.now(timezone.utc)
+
+            async def show_progress(progress):
+                nonlocal last_progress_update
+                now = datetime.now(timezone.utc)
+                if now - last_progress_update < timedelta(seconds=constants.CACHE_RACES_PROGRESS_INTERVAL):
+                    return
+                last_progress_update = now
+                try:
+                    await ctx.edit(content=str(progress))
+                except discord.HTTPException:
+                    # Sometimes caching takes long enough to run that the webhook expires
+                    # and editing the message fails.
+                    pass
+
             if iracing_custid is None:
-                await cache_races.cache_races(self.db, self.ir, await self.db.fetch_iracing_cust_ids())
+                iracing_custids = await self.db.fetch_iracing_cust_ids()
             else:
-                await cache_races.cache_races(self.db, self.ir, [iracing_custid])
+                iracing_custids = [iracing_custid]
+
+            progress = await cache_races.cache_races(
+                self.bot,
+                self.db,
+                self.ir,
+                iracing_custids,
+                progress_callback=show_progress,
+                restart=(restart is True)
+            )
             try:
-                await ctx.edit(content="Done!")
+                await ctx.edit(content=f"Done! {progress}")
             except discord.HTTPException:
                 # Sometimes caching takes long enough to run that the webhook expires
                 # and editing the message fails.
@@ -493,5 +523,91 @@ class AdminCommandsCog(commands.Cog):
             )
             return
 
+    @admin_command_group.command(
+        name='query_stats',
+        description="Used by Deryk to see how long each database query has been taking."
+    )
+    async def admin_query_stats(
+        self,
+        ctx,
+        reset: Option(bool, "Clear the stats after showing them.", required=False)
+    ):
+        try:
+            if not self.is_admin(ctx.user.id):
+                await ctx.respond(
+                    "https://tenor.com/view/you-didnt-say-the-magic-word-ah-ah-nope-wagging-finger-gif-17646607",
+                    ephemeral=True
+                )
+                return
+
+            if self.db.profiler is None:
+                await ctx.respond("Query profiling is turned off.", ephemeral=True)
+                return
+
+            report = self.db.profiler.report()
+            if reset is True:
+                self.db.profiler.reset()
+
+            # The table is too wide and too long for a message, so send it as a file.
+            await ctx.respond(
+                "Database query stats:",
+                file=discord.File(io.BytesIO(report.encode('utf-8')), filename="query_stats.txt"),
+                ephemeral=True
+            )
+        except (discord.HTTPException, discord.Forbidden, discord.InvalidArgument) as exc:
+            await SlashCommandHelpers.process_command_failure(
+                self.bot,
+                ctx,
+                "Discord error.",
+                exc
+            )
+            return
+
+    @admin_command_group.command(
+        name='bot_stats',
+        description="Used by Deryk to see how the bot's caches, image rendering and database maintenance are doing."
+    )
+    async def admin_bot_stats(self, ctx):
+        try:
+            if not self.is_admin(ctx.user.id):
+                await ctx.respond(
+                    "https://tenor.com/view/you-didnt-say-the-magic-word-ah-ah-nope-wagging-finger-gif-17646607",
+                    ephemeral=True
+                )
+                return
+
+            report = (
+                str(self.db.member_directory) + "\n"
+                + str(avatar_cache.avatars) + "\n"
+                + str(image_renderer.renderer) + "\n\n"
+            )
+            if len(self.db.maintenance_history) < 1:
+                report += "Database maintenance hasn't run since the bot started.\n"
+            for maintenance_run in self.db.maintenance_history:
+                report += (
+                    f"Maintenance at {maintenance_run['time'].isoformat()}: "
+                    f"optimize {maintenance_run['optimize_seconds']:.2f}s"
+                )
+                if maintenance_run['backup'] is not None:
+                    report += (
+                        f", backup {maintenance_run['backup']['seconds']:.2f}s "
+                        f"({maintenance_run['backup']['restarts']} restarts)"
+                    )
+                report += "\n"
+
+            await ctx.respond(
+                "Bot stats:",
+                file=discord.File(io.BytesIO(report.encode('utf-8')), filename="bot_stats.txt"),
+                ephemeral=True
+            )
+        except (discord.HTTPException, discord.Forbidden, discord.InvalidArgument) as exc:
+            await SlashCommandHelpers.process_command_failure(
+                self.bot,
+                ctx,
+                "Discord error.",
+                exc
+            )
+            return
+
     def is_admin(self, discord_id):
         return discord_id == env.ADMIN_ID
@@ -9,6 +9,7 @@ from bot_database import BotDatabaseError
 import stats_helpers as stats
 import environment_variables as env
 import image_generators as image_gen
+import image_renderer
 import constants
 
 # other imports
@@ -195,11 +196,15 @@ class ChampCog(commands.Cog):
                     title_text += " class " + car
                 title_text += " for " + str(selected_year) + "s" + str(selected_quarter)
 
-                graph = image_gen.generate_champ_graph(week_data, title_text, weeks_to_count, ongoing)
+                png_bytes = await image_renderer.renderer.render(
+                    image_gen.generate_champ_graph,
+                    week_data,
+                    title_text,
+                    weeks_to_count,
+                    ongoing
+                )
 
-                graph_memory_file = io.BytesIO()
-                graph.save(graph_memory_file, format='png')
-                graph_memory_file.seek(0)
+                graph_memory_file = io.BytesIO(png_bytes)
 
                 picture = discord.File(
                     graph_memory_file,
@@ -10,6 +10,7 @@ import environment_variables as env
 from slash_command_helpers import SlashCommandHelpers, SeasonStringError
 import stats_helpers as stats
 import image_generators as image_gen
+import image_renderer
 from bot_database import BotDatabaseError
 
 
@@ -79,18 +80,18 @@ class CompassCog(commands.Cog):
                 await ctx.edit(content="There aren't any members entered into the database yet. Go yell at Deryk.")
                 return
 
+            compass_points = await stats.calculate_compass_points(
+                self.db,
+                [member_dict['iracing_custid'] for member_dict in member_dicts if 'iracing_custid' in member_dict],
+                year=year,
+                quarter=quarter,
+                category=helpers.get_category_from_option(category)
+            )
+
             for member_dict in member_dicts:
                 if 'iracing_custid' in member_dict and 'name' in member_dict and 'discord_id' in member_dict:
                     name = member_dict['name']
-                    member_stats[name] = await stats.calculate_compass_point(
-                        self.db,
-                        member_dict['iracing_custid'],
-                        year=year,
-                        quarter=quarter,
-                        category=helpers.get_category_from_option(category),
-                        series=None,
-                        car_class=None
-                    )
+                    member_stats[name] = compass_points[member_dict['iracing_custid']]
                     if member_stats[name]['laps_per_inc'] != math.inf:
                         compass_data[name] = {}
                         compass_data[name]['point'] = (
@@ -108,11 +109,15 @@ class CompassCog(commands.Cog):
             else:
                 time_span_text = season
 
-            image = await image_gen.generate_compass_image(ctx.guild, compass_data, time_span_text)
+            avatars = await image_gen.generate_compass_avatars(ctx.guild, compass_data)
+            png_bytes = await image_renderer.renderer.render(
+                image_gen.render_compass_image,
+                compass_data,
+                time_span_text,
+                avatars
+            )
 
-            image_memory_file = io.BytesIO()
-            image.save(image_memory_file, format='png')
-            image_memory_file.seek(0)
+            image_memory_file = io.BytesIO(png_bytes)
 
             picture = discord.File(
                 image_memory_file,
@@ -7,6 +7,7 @@ from discord.commands import Option
 from slash_command_helpers import SlashCommandHelpers
 import environment_variables as env
 import image_generators as image_gen
+import image_renderer
 import constants
 import stats_helpers as stats
 from bot_database import BotDatabaseError
@@ -86,11 +87,14 @@ class CornersPerIncidentCog(commands.Cog):
                 title_text += f"\n{series_name}"
             else:
                 title_text += f"\nAll Series"
-            graph = image_gen.generate_cpi_graph(member_dict, title_text, False)
+            png_bytes = await image_renderer.renderer.render(
+                image_gen.generate_cpi_graph,
+                member_dict,
+                title_text,
+                False
+            )
 
-            graph_memory_file = io.BytesIO()
-            graph.save(graph_memory_file, format='png')
-            graph_memory_file.seek(0)
+            graph_memory_file = io.BytesIO(png_bytes)
 
             picture = discord.File(
                 graph_memory_file,
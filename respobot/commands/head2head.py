@@ -9,6 +9,7 @@ import environment_variables as env
 from slash_command_helpers import SlashCommandHelpers, SeasonStringError
 import stats_helpers as stats
 import image_generators as image_gen
+import image_renderer
 from irslashdata import constants as irConstants
 from bot_database import BotDatabaseError
 
@@ -132,18 +133,23 @@ class Head2HeadCog(commands.Cog):
             else:
                 title = "Full Career"
 
-            image = await image_gen.generate_head2head_image(
+            (racer1_avatar, racer2_avatar) = await image_gen.generate_head2head_avatars(
                 ctx.guild,
+                racer1_dict,
+                racer2_dict
+            )
+            png_bytes = await image_renderer.renderer.render(
+                image_gen.render_head2head_image,
                 title,
                 racer1_dict,
                 racer1_stats,
                 racer2_dict,
-                racer2_stats
+                racer2_stats,
+                racer1_avatar,
+                racer2_avatar
             )
 
-            image_memory_file = io.BytesIO()
-            image.save(image_memory_file, format='png')
-            image_memory_file.seek(0)
+            image_memory_file = io.BytesIO(png_bytes)
 
             picture = discord.File(
                 image_memory_file,
@@ -8,6 +8,7 @@ import constants
 import helpers
 from slash_command_helpers import SlashCommandHelpers
 import image_generators as image_gen
+import image_renderer
 from irslashdata import constants as irConstants
 from irslashdata.exceptions import AuthenticationError, ServerDownError
 from discord.commands import SlashCommandGroup
@@ -199,11 +200,11 @@ class IrCommandsCog(commands.Cog):
                             chart_type=1
                         )
                     for point_dict in irating_data:
-                        time_point = datetime.fromisoformat(point_dict['when'])
+                        time_point = int(datetime.fromisoformat(point_dict['when']).timestamp())
                         member_dict['ir_data'].append((time_point, point_dict['value']))
                     if irating_data2 is not None:
                         for point_dict in irating_data2:
-                            time_point = datetime.fromisoformat(point_dict['when'])
+                            time_point = int(datetime.fromisoformat(point_dict['when']).timestamp())
                             member_dict['ir_data2'].append((time_point, point_dict['value']))
                 else:
                     if(category_id == irConstants.Category.road.value):
@@ -231,7 +232,8 @@ class IrCommandsCog(commands.Cog):
 
             if len(sorted_member_dicts) > 1:
                 title_text = f"Respo Racing {category} iRating Graph"
-                graph = image_gen.generate_ir_graph(
+                png_bytes = await image_renderer.renderer.render(
+                    image_gen.generate_ir_graph,
                     sorted_member_dicts,
                     title_text,
                     True,
@@ -243,7 +245,8 @@ class IrCommandsCog(commands.Cog):
                     title_text = f"{category} iRating Graph for {sorted_member_dicts[0]['name']}"
                 else:
                     title_text = f"{category} iRating Graph for {sorted_member_dicts[0]['name']} ({str(irating)})"
-                graph = image_gen.generate_ir_graph(
+                png_bytes = await image_renderer.renderer.render(
+                    image_gen.generate_ir_graph,
                     sorted_member_dicts,
                     title_text,
                     False,
@@ -258,9 +261,7 @@ class IrCommandsCog(commands.Cog):
                     )
                 return
 
-            graph_memory_file = io.BytesIO()
-            graph.save(graph_memory_file, format='png')
-            graph_memory_file.seek(0)
+            graph_memory_file = io.BytesIO(png_bytes)
 
             picture = discord.File(
                 graph_memory_file,
@@ -331,11 +332,11 @@ class IrCommandsCog(commands.Cog):
                 await ctx.edit(content="There aren't any members entered into the database yet. Go yell at Deryk.")
                 return
 
+            category_id = helpers.get_category_from_option(category)
+            latest_irs = await self.db.get_latest_irs([category_id])
+
             for member_dict in member_dicts:
-                latest_road_ir_in_db = await self.db.get_member_ir(
-                    member_dict['iracing_custid'],
-                    category_id=helpers.get_category_from_option(category),
-                )
+                latest_road_ir_in_db = latest_irs.get(member_dict['iracing_custid'], {}).get(category_id)
                 if latest_road_ir_in_db is None or latest_road_ir_in_db < 0:
                     continue
                 ir_dict[helpers.spongify(member_dict['name'])] = latest_road_ir_in_db
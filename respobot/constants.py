@@ -14,6 +14,22 @@ REFERENCE_SERIES = 139
 RACE_REPORT_COOLDOWN_HOURS = 12
 FAST_LOOP_INTERVAL = 75
 SLOW_LOOP_INTERVAL = 600
+DATABASE_READER_CONNECTIONS = 4
+DATABASE_SLOW_QUERY_THRESHOLD = 0.25
+DATABASE_LAP_STORAGE = 'rows'
+DATABASE_ARCHIVE_SUBDIRECTORY = 'archives/'
+DATABASE_BACKUP_SUBDIRECTORY = 'backups/'
+DATABASE_BACKUPS_TO_KEEP = 3
+DATABASE_MAINTENANCE_INTERVAL = 86400
+CACHE_RACES_CONCURRENT_WINDOWS = 8
+CACHE_RACES_SETTLE_DAYS = 2
+CACHE_RACES_PROGRESS_INTERVAL = 15
+IRACING_MAX_CONCURRENT_REQUESTS = 4
+IRACING_MIN_REQUEST_INTERVAL = 0.1
+SUBSESSION_WRITE_BATCH_SIZE = 50
+IMAGE_RENDER_WORKERS = 2
+AVATAR_CACHE_MEMORY_SIZE = 128
+AVATAR_CACHE_SUBDIRECTORY = 'avatars/'
 IRACING_CATEGORIES = ['Sports Car', 'Formula Car', 'Oval', 'Dirt Road', 'Dirt Oval', 'Road (retired)']
 IRACING_CATEGORY_NUMBERS = [5, 6, 1, 4, 3, 2]
 IRACING_SPORTS_FORMULA_SPLIT_DATETIME = '2024-03-05T08:00:00Z'
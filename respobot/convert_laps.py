@@ -0,0 +1,59 @@
+"""
+Packs every lap in the 'laps' table into the columnar 'lap_blocks' table and then vacuums the
+database to give the freed space back to the filesystem.
+
+Usage:
+    python convert_laps.py [path/to/database.db] [subsessions per transaction]
+
+If no path is given, the database from the .env file is used. Stop the bot first, since VACUUM
+needs the database to itself. The conversion commits as it goes, so it can be interrupted and
+run again. Once it has finished, set DATABASE_LAP_STORAGE in constants.py to 'columnar' so that
+the bot writes new laps into 'lap_blocks' as well.
+"""
+
+import asyncio
+import os
+import sys
+from dotenv import load_dotenv
+from bot_database import BotDatabase, BotDatabaseError
+import environment_variables as env
+
+
+async def main():
+    load_dotenv()
+
+    if len(sys.argv) > 1:
+        filename = sys.argv[1]
+    else:
+        filename = env.BOT_DIRECTORY + env.DATA_SUBDIRECTORY + env.DATABASE_FILENAME
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    db = BotDatabase(filename, max_retries=5, slow_query_threshold=None, lap_storage='columnar')
+
+    try:
+        await db.open_connections()
+        await db.init_tables()
+
+        size_before = os.path.getsize(filename)
+
+        try:
+            stats = await db.convert_laps_to_columnar(batch_size=batch_size)
+        except BotDatabaseError as exc:
+            print(f"The conversion stopped part way through: {exc}")
+            return
+
+        print(
+            f"Packed {stats['laps']} laps from {stats['subsessions']} subsessions into "
+            f"{stats['blocks']} blocks in {stats['seconds']:.1f}s."
+        )
+
+        print("Vacuuming the database...")
+        await db._execute_write_query("VACUUM")
+        size_after = os.path.getsize(filename)
+        print(f"Database size went from {size_before / 2 ** 20:.1f} MiB to {size_after / 2 ** 20:.1f} MiB.")
+    finally:
+        await db.close_connections()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
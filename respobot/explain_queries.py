@@ -0,0 +1,163 @@
+"""
+Replays the queries that the slash commands make against a copy of the database and reports which
+indexes each one uses, so that new indexes can be checked against real data before they ship.
+
+Usage:
+    python explain_queries.py [path/to/database.db] [number of members to sample]
+
+If no path is given, the database from the .env file is used. Nothing is written to the database
+apart from the index migrations that init_tables() runs.
+"""
+
+import asyncio
+import sys
+import time
+from dotenv import load_dotenv
+from irslashdata import constants as irConstants
+from bot_database import BotDatabase, BotDatabaseError
+from bot_database._profiler import QueryProfiler
+import environment_variables as env
+
+
+class QueryRecorder:
+    """Wraps db._execute_read_query() and remembers every query that goes through it along with the
+    function that made it and how long it took.
+    """
+
+    def __init__(self, db: BotDatabase):
+        self.db = db
+        self.queries = {}
+        self._execute_read_query = db._execute_read_query
+        db._execute_read_query = self.execute_read_query
+
+    async def execute_read_query(self, query, params=None, attach=None, call_site=None):
+        if call_site is None:
+            call_site = QueryProfiler.get_call_site()
+        time_started = time.perf_counter()
+        result = await self._execute_read_query(query, params=params, attach=attach, call_site=call_site)
+        duration = time.perf_counter() - time_started
+
+        if query not in self.queries:
+            self.queries[query] = {
+                'call_site': call_site,
+                'params': params,
+                'calls': 0,
+                'total_seconds': 0.0
+            }
+        self.queries[query]['calls'] += 1
+        self.queries[query]['total_seconds'] += duration
+        return result
+
+
+def summarize_plan(query_plan: str):
+    """Pull the indexes used and any full table scans or temp b-trees out of an EXPLAIN QUERY PLAN.
+
+    Returns:
+        A tuple of (indexes, warnings) where both are sorted lists of str.
+    """
+    indexes = set()
+    warnings = set()
+    for line in query_plan.split("\n"):
+        detail = line.strip()
+        if " USING COVERING INDEX " in detail:
+            indexes.add(detail.split(" USING COVERING INDEX ")[1].split(" ")[0] + " (covering)")
+        elif " USING INDEX " in detail:
+            indexes.add(detail.split(" USING INDEX ")[1].split(" ")[0])
+        elif " USING INTEGER PRIMARY KEY " in detail or " USING PRIMARY KEY " in detail:
+            indexes.add(detail.split(" ")[1] + " primary key")
+
+        if detail.startswith("SCAN ") and " USING " not in detail:
+            warnings.add(f"full scan of {detail.split(' ')[1]}")
+        if "USE TEMP B-TREE" in detail:
+            warnings.add(detail.lower())
+    return (sorted(indexes), sorted(warnings))
+
+
+async def replay_query_mix(db: BotDatabase, num_members: int):
+    """Runs the database calls behind the stat, graph, leaderboard and race report commands."""
+    member_dicts = await db.fetch_member_dicts()
+    (season_year, season_quarter, _, _, _) = await db.get_current_iracing_week()
+    categories = [
+        irConstants.Category.sports_car.value,
+        irConstants.Category.formula_car.value,
+        irConstants.Category.oval.value
+    ]
+
+    await db.get_weekly_champ_points(season_year, season_quarter)
+    await db.get_weekly_champ_points(season_year, season_quarter, respo_week=True)
+    await db.get_season_dates()
+    await db.get_latest_irs(categories)
+    await db.get_race_totals_by_member(season_year=season_year, season_quarter=season_quarter)
+
+    for member_dict in member_dicts[0:num_members]:
+        iracing_custid = member_dict['iracing_custid']
+        for category_id in categories:
+            await db.get_latest_ir(iracing_custid=iracing_custid, category_id=category_id)
+            await db.get_ir_data(iracing_custid=iracing_custid, category_id=category_id)
+            await db.get_race_incidents_and_corners(iracing_custid, category=category_id)
+        await db.get_member_race_results(iracing_custid)
+        await db.get_member_race_results(iracing_custid, season_year=season_year, season_quarter=season_quarter)
+        await db.get_member_head2head_stats(iracing_custid, season_year=season_year, season_quarter=season_quarter)
+        await db.get_champ_points_data(iracing_custid, season_year=season_year, season_quarter=season_quarter)
+        await db.get_member_series_raced(iracing_custid, season_year=season_year, season_quarter=season_quarter)
+
+        subsession_ids = await db.get_member_official_race_subsession_ids(iracing_custid)
+        if subsession_ids is not None and len(subsession_ids) > 0:
+            await db.get_subsession_results(subsession_ids[-1])
+            await db.get_laps(subsession_ids[-1], iracing_custid=iracing_custid)
+
+
+async def print_index_report(db: BotDatabase, recorder: QueryRecorder):
+    """Explain every recorded query and print the indexes it uses, grouped by the function that made it."""
+    # Put the real method back so the EXPLAINs aren't recorded.
+    db._execute_read_query = recorder._execute_read_query
+
+    queries_by_call_site = {}
+    for query, query_info in recorder.queries.items():
+        queries_by_call_site.setdefault(query_info['call_site'], []).append((query, query_info))
+
+    for call_site in sorted(queries_by_call_site):
+        print(f"\n{call_site}")
+        for (query, query_info) in queries_by_call_site[call_site]:
+            query_plan = await db._get_query_plan(query, query_info['params'])
+            if query_plan is None:
+                print("    Could not explain this query.")
+                continue
+            (indexes, warnings) = summarize_plan(query_plan)
+            print(
+                f"    {query_info['calls']} calls, "
+                f"{query_info['total_seconds'] * 1000 / query_info['calls']:.1f} ms mean. "
+                f"Uses: {', '.join(indexes) if len(indexes) > 0 else 'no indexes'}"
+            )
+            for warning in warnings:
+                print(f"        Warning: {warning}")
+
+
+async def main():
+    load_dotenv()
+
+    if len(sys.argv) > 1:
+        filename = sys.argv[1]
+    else:
+        filename = env.BOT_DIRECTORY + env.DATA_SUBDIRECTORY + env.DATABASE_FILENAME
+    num_members = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    db = BotDatabase(filename, max_retries=5, slow_query_threshold=None)
+
+    try:
+        await db.open_connections()
+        await db.init_tables()
+        recorder = QueryRecorder(db)
+
+        try:
+            await replay_query_mix(db, num_members)
+        except BotDatabaseError as exc:
+            print(f"Replaying the query mix failed part way through: {exc}")
+
+        await print_index_report(db, recorder)
+    finally:
+        await db.close_connections()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -60,25 +60,21 @@ async def promote_demote_members(bot: discord.Bot, db: BotDatabase):
         if member_dicts is None or len(member_dicts) < 1:
             return
 
+        latest_irs = await db.get_latest_irs([
+            irConstants.Category.road.value,
+            irConstants.Category.sports_car.value,
+            irConstants.Category.formula_car.value
+        ])
+
         for member_dict in member_dicts:
             if member_dict['is_smurf'] != 0:
                 continue
             latest_applicable_ir_in_db = None
 
-            latest_road_ir_in_db = await db.get_member_ir(
-                member_dict['iracing_custid'],
-                category_id=irConstants.Category.road.value
-            )
-
-            latest_sports_car_ir_in_db = await db.get_member_ir(
-                member_dict['iracing_custid'],
-                category_id=irConstants.Category.sports_car.value
-            )
-
-            latest_formula_car_ir_in_db = await db.get_member_ir(
-                member_dict['iracing_custid'],
-                category_id=irConstants.Category.formula_car.value
-            )
+            member_irs = latest_irs.get(member_dict['iracing_custid'], {})
+            latest_road_ir_in_db = member_irs.get(irConstants.Category.road.value)
+            latest_sports_car_ir_in_db = member_irs.get(irConstants.Category.sports_car.value)
+            latest_formula_car_ir_in_db = member_irs.get(irConstants.Category.formula_car.value)
 
             latest_applicable_ir_in_db = max([i for i in [
                 -1,
@@ -0,0 +1,97 @@
+import logging
+from PIL import Image, ImageDraw, ImageFont
+import constants
+import environment_variables as env
+
+
+# Every font size the generators in image_generators use. Other sizes are loaded the first time they're asked for.
+PRELOADED_FONT_SIZES = [12, 17, 18, 36]
+
+# Images that are drawn as circular avatars.
+AVATAR_FILENAMES = [
+    constants.BASE_AVATAR_FILENAME,
+    constants.SMURF_AVATAR_FILENAME,
+    constants.RESPO_LOGO_FILENAME
+]
+
+
+def draw_circular_mask(size: tuple):
+    """Draw the mask that crops an image of the given (width, height) to the largest circle that fits in it."""
+    (width, height) = size
+    mask = Image.new("L", size, 0)
+    draw_mask = ImageDraw.Draw(mask)
+    min_dim = width
+    if height < min_dim:
+        min_dim = height
+    min_dim -= 1
+    draw_mask.ellipse(
+        [
+            (width / 2 - min_dim / 2, height / 2 - min_dim / 2),
+            (width / 2 + min_dim / 2, height / 2 + min_dim / 2)
+        ],
+        fill=255
+    )
+    return mask
+
+
+class AssetRegistry:
+    """Keeps the font and the images from the media directory in memory so that the image generators
+    don't open and decode them again for every image.
+
+    load() reads everything up front. Call it during startup, before image_renderer forks its workers,
+    so that every worker starts with the same assets already loaded. Anything that isn't loaded yet is
+    loaded the first time it's asked for.
+
+    Everything returned is shared, so it must not be modified or closed.
+    """
+
+    def __init__(self):
+        self._fonts = {}
+        self._images = {}
+        self._circular_masks = {}
+        self._masked_images = {}
+
+    def _get_path(self, filename: str):
+        return env.BOT_DIRECTORY + env.MEDIA_SUBDIRECTORY + filename
+
+    def load(self):
+        for size in PRELOADED_FONT_SIZES:
+            self.font(size)
+        self.image(constants.GUILD_ICON_FILENAME)
+        for filename in AVATAR_FILENAMES:
+            self.masked_image(filename)
+
+        logging.getLogger('respobot.bot').info(
+            f"Loaded {len(self._fonts)} font sizes and {len(self._images)} images from the media directory."
+        )
+
+    def font(self, size):
+        size = int(size)
+        if size not in self._fonts:
+            self._fonts[size] = ImageFont.truetype(self._get_path(constants.IMAGE_FONT_FILENAME), size)
+        return self._fonts[size]
+
+    def image(self, filename: str):
+        if filename not in self._images:
+            image = Image.open(self._get_path(filename))
+            image.load()
+            self._images[filename] = image
+        return self._images[filename]
+
+    def circular_mask(self, size: tuple):
+        size = tuple(size)
+        if size not in self._circular_masks:
+            self._circular_masks[size] = draw_circular_mask(size)
+        return self._circular_masks[size]
+
+    def masked_image(self, filename: str):
+        """Get an image from the media directory cropped to a circle with a transparent background."""
+        if filename not in self._masked_images:
+            image = self.image(filename)
+            base = Image.new("RGBA", image.size, (0, 0, 0, 0))
+            self._masked_images[filename] = Image.composite(image, base, self.circular_mask(image.size))
+        return self._masked_images[filename]
+
+
+# Shared by all of the image generators.
+assets = AssetRegistry()
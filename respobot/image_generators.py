@@ -1,34 +1,45 @@
 import io
 import math
 import random
-import environment_variables as env
+import avatar_cache
 import constants
+import image_assets
 import logging
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 from datetime import datetime, date, timezone, timedelta
 from discord.errors import NotFound
 
 
+COMPASS_AVATAR_SIZE = 25
+HEAD2HEAD_IMAGE_WIDTH = 400
+HEAD2HEAD_AVATAR_SIZE = HEAD2HEAD_IMAGE_WIDTH / 7
+
+
 async def generate_guild_icon(angle):
-    icon = Image.open(env.BOT_DIRECTORY + env.MEDIA_SUBDIRECTORY + constants.GUILD_ICON_FILENAME)
-    icon = icon.rotate(angle, resample=Image.BICUBIC)
+    icon = image_assets.assets.image(constants.GUILD_ICON_FILENAME).rotate(angle, resample=Image.BICUBIC)
     return icon
 
 
+async def generate_compass_avatars(guild, compass_data):
+    avatars = {}
+    for member in compass_data:
+        avatars[member] = await generate_avatar_image(guild, compass_data[member]['discordID'], COMPASS_AVATAR_SIZE)
+    return avatars
+
+
 async def generate_compass_image(guild, compass_data, time_span_text):
+    avatars = await generate_compass_avatars(guild, compass_data)
+    return render_compass_image(compass_data, time_span_text, avatars)
+
+
+def render_compass_image(compass_data, time_span_text, avatars):
     image_width = 600
     image_height = 600
-    avatar_size = 25
+    avatar_size = COMPASS_AVATAR_SIZE
     font_size = image_width * 18 / 600
     bg = Image.new('RGBA', (image_width, image_height), color=(0, 0, 0, 255))
-    font = ImageFont.truetype(
-        env.BOT_DIRECTORY + env.MEDIA_SUBDIRECTORY + constants.IMAGE_FONT_FILENAME,
-        int(font_size)
-    )
-    fontBig = ImageFont.truetype(
-        env.BOT_DIRECTORY + env.MEDIA_SUBDIRECTORY + constants.IMAGE_FONT_FILENAME,
-        int(font_size * 2)
-    )
+    font = image_assets.assets.font(int(font_size))
+    fontBig = image_assets.assets.font(int(font_size * 2))
 
     margin_v_top = 0.0 * image_width
     margin_v_bottom = 0.05 * image_width
@@ -108,7 +119,7 @@ async def generate_compass_image(guild, compass_data, time_span_text):
                 - (compass_data[member]['point'][1] - pts_scale_min) * avg_champ_points_scale
             )
         )
-        avatar = await generate_avatar_image(guild, compass_data[member]['discordID'], avatar_size)
+        avatar = avatars[member]
         im = Image.new('RGBA', (image_width, image_height), color=(0, 0, 0, 0))
         im.paste(avatar, compass_data[member]['point'])
         bg = Image.alpha_composite(bg, im)
@@ -188,27 +199,23 @@ async def generate_avatar_image(guild, discord_id, size, is_smurf=False):
     avatar_memory_file = io.BytesIO()
     if guild is not None and discord_id is not None and discord_id > 0 and is_smurf is False:
         try:
-            member_obj = await guild.fetch_member(discord_id)
+            # Members are normally in the gateway's member cache, which saves a REST call.
+            member_obj = guild.get_member(discord_id)
+            if member_obj is None:
+                member_obj = await guild.fetch_member(discord_id)
             if member_obj and member_obj.display_avatar is not None:
+                avatar_hash = member_obj.display_avatar.key
+                avatar = avatar_cache.avatars.get(discord_id, avatar_hash, size)
+                if avatar is not None:
+                    return avatar
+
                 await member_obj.display_avatar.save(avatar_memory_file)
                 avatar_memory_file.seek(0)
                 avatar = Image.open(avatar_memory_file)
                 base = Image.new("RGBA", avatar.size, (0, 0, 0, 0))
-                mask = Image.new("L", avatar.size, 0)
-                draw_mask = ImageDraw.Draw(mask)
-                min_dim = avatar.width
-                if avatar.height < min_dim:
-                    min_dim = avatar.height
-                min_dim -= 1
-                draw_mask.ellipse(
-                    [
-                        (avatar.width / 2 - min_dim / 2, avatar.height / 2 - min_dim / 2),
-                        (avatar.width / 2 + min_dim / 2, avatar.height / 2 + min_dim / 2)
-                    ],
-                    fill=255
-                )
-                avatar = Image.composite(avatar, base, mask)
-                avatar = avatar.resize((int(avatar.width / min_dim * size), int(avatar.height / min_dim * size)))
+                avatar = Image.composite(avatar, base, image_assets.assets.circular_mask(avatar.size))
+                avatar = resize_avatar(avatar, size)
+                avatar_cache.avatars.put(discord_id, avatar_hash, size, avatar)
                 return avatar
         except NotFound:
             logging.getLogger('respobot.discord').warning(
@@ -217,29 +224,39 @@ async def generate_avatar_image(guild, discord_id, size, is_smurf=False):
             )
 
     if is_smurf is True:
-        avatar = Image.open(env.BOT_DIRECTORY + env.MEDIA_SUBDIRECTORY + constants.SMURF_AVATAR_FILENAME)
+        avatar = image_assets.assets.masked_image(constants.SMURF_AVATAR_FILENAME)
     elif discord_id is not None and discord_id > 0:
-        avatar = Image.open(env.BOT_DIRECTORY + env.MEDIA_SUBDIRECTORY + constants.BASE_AVATAR_FILENAME)
+        avatar = image_assets.assets.masked_image(constants.BASE_AVATAR_FILENAME)
     else:
-        avatar = Image.open(env.BOT_DIRECTORY + env.MEDIA_SUBDIRECTORY + constants.RESPO_LOGO_FILENAME)
-    base = Image.new("RGBA", avatar.size, (0, 0, 0, 0))
-    mask = Image.new("L", avatar.size, 0)
-    draw_mask = ImageDraw.Draw(mask)
+        avatar = image_assets.assets.masked_image(constants.RESPO_LOGO_FILENAME)
+    avatar = resize_avatar(avatar, size)
+    avatar_memory_file.close()
+    return avatar
+
+
+def resize_avatar(avatar, size):
+    # Scale so that the circle cropped out of the avatar is size pixels across.
     min_dim = avatar.width
     if avatar.height < min_dim:
         min_dim = avatar.height
     min_dim -= 1
-    draw_mask.ellipse(
-        [
-            (avatar.width / 2 - min_dim / 2, avatar.height / 2 - min_dim / 2),
-            (avatar.width / 2 + min_dim / 2, avatar.height / 2 + min_dim / 2)
-        ],
-        fill=255
+    return avatar.resize((int(avatar.width / min_dim * size), int(avatar.height / min_dim * size)))
+
+
+async def generate_head2head_avatars(guild, racer1_info_dict, racer2_info_dict):
+    racer1_avatar = await generate_avatar_image(
+        guild,
+        racer1_info_dict['discord_id'],
+        HEAD2HEAD_AVATAR_SIZE,
+        racer1_info_dict['is_smurf'] == 1
     )
-    avatar = Image.composite(avatar, base, mask)
-    avatar = avatar.resize((int(avatar.width / min_dim * size), int(avatar.height / min_dim * size)))
-    avatar_memory_file.close()
-    return avatar
+    racer2_avatar = await generate_avatar_image(
+        guild,
+        racer2_info_dict['discord_id'],
+        HEAD2HEAD_AVATAR_SIZE,
+        racer2_info_dict['is_smurf'] == 1
+    )
+    return (racer1_avatar, racer2_avatar)
 
 
 async def generate_head2head_image(
@@ -250,34 +267,43 @@ async def generate_head2head_image(
     racer2_info_dict,
     racer2_stats_dict
 ):
+    (racer1_avatar, racer2_avatar) = await generate_head2head_avatars(guild, racer1_info_dict, racer2_info_dict)
+    return render_head2head_image(
+        title,
+        racer1_info_dict,
+        racer1_stats_dict,
+        racer2_info_dict,
+        racer2_stats_dict,
+        racer1_avatar,
+        racer2_avatar
+    )
+
 
-    image_width = 400
+def render_head2head_image(
+    title,
+    racer1_info_dict,
+    racer1_stats_dict,
+    racer2_info_dict,
+    racer2_stats_dict,
+    racer1_avatar,
+    racer2_avatar
+):
+
+    image_width = HEAD2HEAD_IMAGE_WIDTH
     image_height = 1200
-    avatar_size = image_width / 7
+    avatar_size = HEAD2HEAD_AVATAR_SIZE
     font_size = image_width * 18 / 400
     im = Image.new('RGBA', (image_width, image_height), color=(0, 0, 0, 0))
     bg = Image.new('RGBA', (image_width, image_height), color=(0, 0, 0, 255))
     draw = ImageDraw.Draw(im)
-    font = ImageFont.truetype(
-        env.BOT_DIRECTORY + env.MEDIA_SUBDIRECTORY + constants.IMAGE_FONT_FILENAME,
-        int(font_size)
-    )
-    fontBig = ImageFont.truetype(
-        env.BOT_DIRECTORY + env.MEDIA_SUBDIRECTORY + constants.IMAGE_FONT_FILENAME,
-        int(font_size * 2)
-    )
+    font = image_assets.assets.font(int(font_size))
+    fontBig = image_assets.assets.font(int(font_size * 2))
 
     margin_v_top = 0.05 * image_width
     margin_v_bottom = 0.1 * image_width
     margin_h_right = 0.15 * image_width
     margin_h_left = 0.15 * image_width
 
-    racer1_avatar = await generate_avatar_image(
-        guild,
-        racer1_info_dict['discord_id'],
-        avatar_size,
-        racer1_info_dict['is_smurf'] == 1
-    )
     if racer1_avatar is not None:
         x = int(image_width / 4 - racer1_avatar.width / 2)
         y = int(margin_v_top)
@@ -287,12 +313,6 @@ async def generate_head2head_image(
     draw.text((x, y), racer1_info_dict['name'], font=font, fill=(255, 255, 255, 255), anchor="mm")
     racer1_avatar.close()
 
-    racer2_avatar = await generate_avatar_image(
-        guild,
-        racer2_info_dict['discord_id'],
-        avatar_size,
-        racer2_info_dict['is_smurf'] == 1
-    )
     if racer2_avatar is not None:
         x = int(image_width * 3 / 4 - racer1_avatar.width / 2)
         y = int(margin_v_top)
@@ -595,7 +615,7 @@ def generate_champ_graph(data_dict, title, weeks_to_count, ongoing):
 
     data_dict = dict(sorted(data_dict.items(), key=lambda item: item[1]['total_points'], reverse=True))
 
-    font = ImageFont.truetype(env.BOT_DIRECTORY + env.MEDIA_SUBDIRECTORY + constants.IMAGE_FONT_FILENAME, 18)
+    font = image_assets.assets.font(18)
 
     margin_v_top = 3 * font.size
     margin_v_bottom = font.size
@@ -731,7 +751,7 @@ def generate_champ_graph_compact(data_dict, title, weeks_to_count, highlighted_w
 
     data_dict = dict(sorted(data_dict.items(), key=lambda item: item[1]['total_points'], reverse=True))
 
-    font = ImageFont.truetype(env.BOT_DIRECTORY + env.MEDIA_SUBDIRECTORY + constants.IMAGE_FONT_FILENAME, 18)
+    font = image_assets.assets.font(18)
 
     margin_v_top = 3 * font.size
     margin_v_bottom = font.size
@@ -975,14 +995,8 @@ def generate_ir_graph(member_dicts, title, print_legend, draw_license_split_line
     im = Image.new('RGBA', (image_width, image_height), color=(0, 0, 0, 0))
     bg = Image.new('RGBA', (image_width, image_height), color=(0, 0, 0, 255))
     draw = ImageDraw.Draw(im)
-    font = ImageFont.truetype(
-        env.BOT_DIRECTORY + env.MEDIA_SUBDIRECTORY + constants.IMAGE_FONT_FILENAME,
-        int(image_height * 16 / 300)
-    )
-    fontsm = ImageFont.truetype(
-        env.BOT_DIRECTORY + env.MEDIA_SUBDIRECTORY + constants.IMAGE_FONT_FILENAME,
-        int(image_height * 12 / 300)
-    )
+    font = image_assets.assets.font(int(image_height * 16 / 300))
+    fontsm = image_assets.assets.font(int(image_height * 12 / 300))
 
     margin_v_top = 0.15 * image_height
     margin_v_bottom = 0.1 * image_height
@@ -1006,7 +1020,7 @@ def generate_ir_graph(member_dicts, title, print_legend, draw_license_split_line
 
     for member_dict in member_dicts:
         for point in member_dict['ir_data']:
-            point = (point[0].timestamp() * 1000, point[1])  # Convert datetime to timestamp
+            point = (point[0] * 1000, point[1])  # Convert seconds to milliseconds
             if point[1] > max_ir:
                 max_ir = point[1]
             if point[0] < min_timestamp:
@@ -1150,7 +1164,7 @@ def generate_ir_graph(member_dicts, title, print_legend, draw_license_split_line
 
         prev_point = None
         for point in member_dict['ir_data']:
-            point_timestamp = point[0].timestamp() * 1000
+            point_timestamp = point[0] * 1000
             scaled_tuple_x = (
                 margin_h_left
                 + (point_timestamp - min_timestamp) / timestamp_range * timestamp_range_pixels
@@ -1192,7 +1206,7 @@ def generate_ir_graph(member_dicts, title, print_legend, draw_license_split_line
         if draw_ir_split:
             prev_point = None
             for point in member_dict['ir_data2']:
-                point_timestamp = point[0].timestamp() * 1000
+                point_timestamp = point[0] * 1000
                 scaled_tuple_x = (
                     margin_h_left
                     + (point_timestamp - min_timestamp) / timestamp_range * timestamp_range_pixels
@@ -1314,8 +1328,8 @@ def generate_cpi_graph(member_dict, title, print_legend):
     im = Image.new('RGBA', (image_width, image_height), color=(0, 0, 0, 0))
     bg = Image.new('RGBA', (image_width, image_height), color=(0, 0, 0, 255))
     draw = ImageDraw.Draw(im)
-    font = ImageFont.truetype(env.BOT_DIRECTORY + env.MEDIA_SUBDIRECTORY + constants.IMAGE_FONT_FILENAME, int(18))
-    fontsm = ImageFont.truetype(env.BOT_DIRECTORY + env.MEDIA_SUBDIRECTORY + constants.IMAGE_FONT_FILENAME, int(12))
+    font = image_assets.assets.font(18)
+    fontsm = image_assets.assets.font(12)
 
     margin_v_top = 0.2 * image_height
     margin_v_bottom = 0.2 * image_height
@@ -1368,14 +1382,14 @@ def generate_cpi_graph(member_dict, title, print_legend):
 
     prev_point = None
     for point in member_dict['cpi_data']:
+        point_date = datetime.fromtimestamp(point[0], tz=timezone.utc)
         if prev_point is not None:
-            if(point[0].year > prev_point[0].year):
+            prev_date = datetime.fromtimestamp(prev_point[0], tz=timezone.utc)
+            if(point_date.year > prev_date.year):
                 # The two cpi points span a year. Generate a year boundary data point
                 # interpolated between the two lap counts.
                 prev_total_corners = prev_point[1]
-                prev_date = prev_point[0]
                 total_corners = point[1]
-                point_date = point[0]
 
                 timespan = point_date - prev_date
                 cornerspan = total_corners - prev_total_corners
@@ -1388,7 +1402,7 @@ def generate_cpi_graph(member_dict, title, print_legend):
 
                 date_points.append((new_year, corners_at_new_year))
         prev_point = point
-        point = (point[0].timestamp() * 1000, point[1], point[2])  # Convert the datetime to a timestamp
+        point = (point[0] * 1000, point[1], point[2])  # Convert seconds to milliseconds
         if point[2] > max_cpi:
             max_cpi = point[2]
         if point[0] < min_timestamp:
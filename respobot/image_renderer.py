@@ -0,0 +1,133 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import constants
+
+
+def _render_png(generator, args: tuple, kwargs: dict):
+    # Runs in a worker process. Only the PNG bytes are sent back to the bot.
+    time_started = time.perf_counter()
+    image = generator(*args, **kwargs)
+    png_memory_file = io.BytesIO()
+    image.save(png_memory_file, format='png')
+    image.close()
+    return (png_memory_file.getvalue(), time.perf_counter() - time_started)
+
+
+def _warm_up():
+    return True
+
+
+class ImageRenderer:
+    """Runs the Pillow drawing in image_generators in a pool of worker processes so that drawing a
+    graph doesn't block the event loop (and with it the Discord heartbeat and every other command).
+
+    The generator and its arguments are pickled and sent to a worker, so they must be a module level
+    function and plain data (dicts, lists, numbers, strings, datetimes and PIL images). Anything that
+    needs Discord, like fetching avatars, has to be done before calling render().
+
+    On platforms that support it the workers are forked. start() launches them all at once, so call
+    it during startup before any other threads exist. The pool is never started again later, since
+    forking once the event loop, database and Discord threads are running can deadlock the children.
+    So if max_workers is 0, start() hasn't been called, or a worker has died, images are drawn in a
+    thread instead.
+
+    Usage:
+        png_bytes = await image_renderer.renderer.render(image_gen.generate_cpi_graph, member_dict, title, False)
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max(0, max_workers)
+        self.render_stats = {}
+        self._executor = None
+
+    def _create_executor(self):
+        if 'fork' in multiprocessing.get_all_start_methods():
+            mp_context = multiprocessing.get_context('fork')
+        else:
+            mp_context = None
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=mp_context)
+
+    def start(self):
+        """Launch the worker processes. Does nothing if they are already running or if max_workers is 0."""
+        if self.max_workers < 1 or self._executor is not None:
+            return
+
+        self._create_executor()
+        self._executor.submit(_warm_up).result()
+        logging.getLogger('respobot.bot').info(f"Started {self.max_workers} image rendering workers.")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def render(self, generator, *args, **kwargs):
+        """Draw an image with one of the generators in image_generators.
+
+        Arguments:
+            generator: A module level function that returns a PIL image.
+            *args, **kwargs: The arguments to call it with.
+
+        Returns:
+            The image encoded as PNG bytes.
+        """
+        loop = asyncio.get_running_loop()
+        time_started = time.perf_counter()
+
+        if self._executor is None:
+            (png_bytes, render_seconds) = await loop.run_in_executor(None, _render_png, generator, args, kwargs)
+        else:
+            try:
+                (png_bytes, render_seconds) = await loop.run_in_executor(
+                    self._executor, _render_png, generator, args, kwargs
+                )
+            except BrokenProcessPool:
+                # A worker died, which takes the whole pool with it.
+                logging.getLogger('respobot.bot').error(
+                    f"An image rendering worker died while drawing {generator.__name__}(). "
+                    "Images will be drawn in a thread until the bot restarts."
+                )
+                self.shutdown()
+                (png_bytes, render_seconds) = await loop.run_in_executor(None, _render_png, generator, args, kwargs)
+
+        self._record_render(generator.__name__, time.perf_counter() - time_started, render_seconds)
+        return png_bytes
+
+    def _record_render(self, generator_name: str, total_seconds: float, render_seconds: float):
+        stats = self.render_stats.setdefault(
+            generator_name,
+            {'renders': 0, 'total_seconds': 0.0, 'render_seconds': 0.0, 'max_seconds': 0.0}
+        )
+        stats['renders'] += 1
+        stats['total_seconds'] += total_seconds
+        stats['render_seconds'] += render_seconds
+        stats['max_seconds'] = max(stats['max_seconds'], total_seconds)
+
+        logging.getLogger('respobot.bot').debug(
+            f"Rendered {generator_name}() in {render_seconds * 1000:.0f} ms "
+            f"({total_seconds * 1000:.0f} ms including the trip to the worker)."
+        )
+
+    def __str__(self):
+        if self._executor is None:
+            report = "Image renderer: drawing in a thread."
+        else:
+            report = f"Image renderer: {self.max_workers} workers."
+        for generator_name in sorted(self.render_stats):
+            stats = self.render_stats[generator_name]
+            report += (
+                f"\n    {generator_name}: {stats['renders']} renders, "
+                f"{stats['render_seconds'] * 1000 / stats['renders']:.0f} ms mean drawing, "
+                f"{stats['total_seconds'] * 1000 / stats['renders']:.0f} ms mean total, "
+                f"{stats['max_seconds'] * 1000:.0f} ms max total"
+            )
+        return report
+
+
+# Shared by every command and task that draws an image.
+renderer = ImageRenderer(constants.IMAGE_RENDER_WORKERS)
@@ -1,4 +1,5 @@
 import io
+import asyncio
 import discord
 import constants
 import cache_races
@@ -7,10 +8,11 @@ import roles
 import stats_helpers as stats
 import image_generators as image_gen
 import helpers
+import rate_limiter
+import subsession_queue
 from bot_database import BotDatabase, BotDatabaseError
 from irslashdata.client import Client as IracingClient
 from irslashdata import constants as irConstants
-from irslashdata.exceptions import ForbiddenError
 import subsession_summary
 import logging
 import traceback
@@ -40,6 +42,7 @@ async def get_race_results(bot: discord.Bot, db: BotDatabase, ir: IracingClient)
         return
 
     logging.getLogger('respobot.bot').debug(f"get_race_results(): Iterating through members.")
+    member_dicts_to_search = []
     for member_dict in member_dicts:
         if 'iracing_custid' not in member_dict:
             logging.getLogger('respobot.bot').warning(
@@ -49,8 +52,6 @@ async def get_race_results(bot: discord.Bot, db: BotDatabase, ir: IracingClient)
 
         iracing_custid = member_dict['iracing_custid']
 
-        logging.getLogger('respobot.bot').debug(f"Searching for new subsessions for cust_id: {iracing_custid}")
-
         if 'latest_session_found' in member_dict and member_dict['latest_session_found'] is None:
             # This person needs to have their sessions cached.
             logging.getLogger('respobot.bot').info(
@@ -59,241 +60,61 @@ async def get_race_results(bot: discord.Bot, db: BotDatabase, ir: IracingClient)
             await cache_races.cache_races(bot, db, ir, [iracing_custid])
             continue
 
-        on_a_hiatus = False
-        # Grab all series races since their previous cached race
-        start_high = datetime.now(timezone.utc)
-        start_low = member_dict['latest_session_found']
-
-        if start_low is None:
-            continue
-        else:
-            start_low += timedelta(seconds=1)
-
-        if start_high - start_low > timedelta(days=90):
-            start_high = start_low + timedelta(days=90)
-            on_a_hiatus = True
-        start_low_str = start_low.isoformat().replace('+00:00', 'Z')
-        start_high_str = start_high.isoformat().replace('+00:00', 'Z')
-
-        subsessions_list = []
-
-        # finish_range_... are used to account for the following scenario:
-        # 1. User signs up for long race and crashes out early.
-        # 2. User then signs up for short race which ends before the previous long race
-        # 3. Bot scans for races and results for the later short race show up.
-        # 4. Latest session found is updated to the start time of this later shorter race.
-        # 5. The longer race ends but is never found because latest_session_found is later than this race.
-        # Scanning based on finish time eliminates this issue.
-        try:
-            logging.getLogger('respobot.bot').debug(f"Running ir.search_results() for cust_id {iracing_custid}")
-            series_subsessions_list = await ir.search_results(
-                cust_id=iracing_custid,
-                finish_range_begin=start_low_str,
-                finish_range_end=start_high_str
-            )
-            if series_subsessions_list is not None:
-                subsessions_list += series_subsessions_list
-        except ValueError:
-            logging.getLogger('respobot.bot').warning(
-                f"search_results() for cust_id {iracing_custid} failed due to insufficient information."
-            )
-        except Exception as e:
-            logging.getLogger('respobot.bot').warning(e)
-
-        try:
-            logging.getLogger('respobot.bot').debug(f"Running ir.search_hosted() for cust_id {iracing_custid}")
-            hosted_subsessions_list = await ir.search_hosted(
-                cust_id=iracing_custid,
-                finish_range_begin=start_low_str,
-                finish_range_end=start_high_str
-            )
-            if hosted_subsessions_list is not None:
-                subsessions_list += hosted_subsessions_list
-        except ValueError:
-            logging.getLogger('respobot.bot').warning(
-                f"search_hosted() for cust_id {iracing_custid} failed due to insufficient information."
-            )
-        except Exception as e:
-            logging.getLogger('respobot.bot').warning(e)
-
-        if subsessions_list is None:
-            logging.getLogger('respobot.bot').debug(f"No subsessions found for cust_id {iracing_custid}. Continuing.")
-            continue
+        member_dicts_to_search.append(member_dict)
+
+    # 1. Search for every member's new subsessions at the same time. rate_limiter.iracing keeps
+    # the number of requests in flight within what the iRacing servers will tolerate.
+    member_searches = await asyncio.gather(
+        *[search_member_subsessions(ir, member_dict) for member_dict in member_dicts_to_search]
+    )
+
+    # 2. Several members can show up in the same subsession. Only process each subsession once,
+    # keeping track of every member that found it in the order they were found.
+    subsession_summaries = {}
+    subsession_members = {}
+    for member_search in member_searches:
+        for subsession in member_search['subsessions']:
+            subsession_id = subsession['subsession_id']
+            if subsession_id not in subsession_summaries:
+                subsession_summaries[subsession_id] = subsession
+                subsession_members[subsession_id] = []
+            if member_search['member_dict'] not in subsession_members[subsession_id]:
+                subsession_members[subsession_id].append(member_search['member_dict'])
+
+    # 3. Fetch and store all the new subsessions at the same time. The fetch queue is shared with
+    # cache_races() so a subsession that is already being fetched there isn't fetched twice.
+    subsession_fetches = await asyncio.gather(
+        *[
+            subsession_queue.fetch_queue.fetch(bot, db, ir, subsession_id)
+            for subsession_id in subsession_summaries
+        ]
+    )
+
+    # 4. Report the new subsessions one at a time, in the order they were found.
+    # A member's latest_session_found only moves past subsessions that made it into the database. As before,
+    # the member that found a subsession which wasn't reported doesn't move past it either.
+    processed_subsession_ids = set()
+    unreported_subsessions = set()
+    for subsession_fetch in subsession_fetches:
+        subsession_id = subsession_fetch['subsession_id']
+        reporting_member_dict = subsession_members[subsession_id][0]
+        in_database, reported = await report_new_subsession(bot, db, subsession_fetch, reporting_member_dict)
+        if in_database:
+            processed_subsession_ids.add(subsession_id)
+        if in_database and not reported:
+            unreported_subsessions.add((subsession_id, reporting_member_dict['iracing_custid']))
+
+    # 5. Move each member's latest_session_found forward past the subsessions that were processed.
+    for member_search in member_searches:
+        member_dict = member_search['member_dict']
 
         latest_new_session = None
-        for subsession in subsessions_list:
-            logging.getLogger('respobot.bot').debug(f"Processing new subsession {subsession['subsession_id']}.")
-            try:
-                logging.getLogger('respobot.bot').debug(
-                    f"Checking if {subsession['subsession_id']} is already in the database."
-                )
-                race_found = await db.is_subsession_in_db(subsession['subsession_id'])
-                logging.getLogger('respobot.bot').debug(
-                    f"Checking if the laps for {subsession['subsession_id']} are already in the database."
-                )
-                laps_found = await db.is_subsession_in_laps_table(subsession['subsession_id'])
-            except BotDatabaseError as exc:
-                logging.getLogger('respobot.bot').warning(
-                    "During get_race_results() an exception was caught when "
-                    f"checking if subsession {subsession['subsession_id']} was in the database.: {exc}"
-                )
-                await helpers.send_bot_failure_dm(
-                    bot,
-                    "During get_race_results() an exception was caught when "
-                    f"checking if subsession {subsession['subsession_id']} was in the database.: {exc}"
-                )
+        for subsession in member_search['subsessions']:
+            if subsession['subsession_id'] not in processed_subsession_ids:
+                continue
+            if (subsession['subsession_id'], member_dict['iracing_custid']) in unreported_subsessions:
                 continue
-
             new_session_end_time = datetime.fromisoformat(subsession['end_time'])
-
-            if race_found is False:
-                logging.getLogger('respobot.bot').info(f"Adding new subsession: {subsession['subsession_id']}")
-                try:
-                    logging.getLogger('respobot.bot').debug(
-                        f"Running ir.subsession_data() for subsession {subsession['subsession_id']}"
-                    )
-                    new_subsession = await ir.subsession_data(subsession['subsession_id'])
-                except ForbiddenError as exc:
-                    logging.getLogger('respobot.bot').warning(
-                        f"Access denied when fetching data for subsession {subsession['subsession_id']}: {exc}"
-                    )
-                    continue
-                except Exception as exc:
-                    logging.getLogger('respobot.bot').warning(
-                        "During get_race_results() an exception was caught when fetching data "
-                        f"for subsession {subsession['subsession_id']}: {exc}"
-                    )
-                    await helpers.send_bot_failure_dm(
-                        bot,
-                        "During get_race_results() an exception was caught when fetching data "
-                        f"for subsession {subsession['subsession_id']}: {exc}"
-                    )
-                    continue
-
-                try:
-                    logging.getLogger('respobot.bot').debug(
-                        f"Running db.add_subsessions() for subsession {subsession['subsession_id']}"
-                    )
-                    await db.add_subsessions([new_subsession])
-                except BotDatabaseError as exc:
-                    logging.getLogger('respobot.bot').warning(
-                        "During get_race_results() an exception was caught when adding "
-                        f"subsession {subsession['subsession_id']} to the database: {exc}"
-                    )
-                    await helpers.send_bot_failure_dm(
-                        bot,
-                        "During get_race_results() an exception was caught when adding "
-                        f"subsession {subsession['subsession_id']} to the database: {exc}"
-                    )
-                    continue
-
-                # And now for the laps
-                if (
-                    laps_found is False
-                    and 'session_results' in new_subsession
-                    and len(new_subsession['session_results']) > 0
-                ):
-
-                    for session_result_dict in new_subsession['session_results']:
-                        if 'simsession_number' not in session_result_dict or 'results' not in session_result_dict:
-                            continue
-
-                        try:
-                            logging.getLogger('respobot.bot').debug(
-                                f"Running ir.lap_data() for simsession {session_result_dict['simsession_number']} "
-                                f"of subsession {subsession['subsession_id']}"
-                            )
-                            lap_dicts = await ir.lap_data(
-                                new_subsession['subsession_id'],
-                                session_result_dict['simsession_number']
-                            )
-                        except Exception as exc:
-                            logging.getLogger('respobot.bot').warning(
-                                "During get_race_results() an exception was caught when fetching lap data "
-                                f"for subsession {subsession['subsession_id']}: {exc}"
-                            )
-                            await helpers.send_bot_failure_dm(
-                                bot,
-                                "During get_race_results() an exception was caught when fetching lap data "
-                                f"for subsession {subsession['subsession_id']}: {exc}"
-                            )
-                            continue
-
-                        if lap_dicts is None or len(lap_dicts) < 1:
-                            continue
-
-                        try:
-                            logging.getLogger('respobot.bot').debug(
-                                f"Running db.add_laps() for simsession {session_result_dict['simsession_number']} "
-                                f"of subsession {subsession['subsession_id']}"
-                            )
-                            await db.add_laps(
-                                lap_dicts, new_subsession['subsession_id'],
-                                session_result_dict['simsession_number']
-                            )
-                        except BotDatabaseError as exc:
-                            logging.getLogger('respobot.bot').warning(
-                                f"During cache_races() an exception was encountered when adding "
-                                f"laps to the database: {exc}"
-                            )
-                            await helpers.send_bot_failure_dm(
-                                bot,
-                                f"During cache_races() an exception was encountered when adding "
-                                f"laps to the database: {exc}"
-                            )
-
-                logging.getLogger('respobot.bot').info(f"Successfully added subsession: {subsession['subsession_id']}")
-
-                if (
-                    'host_id' in new_subsession
-                    and 'league_id' in new_subsession
-                    and (new_subsession['league_id'] is None or new_subsession['league_id'] < 1)
-                ):
-                    # This is just some random hosted session. Don't report it.
-                    logging.getLogger('respobot.bot').info(
-                        f"Subsession {subsession['subsession_id']} some random hosted session. Skipping race report."
-                    )
-                    continue
-                elif 'event_type' in new_subsession and new_subsession['event_type'] != 5:
-                    # This is a non-hosted practice, qualifying, or time-trial. Don't report it.
-                    logging.getLogger('respobot.bot').info(
-                        f"Subsession {subsession['subsession_id']} is a non-hosted practice, qualifying, or "
-                        f"time-trial. Skipping race report."
-                    )
-                    continue
-
-                latest_race_report = await db.get_member_latest_race_report(member_dict['iracing_custid'])
-                post_to_main = True
-                if 'is_smurf' in member_dict and member_dict['is_smurf'] == 1:
-                    post_to_main = False
-                elif (
-                    latest_race_report is not None
-                    and (
-                        datetime.now(timezone.utc) - latest_race_report
-                    ) < timedelta(hours=constants.RACE_REPORT_COOLDOWN_HOURS)
-                ):
-                    post_to_main = False
-
-                logging.getLogger('respobot.bot').info(
-                    f"Running generate_race_report() for {subsession['subsession_id']}."
-                )
-                await generate_race_report(
-                    bot,
-                    db,
-                    new_subsession['subsession_id'],
-                    embed_type='auto',
-                    post_to_main=post_to_main
-                )
-
-                if post_to_main:
-                    post_time = datetime.now(timezone.utc)
-                    logging.getLogger('respobot.bot').debug(
-                        f"Running db.set_member_last_race_report() with {post_time} for member "
-                        f"{member_dict['iracing_custid']}."
-                    )
-                    await db.set_member_latest_race_report(member_dict['iracing_custid'], post_time)
-
-            # Update latest_new_session
             if latest_new_session is None or latest_new_session < new_session_end_time:
                 latest_new_session = new_session_end_time
 
@@ -309,12 +130,15 @@ async def get_race_results(bot: discord.Bot, db: BotDatabase, ir: IracingClient)
                 )
                 await db.set_member_latest_session_found(member_dict['iracing_custid'], latest_new_session)
 
-            if on_a_hiatus is True:
+            if member_search['on_a_hiatus'] is True:
                 logging.getLogger('respobot.bot').debug(
                     f"Member on a hiatus. Running db.set_member_latest_session_found() with "
-                    f"{start_high - timedelta(days=2)} for member {member_dict['iracing_custid']}."
+                    f"{member_search['start_high'] - timedelta(days=2)} for member {member_dict['iracing_custid']}."
+                )
+                await db.set_member_latest_session_found(
+                    member_dict['iracing_custid'],
+                    member_search['start_high'] - timedelta(days=2)
                 )
-                await db.set_member_latest_session_found(member_dict['iracing_custid'], start_high - timedelta(days=2))
         except BotDatabaseError as exc:
             logging.getLogger('respobot.bot').warning(
                 "During get_race_results() an exception was caught when updating "
@@ -328,6 +152,169 @@ async def get_race_results(bot: discord.Bot, db: BotDatabase, ir: IracingClient)
     logging.getLogger('respobot.bot').debug(f"get_race_results(): Done.")
 
 
+async def search_member_subsessions(ir: IracingClient, member_dict: dict):
+    """Search the iRacing servers for every series and hosted subsession that finished since
+    the member's latest_session_found.
+
+    Returns:
+        A dict of the form:
+        {
+            'member_dict': dict,
+            'subsessions': list,
+            'start_high': datetime,
+            'on_a_hiatus': bool
+        }
+    """
+    iracing_custid = member_dict['iracing_custid']
+
+    logging.getLogger('respobot.bot').debug(f"Searching for new subsessions for cust_id: {iracing_custid}")
+
+    on_a_hiatus = False
+    # Grab all series races since their previous cached race
+    start_high = datetime.now(timezone.utc)
+    start_low = member_dict['latest_session_found'] + timedelta(seconds=1)
+
+    if start_high - start_low > timedelta(days=90):
+        start_high = start_low + timedelta(days=90)
+        on_a_hiatus = True
+    start_low_str = start_low.isoformat().replace('+00:00', 'Z')
+    start_high_str = start_high.isoformat().replace('+00:00', 'Z')
+
+    subsessions_list = []
+
+    # finish_range_... are used to account for the following scenario:
+    # 1. User signs up for long race and crashes out early.
+    # 2. User then signs up for short race which ends before the previous long race
+    # 3. Bot scans for races and results for the later short race show up.
+    # 4. Latest session found is updated to the start time of this later shorter race.
+    # 5. The longer race ends but is never found because latest_session_found is later than this race.
+    # Scanning based on finish time eliminates this issue.
+    try:
+        logging.getLogger('respobot.bot').debug(f"Running ir.search_results() for cust_id {iracing_custid}")
+        async with rate_limiter.iracing:
+            series_subsessions_list = await ir.search_results(
+                cust_id=iracing_custid,
+                finish_range_begin=start_low_str,
+                finish_range_end=start_high_str
+            )
+        if series_subsessions_list is not None:
+            subsessions_list += series_subsessions_list
+    except ValueError:
+        logging.getLogger('respobot.bot').warning(
+            f"search_results() for cust_id {iracing_custid} failed due to insufficient information."
+        )
+    except Exception as e:
+        logging.getLogger('respobot.bot').warning(e)
+
+    try:
+        logging.getLogger('respobot.bot').debug(f"Running ir.search_hosted() for cust_id {iracing_custid}")
+        async with rate_limiter.iracing:
+            hosted_subsessions_list = await ir.search_hosted(
+                cust_id=iracing_custid,
+                finish_range_begin=start_low_str,
+                finish_range_end=start_high_str
+            )
+        if hosted_subsessions_list is not None:
+            subsessions_list += hosted_subsessions_list
+    except ValueError:
+        logging.getLogger('respobot.bot').warning(
+            f"search_hosted() for cust_id {iracing_custid} failed due to insufficient information."
+        )
+    except Exception as e:
+        logging.getLogger('respobot.bot').warning(e)
+
+    if len(subsessions_list) < 1:
+        logging.getLogger('respobot.bot').debug(f"No subsessions found for cust_id {iracing_custid}.")
+
+    return {
+        'member_dict': member_dict,
+        'subsessions': subsessions_list,
+        'start_high': start_high,
+        'on_a_hiatus': on_a_hiatus
+    }
+
+
+async def report_new_subsession(
+    bot: discord.Bot,
+    db: BotDatabase,
+    subsession_fetch: dict,
+    member_dict: dict
+):
+    """Post the race report for a subsession stored by subsession_queue.fetch_queue.
+
+    Arguments:
+        subsession_fetch (dict): The dict returned by SubsessionFetchQueue.fetch().
+        member_dict (dict): The member who found the subsession. Their smurf status and race report
+                            cooldown decide which channel the report goes to.
+
+    Returns:
+        A tuple of two bools (in_database, reported). in_database is False if the subsession could
+        not be added and should be tried again on the next pass. reported is False if the subsession
+        was added but no race report was generated for it.
+    """
+    subsession_id = subsession_fetch['subsession_id']
+    new_subsession = subsession_fetch['new_subsession']
+
+    if subsession_fetch['failed'] is True:
+        return False, False
+
+    if subsession_fetch['race_found'] is True:
+        return True, True
+
+    logging.getLogger('respobot.bot').info(f"Successfully added subsession: {subsession_id}")
+
+    if (
+        'host_id' in new_subsession
+        and 'league_id' in new_subsession
+        and (new_subsession['league_id'] is None or new_subsession['league_id'] < 1)
+    ):
+        # This is just some random hosted session. Don't report it.
+        logging.getLogger('respobot.bot').info(
+            f"Subsession {subsession_id} some random hosted session. Skipping race report."
+        )
+        return True, False
+    elif 'event_type' in new_subsession and new_subsession['event_type'] != 5:
+        # This is a non-hosted practice, qualifying, or time-trial. Don't report it.
+        logging.getLogger('respobot.bot').info(
+            f"Subsession {subsession_id} is a non-hosted practice, qualifying, or "
+            f"time-trial. Skipping race report."
+        )
+        return True, False
+
+    latest_race_report = await db.get_member_latest_race_report(member_dict['iracing_custid'])
+    post_to_main = True
+    if 'is_smurf' in member_dict and member_dict['is_smurf'] == 1:
+        post_to_main = False
+    elif (
+        latest_race_report is not None
+        and (
+            datetime.now(timezone.utc) - latest_race_report
+        ) < timedelta(hours=constants.RACE_REPORT_COOLDOWN_HOURS)
+    ):
+        post_to_main = False
+
+    logging.getLogger('respobot.bot').info(
+        f"Running generate_race_report() for {subsession_id}."
+    )
+    await generate_race_report(
+        bot,
+        db,
+        new_subsession['subsession_id'],
+        embed_type='auto',
+        post_to_main=post_to_main
+    )
+
+    if post_to_main:
+        post_time = datetime.now(timezone.utc)
+        logging.getLogger('respobot.bot').debug(
+            f"Running db.set_member_last_race_report() with {post_time} for member "
+            f"{member_dict['iracing_custid']}."
+        )
+        await db.set_member_latest_race_report(member_dict['iracing_custid'], post_time)
+
+    return True, True
+
+
 async def generate_race_report(
     bot: discord.Bot,
     db: BotDatabase,
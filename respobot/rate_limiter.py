@@ -0,0 +1,41 @@
+import asyncio
+import time
+import constants
+
+
+class RateLimiter:
+    """Async context manager that caps how many requests can be in flight at once and
+    spaces out the start of each request by at least min_interval seconds.
+
+    Usage:
+        async with rate_limiter.iracing:
+            result = await ir.subsession_data(subsession_id)
+    """
+
+    def __init__(self, max_concurrent: int, min_interval: float = 0.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.min_interval = min_interval
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._interval_lock = asyncio.Lock()
+        self._last_start = 0.0
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        try:
+            async with self._interval_lock:
+                wait = self._last_start + self.min_interval - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._last_start = time.monotonic()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        self._semaphore.release()
+
+
+# Shared by everything that talks to the iRacing /data API so that the fast loop polling and any
+# cache_races() backfill running at the same time stay under one combined limit.
+iracing = RateLimiter(constants.IRACING_MAX_CONCURRENT_REQUESTS, constants.IRACING_MIN_REQUEST_INTERVAL)
@@ -3,6 +3,7 @@
 
 import os
 import signal
+import asyncio
 import discord
 import discord.commands
 from discord.ext import tasks
@@ -25,6 +26,8 @@ import stats_helpers as stats
 from slash_command_helpers import SlashCommandHelpers
 import helpers
 import image_generators as image_gen
+import image_assets
+import image_renderer
 from bot_database import BotDatabase, BotDatabaseError
 from bot_state import BotState
 
@@ -57,7 +60,14 @@ bot = discord.Bot(intents=intents)
 
 ir = IracingClient(env.IRACING_USERNAME, env.IRACING_PASSWORD)
 
-db = BotDatabase(env.BOT_DIRECTORY + env.DATA_SUBDIRECTORY + env.DATABASE_FILENAME, max_retries=5)
+db = BotDatabase(
+    env.BOT_DIRECTORY + env.DATA_SUBDIRECTORY + env.DATABASE_FILENAME,
+    max_retries=5,
+    num_readers=constants.DATABASE_READER_CONNECTIONS,
+    slow_query_threshold=constants.DATABASE_SLOW_QUERY_THRESHOLD,
+    lap_storage=constants.DATABASE_LAP_STORAGE,
+    archive_directory=env.BOT_DIRECTORY + env.DATA_SUBDIRECTORY + constants.DATABASE_ARCHIVE_SUBDIRECTORY
+)
 # slash_helpers.init(db)
 
 bot_state = BotState(env.BOT_DIRECTORY + env.DATA_SUBDIRECTORY + env.BOT_STATE_FILENAME)
@@ -88,8 +98,9 @@ async def on_ready():
     print("I'm alive!")
 
     try:
+        await db.open_connections()
         await db.init_tables()
-    except BotDatabaseError as exc:
+    except Exception as exc:
         logging.getLogger('respobot.bot').error(
             f"The following exception was raised when initializing the database: {exc}"
         )
@@ -97,6 +108,8 @@ async def on_ready():
             bot,
             f"The following exception was raised when initializing the database: {exc}"
         )
+        # The pooled connections run in their own threads, so close them or the process never exits.
+        await shutdown()
         return
 
     await helpers.change_bot_presence(bot)
@@ -230,9 +243,45 @@ async def slow_task_loop():
             bot,
             f"The following exception occured when updating season data in slow_task_loop(): {exc}"
         )
+
+    await run_database_maintenance()
     logging.getLogger('respobot.bot').debug(f"Done running slow_task_loop().")
 
 
+async def run_database_maintenance():
+    """Refresh the database statistics and take a backup if it hasn't been done in the last
+    DATABASE_MAINTENANCE_INTERVAL seconds. The time of the last run is kept in bot_state so
+    restarting the bot doesn't trigger an extra backup.
+    """
+    now = datetime.now(timezone.utc)
+    last_maintenance = bot_state.data['last_database_maintenance']
+
+    if (
+        last_maintenance is not None
+        and (now - datetime.fromisoformat(last_maintenance)).total_seconds() < constants.DATABASE_MAINTENANCE_INTERVAL
+    ):
+        return
+
+    logging.getLogger('respobot.bot').debug(f"slow_task_loop(): Running database maintenance.")
+    try:
+        await db.run_maintenance(
+            backup_directory=env.BOT_DIRECTORY + env.DATA_SUBDIRECTORY + constants.DATABASE_BACKUP_SUBDIRECTORY,
+            backups_to_keep=constants.DATABASE_BACKUPS_TO_KEEP
+        )
+    except BotDatabaseError as exc:
+        logging.getLogger('respobot.database').warning(
+            f"The following exception occured during database maintenance in slow_task_loop(): {exc}"
+        )
+        await helpers.send_bot_failure_dm(
+            bot,
+            f"The following exception occured during database maintenance in slow_task_loop(): {exc}"
+        )
+
+    # Don't retry a failed run every loop. It will be tried again after the next interval.
+    bot_state.data['last_database_maintenance'] = now.isoformat()
+    bot_state.dump_state()
+
+
 @tasks.loop(seconds=constants.FAST_LOOP_INTERVAL, reconnect=True)
 async def fast_task_loop():
     logging.getLogger('respobot.bot').debug(f"Running fast_task_loop().")
@@ -372,23 +421,23 @@ async def fast_task_loop():
                     title_text += " for " + str(current_year) + "s" + str(current_quarter)
 
                     if current_season_active == 1:
-                        graph = image_gen.generate_champ_graph_compact(
+                        png_bytes = await image_renderer.renderer.render(
+                            image_gen.generate_champ_graph_compact,
                             week_data,
                             title_text,
                             constants.RESPO_WEEKS_TO_COUNT,
                             current_race_week
                         )
                     else:
-                        graph = image_gen.generate_champ_graph(
+                        png_bytes = await image_renderer.renderer.render(
+                            image_gen.generate_champ_graph,
                             week_data,
                             title_text,
                             constants.RESPO_WEEKS_TO_COUNT,
                             False
                         )
 
-                    graph_memory_file = io.BytesIO()
-                    graph.save(graph_memory_file, format='png')
-                    graph_memory_file.seek(0)
+                    graph_memory_file = io.BytesIO(png_bytes)
 
                     picture = discord.File(
                         graph_memory_file,
@@ -513,6 +562,15 @@ async def fast_task_loop():
     logging.getLogger('respobot.bot').debug(f"Done running fast_task_loop().")
 
 
+async def shutdown():
+    image_renderer.renderer.shutdown()
+    try:
+        await db.close_connections()
+        logging.getLogger('respobot.bot').info('Database connections closed. Exiting...')
+    finally:
+        await bot.close()
+
+
 def exit_handler(signum, frame):
     if bot_state.write_lock:
         logging.getLogger('respobot.bot').info('Exit delayed: Writing json files.')
@@ -521,10 +579,25 @@ def exit_handler(signum, frame):
     while bot_state.write_lock:
         pass
 
-    logging.getLogger('respobot.bot').info('Done writing json files. Exiting...')
-    print("\nDone writing json files. Exiting...")
-    exit(0)
-
+    if not bot.loop.is_running():
+        logging.getLogger('respobot.bot').info('Done writing json files. Exiting...')
+        print("\nDone writing json files. Exiting...")
+        exit(0)
+
+    # The database connections live on the event loop, so hand the rest of the shutdown to it.
+    logging.getLogger('respobot.bot').info('Done writing json files. Closing database connections...')
+    print("\nDone writing json files. Closing database connections...")
+    bot.loop.call_soon_threadsafe(asyncio.ensure_future, shutdown())
+
+
+# Load the fonts and images and then fork the image rendering workers so that they all share them. This has to
+# happen before the event loop and the database start their threads, and before the signal handlers below are
+# installed so that the workers keep the default handlers instead of inheriting exit_handler().
+try:
+    image_assets.assets.load()
+except OSError as exc:
+    logging.getLogger('respobot.bot').warning(f"Could not preload the image assets: {exc}")
+image_renderer.renderer.start()
 
 signal.signal(signal.SIGINT, exit_handler)
 signal.signal(signal.SIGTERM, exit_handler)
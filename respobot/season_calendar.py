@@ -0,0 +1,139 @@
+import bisect
+import logging
+from datetime import datetime
+from bot_database import BotDatabase
+
+
+SECONDS_PER_WEEK = 604800
+
+
+def _to_epoch(time_point):
+    """Accept either a datetime or seconds since the epoch and return seconds since the epoch."""
+    if isinstance(time_point, datetime):
+        return time_point.timestamp()
+    return time_point
+
+
+class SeasonCalendar:
+    """A sorted, in-memory copy of the 'season_dates' table.
+
+    Looking up the season and race week of a timestamp is a binary search over the season start
+    times instead of a query plus a scan of every season. The calendar is loaded the first time
+    it is used and reloaded by refresh() whenever the season dates are updated. Timestamps can be
+    given as datetimes or as seconds since the epoch, like subsessions.start_epoch.
+
+    Usage:
+        (season_year, season_quarter, race_week) = await season_calendar.calendar.get_race_week(db, time_start)
+    """
+
+    def __init__(self):
+        self._season_starts = []
+        self._seasons = []
+        self._loaded = False
+
+    @property
+    def is_loaded(self):
+        return self._loaded
+
+    async def refresh(self, db: BotDatabase):
+        """Reload the calendar from the 'season_dates' table.
+
+        Arguments:
+            db (BotDatabase): The database to load the season dates from.
+
+        Returns:
+            None
+
+        Raises:
+            BotDatabaseError: Raised if the season dates can't be fetched.
+        """
+        season_date_tuples = await db.get_season_dates()
+
+        seasons = []
+        if season_date_tuples is not None:
+            for (season_year, season_quarter, str_start_time, str_end_time) in season_date_tuples:
+                seasons.append(
+                    (
+                        datetime.fromisoformat(str_start_time).timestamp(),
+                        datetime.fromisoformat(str_end_time).timestamp(),
+                        season_year,
+                        season_quarter
+                    )
+                )
+        seasons.sort(key=lambda season: season[0])
+
+        self._seasons = seasons
+        self._season_starts = [season[0] for season in seasons]
+        self._loaded = True
+
+        logging.getLogger('respobot.bot').debug(f"Loaded {len(seasons)} seasons into the season calendar.")
+
+    def clear(self):
+        """Forget the loaded seasons so they are reloaded on next use."""
+        self._season_starts = []
+        self._seasons = []
+        self._loaded = False
+
+    async def _get_season(self, db: BotDatabase, time_start: float):
+        """Find the latest season that started at or before time_start.
+
+        Returns:
+            A tuple of (start_epoch, end_epoch, season_year, season_quarter), or None if there
+            isn't one. Also returns None if the calendar is empty.
+        """
+        if not self._loaded:
+            await self.refresh(db)
+
+        index = bisect.bisect_right(self._season_starts, time_start) - 1
+        if index < 0:
+            return None
+        return self._seasons[index]
+
+    async def get_race_week(self, db: BotDatabase, time_start: datetime):
+        """Get the season and race week that a timestamp falls in, counting weeks from
+        the start of the season in the 'season_dates' table.
+
+        Arguments:
+            db (BotDatabase): Used to load the calendar if it hasn't been loaded yet.
+            time_start (datetime or int): The timestamp to look up.
+
+        Returns:
+            A tuple of (season_year, season_quarter, race_week), or (None, None, None) if the
+            timestamp isn't during any season. Returns None if there are no season dates at all.
+        """
+        time_start = _to_epoch(time_start)
+        season = await self._get_season(db, time_start)
+
+        if len(self._seasons) < 1:
+            return None
+
+        if season is None:
+            return (None, None, None)
+
+        (season_start, season_end, season_year, season_quarter) = season
+        if time_start >= season_end:
+            return (None, None, None)
+
+        race_week = int((time_start - season_start) / SECONDS_PER_WEEK)
+        return (season_year, season_quarter, race_week)
+
+    async def get_number_of_race_weeks(self, db: BotDatabase, time_start: datetime):
+        """Get the number of race weeks in the latest season that started at or before a timestamp.
+
+        Arguments:
+            db (BotDatabase): Used to load the calendar if it hasn't been loaded yet.
+            time_start (datetime or int): The timestamp to look up.
+
+        Returns:
+            An int, or None if no season started at or before the timestamp.
+        """
+        season = await self._get_season(db, _to_epoch(time_start))
+
+        if season is None:
+            return None
+
+        (season_start, season_end, _, _) = season
+        return int((season_end - season_start) / SECONDS_PER_WEEK)
+
+
+calendar = SeasonCalendar()
@@ -1,7 +1,9 @@
+import bisect
 import math
 from datetime import datetime
 from bot_database import BotDatabase
 import constants
+import season_calendar
 from irslashdata import constants as irConstants
 
 
@@ -35,7 +37,7 @@ async def populate_head2head_stats(
         'laps_per_inc': -1
     }
 
-    race_dicts = await db.get_member_race_results(
+    race_stats = await db.get_member_head2head_stats(
         iracing_custid,
         series_id=series,
         car_class_id=car_class,
@@ -46,47 +48,30 @@ async def populate_head2head_stats(
         simsession_type=irConstants.SimSessionType.race.value
     )
 
-    for race_dict in race_dicts:
-        stats_dict['total_races'] += 1
-        stats_dict['total_champ_points'] += race_dict['champ_points']
-
-        if race_dict['champ_points'] > stats_dict['highest_champ_points']:
-            stats_dict['highest_champ_points'] = race_dict['champ_points']
-
-        if race_dict['finish_position_in_class'] == 0:
-            stats_dict['wins'] += 1
-        if 0 <= race_dict['finish_position_in_class'] <= 2:
-            stats_dict['podiums'] += 1
-
-        if race_dict['starting_position_in_class'] == 0:
-            stats_dict['total_poles'] += 1
-
-        stats_dict['total_incidents'] += race_dict['incidents']
-        stats_dict['total_laps'] += race_dict['laps_complete']
-        stats_dict['total_laps_led'] += race_dict['laps_led']
-
-        irating_change = race_dict['newi_rating'] - race_dict['oldi_rating']
-        stats_dict['total_ir_change'] += irating_change
-
-        if irating_change > stats_dict['highest_ir_gain']:
-            stats_dict['highest_ir_gain'] = irating_change
-
-        if irating_change < stats_dict['highest_ir_loss']:
-            stats_dict['highest_ir_loss'] = irating_change
-
-        cars_in_class = await db.get_cars_in_class(race_dict['subsession_id'], race_dict['car_class_id'])
-
-        if race_dict['finish_position_in_class'] <= int(math.ceil(cars_in_class / 2)):
-            stats_dict['top_half'] += 1
-
-        if race_dict['newi_rating'] > stats_dict['highest_ir'] or stats_dict['highest_ir'] < 0:
-            stats_dict['highest_ir'] = race_dict['newi_rating']
-
-        if (
-            race_dict['newi_rating'] < stats_dict['lowest_ir']
-            and race_dict['newi_rating'] > 0 or stats_dict['lowest_ir'] < 0
-        ):
-            stats_dict['lowest_ir'] = race_dict['newi_rating']
+    for key in [
+        'total_races',
+        'wins',
+        'podiums',
+        'total_champ_points',
+        'total_incidents',
+        'total_laps',
+        'total_poles',
+        'total_laps_led',
+        'top_half',
+        'total_ir_change'
+    ]:
+        stats_dict[key] = race_stats[key]
+
+    if stats_dict['total_races'] > 0:
+        # The records start at 0 (or -1 for iRating) and only move if a race beats them.
+        stats_dict['highest_champ_points'] = max(stats_dict['highest_champ_points'], race_stats['highest_champ_points'])
+        stats_dict['highest_ir_gain'] = max(stats_dict['highest_ir_gain'], race_stats['highest_ir_gain'])
+        stats_dict['highest_ir_loss'] = min(stats_dict['highest_ir_loss'], race_stats['highest_ir_loss'])
+        stats_dict['highest_ir'] = race_stats['highest_ir']
+        if race_stats['lowest_positive_ir'] is not None:
+            stats_dict['lowest_ir'] = race_stats['lowest_positive_ir']
+        else:
+            stats_dict['lowest_ir'] = race_stats['lowest_ir']
 
     if stats_dict['total_champ_points'] > 0:
         stats_dict['avg_champ_points'] = stats_dict['total_champ_points'] / stats_dict['total_races']
@@ -100,43 +85,46 @@ async def populate_head2head_stats(
     return stats_dict
 
 
-async def calculate_compass_point(
+async def calculate_compass_points(
     db: BotDatabase,
-    iracing_custid,
+    iracing_custids: list,
     year=None,
     quarter=None,
-    category=None,
-    series=None,
-    car_class=None
+    category=None
 ):
-
-    stats_dict = {
-        'avg_champ_points': -1,
-        'laps_per_inc': -1
-    }
-
-    race_dicts = await db.get_member_race_results(
-        iracing_custid,
-        series_id=series,
-        car_class_id=car_class,
+    race_totals = await db.get_race_totals_by_member(
+        iracing_custids=iracing_custids,
         season_year=year,
         season_quarter=quarter,
-        license_category_id=category,
-        official_session=1,
-        simsession_type=irConstants.SimSessionType.race.value
+        license_category_id=category
     )
 
-    total_champ_points = 0
-    total_laps = 0
-    total_incidents = 0
+    compass_points = {}
+
+    for iracing_custid in iracing_custids:
+        member_totals = race_totals.get(iracing_custid)
+        if member_totals is None:
+            compass_points[iracing_custid] = _compass_point_from_totals(0, 0, 0, 0)
+        else:
+            compass_points[iracing_custid] = _compass_point_from_totals(
+                member_totals['races'],
+                member_totals['champ_points'],
+                member_totals['laps_complete'],
+                member_totals['incidents']
+            )
+
+    return compass_points
+
 
-    for race_dict in race_dicts:
-        total_champ_points += race_dict['champ_points']
-        total_incidents += race_dict['incidents']
-        total_laps += race_dict['laps_complete']
+def _compass_point_from_totals(total_races, total_champ_points, total_laps, total_incidents):
 
-    if len(race_dicts) > 0:
-        stats_dict['avg_champ_points'] = total_champ_points / len(race_dicts)
+    stats_dict = {
+        'avg_champ_points': -1,
+        'laps_per_inc': -1
+    }
+
+    if total_races > 0:
+        stats_dict['avg_champ_points'] = total_champ_points / total_races
     else:
         stats_dict['avg_champ_points'] = 0
 
@@ -150,109 +138,86 @@ async def calculate_compass_point(
     return stats_dict
 
 
-async def generate_cpi_graph_data(db: BotDatabase, iracing_custid, series_id: int = None):
-    cpi_tuples = await db.get_race_incidents_and_corners(iracing_custid, series_id=series_id)
+def calculate_cpi_series(cpi_tuples: list):
+    """Calculate a member's corners per incident after every race, averaged over their previous
+    CPI_CORNERS_INCLUDED corners. When the window starts part way through a race, only that fraction
+    of the race's incidents is counted.
+
+    Running totals of corners and incidents let each window be found with a binary search instead
+    of walking back over every race it covers.
+
+    Arguments:
+        cpi_tuples (list): A list of (end_epoch, incidents, corners) tuples, oldest race first,
+                           as returned by get_race_incidents_and_corners().
+
+    Returns:
+        A list of (end_epoch, total_corners, cpi) tuples, one per race.
+    """
+    corners_included = constants.CPI_CORNERS_INCLUDED
     cpi_graph_data = []
-    total_corners = 0
 
-    if cpi_tuples is None or len(cpi_tuples) < 1:
-        return []
+    # cumulative_corners[i] and cumulative_incidents[i] are the totals of the first i races.
+    cumulative_corners = [0]
+    cumulative_incidents = [0]
+    for (_, incidents, corners) in cpi_tuples:
+        cumulative_corners.append(cumulative_corners[-1] + corners)
+        cumulative_incidents.append(cumulative_incidents[-1] + incidents)
 
     for i in range(len(cpi_tuples)):
-        total_corners += cpi_tuples[i][2]
-        previous_races_needed = 1
-        corners_counted = cpi_tuples[i][2]
-        total_incidents = cpi_tuples[i][1]
-
-        # The current race has enough corners all on its own. Scale CPI based on this race.
-        if corners_counted > constants.CPI_CORNERS_INCLUDED:
-            total_incidents = total_incidents * constants.CPI_CORNERS_INCLUDED / corners_counted
-            corners_counted = constants.CPI_CORNERS_INCLUDED
-
-        while corners_counted < constants.CPI_CORNERS_INCLUDED and i - previous_races_needed >= 0:
-            if corners_counted + cpi_tuples[i - previous_races_needed][2] < constants.CPI_CORNERS_INCLUDED:
-                # All corners in this race are needed. Simply grab the incidents and laps.
-                corners_counted += cpi_tuples[i - previous_races_needed][2]
-                total_incidents += cpi_tuples[i - previous_races_needed][1]
-            else:
-                # Only a fraction of the corners in this race are needed.
-                # Weight the incidents by the proportion of total laps that are needed
-                corners_needed = constants.CPI_CORNERS_INCLUDED - corners_counted
-                corners_counted = constants.CPI_CORNERS_INCLUDED
-                prev_tup = cpi_tuples[i - previous_races_needed]
-                total_incidents += prev_tup[1] * corners_needed / prev_tup[2]
-            previous_races_needed += 1
+        (end_epoch, incidents, corners) = cpi_tuples[i]
+        total_corners = cumulative_corners[i + 1]
+
+        # The first race that can be counted in full. Every race from here to race i adds up to
+        # fewer than corners_included corners.
+        window_start = bisect.bisect_right(cumulative_corners, total_corners - corners_included, 0, i + 1)
+
+        if window_start > i:
+            # The current race has enough corners all on its own. Scale CPI based on this race.
+            corners_counted = corners
+            total_incidents = incidents
+            if corners_counted > corners_included:
+                total_incidents = total_incidents * corners_included / corners_counted
+                corners_counted = corners_included
+        else:
+            corners_counted = total_corners - cumulative_corners[window_start]
+            total_incidents = cumulative_incidents[i + 1] - cumulative_incidents[window_start]
+
+            if window_start > 0:
+                # Only a fraction of the corners in the race before the window are needed.
+                # Weight its incidents by the proportion of its corners that are needed.
+                (_, boundary_incidents, boundary_corners) = cpi_tuples[window_start - 1]
+                corners_needed = corners_included - corners_counted
+                corners_counted = corners_included
+                total_incidents += boundary_incidents * corners_needed / boundary_corners
 
         if total_incidents == 0:
-            new_cpi = constants.CPI_CORNERS_INCLUDED
+            new_cpi = corners_included
         else:
             new_cpi = corners_counted / total_incidents
 
-        if new_cpi > constants.CPI_CORNERS_INCLUDED:
-            new_cpi = constants.CPI_CORNERS_INCLUDED
+        if new_cpi > corners_included:
+            new_cpi = corners_included
 
-        cpi_graph_data.append((cpi_tuples[i][0], total_corners, new_cpi))
+        cpi_graph_data.append((end_epoch, total_corners, new_cpi))
 
     return cpi_graph_data
 
 
-##################
-# TODO: VALIDATE #
-##################
-async def get_respo_race_week(db: BotDatabase, time_start: datetime):
-    season_year = -1
-    season_quarter = -1
-    race_week = -1
-    season_found = False
-
-    season_date_tuples = await db.get_season_dates()
+async def generate_cpi_graph_data(db: BotDatabase, iracing_custid, series_id: int = None):
+    cpi_tuples = await db.get_race_incidents_and_corners(iracing_custid, series_id=series_id)
 
-    if season_date_tuples is None or len(season_date_tuples) < 1:
-        return None
+    if cpi_tuples is None or len(cpi_tuples) < 1:
+        return []
 
-    for season_date_tuple in season_date_tuples:
-        (season_year, season_quarter, str_start_time, str_end_time) = season_date_tuple
-        season_start = datetime.fromisoformat(str_start_time)
-        season_end = datetime.fromisoformat(str_end_time)
+    return calculate_cpi_series(cpi_tuples)
 
-        if time_start >= season_start and time_start < season_end:
-            time_diff = (time_start - season_start).total_seconds()
-            race_week = int(time_diff / (7 * 24 * 60 * 60))
-            season_found = True
-            break
 
-    if season_found:
-        return (season_year, season_quarter, race_week)
-    else:
-        return (None, None, None)
+async def get_respo_race_week(db: BotDatabase, time_start: datetime):
+    return await season_calendar.calendar.get_race_week(db, time_start)
 
 
 async def get_number_of_race_weeks(db: BotDatabase, time_start: datetime):
-    season_year = -1
-    season_quarter = -1
-    race_weeks = -1
-    season_found = False
-
-    season_date_tuples = await db.get_season_dates()
-
-    if season_date_tuples is None or len(season_date_tuples) < 1:
-        return None
-
-    for season_date_tuple in season_date_tuples:
-        (season_year, season_quarter, str_start_time, str_end_time) = season_date_tuple
-        season_start = datetime.fromisoformat(str_start_time)
-        season_end = datetime.fromisoformat(str_end_time)
-
-        if time_start >= season_start:
-            time_diff = (season_end - season_start).total_seconds()
-            race_weeks = int(time_diff / (7 * 24 * 60 * 60))
-            season_found = True
-            break
-
-    if season_found:
-        return race_weeks
-    else:
-        return None
+    return await season_calendar.calendar.get_number_of_race_weeks(db, time_start)
 
 
 def calc_total_champ_points(leaderboard_dict, weeks_to_count):
@@ -330,66 +295,6 @@ def calc_projected_champ_points(leaderboard_dict, max_week, weeks_to_count, acti
             leaderboard_dict[member]['projected_points'] = 0
 
 
-async def get_member_weekly_points_dict(
-    db: BotDatabase,
-    iracing_custid,
-    result_dicts,
-    series_id,
-    car_class_id,
-    season_year,
-    season_quarter,
-    up_to_week,
-    adjust_race_weeks,
-    subsession_to_ignore: int = None
-):
-    points = {}
-    for i in range(0, 12):
-        points[str(i)] = []
-
-    for result_dict in result_dicts:
-        if subsession_to_ignore is not None and result_dict['subsession_id'] == subsession_to_ignore:
-            continue
-        if result_dict["series_id"] != series_id:
-            continue
-        race_week = None
-        if adjust_race_weeks and 'start_time' in result_dict:
-            (
-                adjusted_season_year,
-                adjusted_season_quarter,
-                adjusted_race_week
-            ) = await get_respo_race_week(db, result_dict['start_time'])
-
-            if (
-                adjusted_race_week is not None
-                and adjusted_season_year == season_year
-                and adjusted_season_quarter == season_quarter
-            ):
-                race_week = adjusted_race_week
-        elif 'race_week_num' in result_dict:
-            race_week = result_dict['race_week_num']
-
-        if race_week is None:
-            continue
-
-        if race_week <= up_to_week:
-            if (
-                'champ_points' in result_dict
-                and 'official_session' in result_dict
-                and result_dict['official_session'] == 1
-            ):
-                points[str(race_week)].append(result_dict['champ_points'])
-
-    weekly_points = {}
-    for week in points:
-        num_to_grab = math.ceil(len(points[week]) / 4)
-        points[week].sort(reverse=True)
-        if points[week]:
-            points[week] = points[week][0:num_to_grab]
-            weekly_points[week] = int(sum(points[week]) / num_to_grab)
-
-    return weekly_points
-
-
 async def get_champ_points(
     db: BotDatabase,
     member_dicts,
@@ -400,25 +305,22 @@ async def get_champ_points(
     up_to_week
 ):
     leaderboard = {}
-
     for member_dict in member_dicts:
-        result_dicts = await db.get_champ_points_data(
-            member_dict['iracing_custid'],
-            season_year=season_year,
-            season_quarter=season_quarter
-        )
-        weekly_points = await get_member_weekly_points_dict(
-            db,
-            member_dict['iracing_custid'],
-            result_dicts,
-            series_id,
-            car_class_id,
-            season_year,
-            season_quarter,
-            up_to_week,
-            False
-        )
-        leaderboard[member_dict['name']] = {'weeks': weekly_points}
+        leaderboard[member_dict['name']] = {'weeks': {}}
+
+    weekly_points = await db.get_weekly_champ_points(
+        season_year,
+        season_quarter,
+        series_id=series_id,
+        up_to_week=up_to_week
+    )
+
+    member_names = {member_dict['iracing_custid']: member_dict['name'] for member_dict in member_dicts}
+    for weekly_points_dict in weekly_points:
+        if weekly_points_dict['iracing_custid'] not in member_names:
+            continue
+        name = member_names[weekly_points_dict['iracing_custid']]
+        leaderboard[name]['weeks'][str(weekly_points_dict['race_week'])] = weekly_points_dict['points']
 
     return leaderboard
 
@@ -432,38 +334,26 @@ async def get_respo_champ_points(
     subsession_to_ignore: int = None
 ):
     leaderboard = {}
-
     for member_dict in member_dicts:
-        weekly_points_best = {}
-        result_dicts = await db.get_champ_points_data(
-            member_dict['iracing_custid'],
-            season_year=season_year,
-            season_quarter=season_quarter
-        )
-
-        series_list = get_list_of_series(result_dicts)
-
-        for series_id in series_list:
-            weekly_points = await get_member_weekly_points_dict(
-                db,
-                member_dict['iracing_custid'],
-                result_dicts,
-                series_id,
-                None,
-                season_year,
-                season_quarter,
-                up_to_week,
-                True,
-                subsession_to_ignore=subsession_to_ignore
-            )
-
-            if weekly_points is None or len(weekly_points) < 1:
-                continue
+        leaderboard[member_dict['name']] = {'weeks': {}}
+
+    weekly_points = await db.get_weekly_champ_points(
+        season_year,
+        season_quarter,
+        respo_week=True,
+        up_to_week=up_to_week,
+        subsession_to_ignore=subsession_to_ignore
+    )
 
-            for week in weekly_points:
-                if week not in weekly_points_best or weekly_points[week] > weekly_points_best[week]:
-                    weekly_points_best[week] = weekly_points[week]
-        leaderboard[member_dict['name']] = {'weeks': weekly_points_best}
+    # A member's Respo points for a week are their best points in any series that week.
+    member_names = {member_dict['iracing_custid']: member_dict['name'] for member_dict in member_dicts}
+    for weekly_points_dict in weekly_points:
+        if weekly_points_dict['iracing_custid'] not in member_names:
+            continue
+        weekly_points_best = leaderboard[member_names[weekly_points_dict['iracing_custid']]]['weeks']
+        week = str(weekly_points_dict['race_week'])
+        if week not in weekly_points_best or weekly_points_dict['points'] > weekly_points_best[week]:
+            weekly_points_best[week] = weekly_points_dict['points']
 
     return leaderboard
 
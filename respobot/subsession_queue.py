@@ -0,0 +1,276 @@
+import asyncio
+import logging
+import discord
+from irslashdata.client import Client as IracingClient
+from irslashdata.exceptions import ForbiddenError
+from bot_database import BotDatabase, BotDatabaseError
+import constants
+import helpers
+import rate_limiter
+
+
+class SubsessionFetchQueue:
+    """Process-wide work queue that fetches subsessions and their laps from the iRacing /data API
+    and stores them in the database.
+
+    Work is keyed by subsession_id. If a subsession is requested while it is already being fetched
+    or is still waiting to be written, the second requester awaits the same future instead of
+    fetching it again, so each subsession is downloaded and inserted once no matter how many
+    members or tasks (get_race_results(), cache_races()) ask for it.
+
+    Fetched subsessions are handed to a single writer task that stores whatever has piled up in
+    one add_subsessions_batch() call, so a burst of concurrent fetches turns into a few large
+    transactions instead of one commit per subsession.
+
+    Usage:
+        subsession_fetch = await subsession_queue.fetch_queue.fetch(bot, db, ir, subsession_id)
+    """
+
+    def __init__(self, write_batch_size: int = 50):
+        self.write_batch_size = max(1, write_batch_size)
+        self._in_flight = {}
+        # The event loop only keeps weak references to tasks, so hold on to them until they finish.
+        self._fetch_tasks = set()
+        self._pending_writes = None
+        self._writer_task = None
+
+    async def fetch(self, bot: discord.Bot, db: BotDatabase, ir: IracingClient, subsession_id: int):
+        """Make sure a subsession and its laps are in the database, fetching them if they aren't.
+
+        Arguments:
+            bot (discord.Bot): Used to DM the bot admin about failures.
+            db (BotDatabase): The database the subsession is stored in.
+            ir (IracingClient): The client used to fetch the subsession.
+            subsession_id (int): The subsession to fetch.
+
+        Returns:
+            A dict of the form:
+            {
+                'subsession_id': int,
+                'failed': bool,
+                'race_found': bool,
+                'new_subsession': dict
+            }
+            'failed' is True if the subsession could not be checked, fetched, or stored and should be
+            tried again later. 'race_found' is True if the subsession was already in the database
+            before it was requested. 'new_subsession' is the subsession dict from the /data API if
+            it had to be fetched. The same dict is handed to every requester, so don't modify it.
+        """
+        future = self._in_flight.get(subsession_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._in_flight[subsession_id] = future
+            fetch_task = asyncio.create_task(self._fetch(bot, db, ir, subsession_id, future))
+            self._fetch_tasks.add(fetch_task)
+            fetch_task.add_done_callback(self._fetch_tasks.discard)
+        else:
+            logging.getLogger('respobot.bot').debug(
+                f"Subsession {subsession_id} is already being fetched. Waiting for it."
+            )
+
+        # Shielded so that one requester being cancelled doesn't cancel the fetch for everyone else.
+        return await asyncio.shield(future)
+
+    def _resolve(self, subsession_fetch: dict, future: asyncio.Future):
+        self._in_flight.pop(subsession_fetch['subsession_id'], None)
+        if not future.done():
+            future.set_result(subsession_fetch)
+
+    async def _fetch(
+        self,
+        bot: discord.Bot,
+        db: BotDatabase,
+        ir: IracingClient,
+        subsession_id: int,
+        future: asyncio.Future
+    ):
+        subsession_fetch = {
+            'subsession_id': subsession_id,
+            'failed': True,
+            'race_found': False,
+            'new_subsession': None
+        }
+
+        try:
+            lap_dicts = await self._download(bot, db, ir, subsession_fetch)
+        except Exception as exc:
+            logging.getLogger('respobot.bot').warning(
+                f"An unexpected exception was caught when fetching subsession {subsession_id}: {exc}"
+            )
+            subsession_fetch['failed'] = True
+            lap_dicts = None
+
+        if lap_dicts is None:
+            self._resolve(subsession_fetch, future)
+            return
+
+        if self._pending_writes is None:
+            self._pending_writes = asyncio.Queue()
+        self._pending_writes.put_nowait((bot, db, subsession_fetch, lap_dicts, future))
+
+        if self._writer_task is None or self._writer_task.done():
+            self._writer_task = asyncio.create_task(self._write_loop())
+
+    async def _download(self, bot: discord.Bot, db: BotDatabase, ir: IracingClient, subsession_fetch: dict):
+        """Fill in subsession_fetch from the database and the iRacing servers.
+
+        Returns:
+            A dict of lap dicts keyed by (subsession_id, simsession_number) if there is something
+            to write to the database, or None if there isn't.
+        """
+        subsession_id = subsession_fetch['subsession_id']
+
+        try:
+            logging.getLogger('respobot.bot').debug(f"Checking if {subsession_id} is already in the database.")
+            race_found = await db.is_subsession_in_db(subsession_id)
+            logging.getLogger('respobot.bot').debug(
+                f"Checking if the laps for {subsession_id} are already in the database."
+            )
+            laps_found = await db.is_subsession_in_laps_table(subsession_id)
+        except BotDatabaseError as exc:
+            logging.getLogger('respobot.bot').warning(
+                "An exception was caught when checking if "
+                f"subsession {subsession_id} was in the database: {exc}"
+            )
+            await helpers.send_bot_failure_dm(
+                bot,
+                "An exception was caught when checking if "
+                f"subsession {subsession_id} was in the database: {exc}"
+            )
+            return None
+
+        subsession_fetch['race_found'] = race_found
+        # A subsession that's already stored counts as done even if its missing laps can't be fetched below.
+        subsession_fetch['failed'] = not race_found
+
+        if race_found is True:
+            if laps_found is True:
+                logging.getLogger('respobot.bot').debug(f"Subsession {subsession_id} already logged. Skipping.")
+                return None
+            else:
+                logging.getLogger('respobot.bot').warning(
+                    f"Subsession {subsession_id} in subsessions table but not laps table. Adding subsession."
+                )
+
+        try:
+            logging.getLogger('respobot.bot').debug(f"Running ir.subsession_data() for subsession {subsession_id}")
+            async with rate_limiter.iracing:
+                new_subsession = await ir.subsession_data(subsession_id)
+        except ForbiddenError as exc:
+            logging.getLogger('respobot.bot').warning(
+                f"Access denied when fetching data for subsession {subsession_id}: {exc}"
+            )
+            return None
+        except Exception as exc:
+            logging.getLogger('respobot.bot').warning(
+                f"An exception was caught when fetching data for subsession {subsession_id}: {exc}"
+            )
+            await helpers.send_bot_failure_dm(
+                bot,
+                f"An exception was caught when fetching data for subsession {subsession_id}: {exc}"
+            )
+            return None
+
+        if new_subsession is None:
+            logging.getLogger('respobot.bot').warning(
+                f"No subsession data returned for subsession {subsession_id}. Skipping."
+            )
+            return None
+
+        subsession_fetch['new_subsession'] = new_subsession
+
+        # And now for the laps
+        lap_dicts = {}
+        if laps_found is False:
+            if 'session_results' not in new_subsession or len(new_subsession['session_results']) < 1:
+                logging.getLogger('respobot.bot').warning(
+                    f"No subsession results for subsession {subsession_id}. Skipping laps."
+                )
+            else:
+                for session_result_dict in new_subsession['session_results']:
+                    if 'simsession_number' not in session_result_dict or 'results' not in session_result_dict:
+                        continue
+
+                    try:
+                        logging.getLogger('respobot.bot').debug(
+                            f"Running ir.lap_data() for simsession {session_result_dict['simsession_number']} "
+                            f"of subsession {subsession_id}"
+                        )
+                        async with rate_limiter.iracing:
+                            simsession_lap_dicts = await ir.lap_data(
+                                new_subsession['subsession_id'],
+                                session_result_dict['simsession_number']
+                            )
+                    except Exception as exc:
+                        logging.getLogger('respobot.bot').warning(
+                            f"An exception was caught when fetching lap data for subsession {subsession_id}: {exc}"
+                        )
+                        await helpers.send_bot_failure_dm(
+                            bot,
+                            f"An exception was caught when fetching lap data for subsession {subsession_id}: {exc}"
+                        )
+                        continue
+
+                    if simsession_lap_dicts is None or len(simsession_lap_dicts) < 1:
+                        logging.getLogger('respobot.bot').warning(
+                            f"No laps returned by iR stats server for subsession {subsession_id}. Skipping laps."
+                        )
+                        continue
+
+                    lap_dicts[
+                        (new_subsession['subsession_id'], session_result_dict['simsession_number'])
+                    ] = simsession_lap_dicts
+
+        return lap_dicts
+
+    async def _write_loop(self):
+        while True:
+            pending_writes = [await self._pending_writes.get()]
+            while len(pending_writes) < self.write_batch_size and not self._pending_writes.empty():
+                pending_writes.append(self._pending_writes.get_nowait())
+
+            # There's only ever one database in practice, but group by it anyway so nothing is
+            # written to the wrong file.
+            writes_by_db = {}
+            for pending_write in pending_writes:
+                writes_by_db.setdefault(id(pending_write[1]), []).append(pending_write)
+
+            for db_pending_writes in writes_by_db.values():
+                try:
+                    await self._write(db_pending_writes)
+                except Exception as exc:
+                    # _write() has already resolved the batch's futures. Keep the writer running for the next batch.
+                    logging.getLogger('respobot.bot').error(
+                        f"An unexpected exception was caught in the subsession write loop: {exc}"
+                    )
+
+    async def _write(self, pending_writes: list):
+        (bot, db, _, _, _) = pending_writes[0]
+
+        subsession_dicts = []
+        lap_dicts = {}
+        for (_, _, subsession_fetch, subsession_lap_dicts, _) in pending_writes:
+            subsession_dicts.append(subsession_fetch['new_subsession'])
+            lap_dicts.update(subsession_lap_dicts)
+
+        failed = True
+        try:
+            await db.add_subsessions_batch(subsession_dicts, lap_dicts=lap_dicts, batch_size=self.write_batch_size)
+            failed = False
+        except BotDatabaseError as exc:
+            subsession_ids = [subsession_dict['subsession_id'] for subsession_dict in subsession_dicts]
+            logging.getLogger('respobot.bot').warning(
+                f"An exception was caught when adding subsession(s) {subsession_ids} to the database: {exc}"
+            )
+            await helpers.send_bot_failure_dm(
+                bot,
+                f"An exception was caught when adding subsession(s) {subsession_ids} to the database: {exc}"
+            )
+        finally:
+            # Never leave a requester waiting, even if something unexpected blew up above.
+            for (_, _, subsession_fetch, _, future) in pending_writes:
+                subsession_fetch['failed'] = failed and not subsession_fetch['race_found']
+                self._resolve(subsession_fetch, future)
+
+
+fetch_queue = SubsessionFetchQueue(constants.SUBSESSION_WRITE_BATCH_SIZE)
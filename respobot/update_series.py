@@ -4,6 +4,7 @@ import traceback
 from datetime import datetime, timedelta, timezone
 from bot_database import BotDatabase
 import constants
+import season_calendar
 from irslashdata.client import Client as IracingClient
 from irslashdata import constants as irConstants
 
@@ -109,6 +110,7 @@ async def update_season_dates(
             if year >= max_year or (year == max_year and quarter > max_quarter):
                 done = True
         await db.update_season_dates(season_dicts)
+        await season_calendar.calendar.refresh(db)
         logging.getLogger('respobot.bot').info("Done updating season_dates table!")
     except httpx.HTTPError:
         logging.getLogger('respobot.bot').warning(